@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Replay Benchmark - マイクなしで実際のワーカーに音声ファイルを流して性能を測る
+ディレクトリ内の WAV / FLAC を読み、stop_and_transcribe と同じ
+リサンプリング → speed_factor 間引き → デコード の経路 (preprocess_audio + process_task) で処理する。
+入力先 (platform_utils.type_text) の代わりに結果を受け取るシンクを使うので、何も入力されない。
+
+同名の .txt (例: sample01.wav と sample01.txt) があれば参照文字起こしとして文字誤り率 (CER) を求める。
+文字起こしに失敗したファイル (モデルのエラー、オンラインの失敗で再送キューへ回ったもの) は ok=false で記録し、
+遅延・RTF・CER の集計からは除いて failures に数える。
+ログは本番の logs/stt_worker.log ではなく logs/bench_replay.log に書く。
+結果は JSON で保存し、compare で2つの結果を比べて劣化を検出できる。
+
+使い方:
+    python bench_replay.py run <音声ディレクトリ> [--out result.json] [--model ID] [--device cpu] [--compute-type int8]
+    python bench_replay.py compare <base.json> <new.json> [--tolerance 0.10]
+"""
+import os
+import sys
+import json
+import time
+import platform
+import unicodedata
+
+AUDIO_EXTENSIONS = (".wav", ".flac")
+
+
+def load_audio(path):
+    """モノラル float32 とサンプルレートを返す（soundfile があれば FLAC も読める）"""
+    import numpy as np
+    try:
+        import soundfile
+        data, rate = soundfile.read(path, dtype="float32", always_2d=True)
+        return data.mean(axis=1).astype(np.float32), rate
+    except ImportError:
+        if not path.lower().endswith(".wav"):
+            raise
+    import wave
+    with wave.open(path, "rb") as wav:
+        rate = wav.getframerate()
+        channels = wav.getnchannels()
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"Only 16-bit WAV is supported without soundfile: {path}")
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2").astype(np.float32) / 32768
+    return pcm.reshape(-1, channels).mean(axis=1), rate
+
+
+def normalize_text(text):
+    """CER 用の正規化: NFKC・小文字化し、空白と句読点を除く"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(ch for ch in text if not ch.isspace() and not unicodedata.category(ch).startswith("P"))
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _read_status_kb(field):
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """ピークRSS (VmHWM) を現在値に戻す（Linux のみ。ファイルごとのピークを測るため）"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    hwm = _read_status_kb("VmHWM")
+    if hwm is not None:
+        return hwm / 1024
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS はバイト、Linux は KB
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 4)
+
+
+def run_benchmark(audio_dir, overrides=None):
+    import config_manager
+    import log_setup
+    # ワーカーは import 時にログを設定するので、その前にベンチマーク用のログ先を設定しておく
+    log_setup.setup("BENCH", "bench_replay.log", config_manager.get_config(), console=False)
+    import stt_worker_unified as worker_module
+
+    files = sorted(
+        os.path.join(audio_dir, name) for name in os.listdir(audio_dir)
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+    if not files:
+        raise SystemExit(f"No WAV/FLAC files in {audio_dir}")
+
+    # 実運用の設定を土台に、計測を乱す機能は切る
+    config = config_manager.thaw(config_manager.get_config())
+    config.update({
+        "local_model_timeout": -1,
+        "progressive_output": False,
+        "hybrid_race_enabled": False,
+    })
+    config.update(overrides or {})
+
+    captured = []
+    load_started = time.perf_counter()
+    worker = worker_module.UnifiedSTTWorker(config=config, interactive=False, output_sink=captured.append)
+    try:
+        return _replay_files(worker, worker_module, files, config, captured, load_started)
+    finally:
+        worker.shutdown()
+
+
+def _replay_files(worker, worker_module, files, config, captured, load_started):
+    use_local = config.get("use_local_model", True)
+    model_load_s = None
+    if use_local:
+        worker.model_ready_event.wait(timeout=600)
+        if worker.model is None:
+            raise SystemExit(f"Model failed to load: {worker.model_load_error}")
+        model_load_s = round(time.perf_counter() - load_started, 3)
+
+    speed_factor = config.get("speed_factor", 1.0)
+    results = []
+    for path in files:
+        audio, rate = load_audio(path)
+        duration = len(audio) / rate
+        reset_peak_rss()
+        captured.clear()
+
+        spooled_before = worker.retry_spool.pending_count()
+        error = None
+        started = time.perf_counter()
+        audio16 = worker_module.preprocess_audio(audio, rate, speed_factor)
+        preprocessed = time.perf_counter()
+        worker.active_task_id = os.path.basename(path)
+        try:
+            handled = worker.process_task(audio16, use_local, config)
+        except Exception as e:
+            handled, error = False, f"{type(e).__name__}: {e}"
+        finished = time.perf_counter()
+        # 再送キューへ回った（= オンラインが失敗した）場合も、結果は届いていない
+        if handled and worker.retry_spool.pending_count() > spooled_before:
+            handled, error = False, "online request failed (spooled for retry)"
+        elif not handled and error is None:
+            error = "no transcription (see logs/bench_replay.log)"
+
+        text = "".join(captured)
+        entry = {
+            "file": os.path.basename(path),
+            "ok": handled,
+            "duration_s": round(duration, 3),
+            "latency_s": round(finished - started, 4),
+            "preprocess_s": round(preprocessed - started, 4),
+            "decode_s": round(finished - preprocessed, 4),
+            "rtf": round((finished - started) / duration, 4) if duration else None,
+            "peak_rss_mb": round(peak_rss_mb() or 0, 1),
+            "text": text,
+        }
+        if not handled:
+            entry["error"] = error
+            results.append(entry)
+            print(f"{entry['file']}: FAILED ({error})", file=sys.stderr)
+            continue
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                reference = f.read().strip()
+            ref_norm = normalize_text(reference)
+            edits = edit_distance(normalize_text(text), ref_norm)
+            entry.update({
+                "reference": reference,
+                "edits": edits,
+                "ref_chars": len(ref_norm),
+                "cer": round(edits / len(ref_norm), 4) if ref_norm else None,
+            })
+        results.append(entry)
+        print(f"{entry['file']}: {entry['latency_s']:.3f}s (RTF {entry['rtf']}, CER {entry.get('cer', '-')})", file=sys.stderr)
+
+    # 失敗したファイルは遅延・RTF・CER に含めない（速く失敗した分で良く見えないように）
+    succeeded = [r for r in results if r["ok"]]
+    latencies = [r["latency_s"] for r in succeeded]
+    total_edits = sum(r.get("edits", 0) for r in succeeded)
+    total_ref = sum(r.get("ref_chars", 0) for r in succeeded)
+    total_audio = sum(r["duration_s"] for r in succeeded)
+    summary = {
+        "files": len(results),
+        "failures": len(results) - len(succeeded),
+        "audio_s": round(total_audio, 3),
+        "latency_p50_s": _percentile(latencies, 50),
+        "latency_p95_s": _percentile(latencies, 95),
+        "rtf": round(sum(latencies) / total_audio, 4) if total_audio else None,
+        "cer": round(total_edits / total_ref, 4) if total_ref else None,
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in results),
+        "model_load_s": model_load_s,
+    }
+    meta = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "use_local_model": use_local,
+        "model": config.get("local_model_id") if use_local else config.get("online_provider"),
+        "device": config.get("local_device"),
+        "compute_type": config.get("local_compute_type"),
+        "language": config.get("language"),
+        "speed_factor": speed_factor,
+    }
+    return {"meta": meta, "summary": summary, "files": results}
+
+
+# 値が大きいほど悪い指標
+COMPARED_METRICS = ("failures", "latency_p50_s", "latency_p95_s", "rtf", "cer", "peak_rss_mb", "model_load_s")
+
+
+def compare(base, new, tolerance=0.10):
+    """
+    2つの結果の summary を比べる。tolerance (相対) を超えて悪化した指標を regressions に入れる。
+    CER は絶対差 0.005 未満の揺れを無視する。
+    """
+    rows = []
+    regressions = []
+    for key in COMPARED_METRICS:
+        a = base["summary"].get(key)
+        b = new["summary"].get(key)
+        if a is None or b is None:
+            continue
+        change = (b - a) / a if a else (0.0 if b == a else float("inf"))
+        worse = change > tolerance and not (key == "cer" and b - a < 0.005)
+        rows.append({"metric": key, "base": a, "new": b, "change": round(change, 4), "regression": worse})
+        if worse:
+            regressions.append(key)
+
+    base_files = {f["file"]: f for f in base["files"]}
+    per_file = []
+    for f in new["files"]:
+        old = base_files.get(f["file"])
+        if old is None:
+            continue
+        per_file.append({
+            "file": f["file"],
+            "latency_s": [old["latency_s"], f["latency_s"]],
+            "cer": [old.get("cer"), f.get("cer")],
+            "text_changed": old.get("text") != f.get("text"),
+        })
+    return {"summary": rows, "regressions": regressions, "files": per_file}
+
+
+def _print_comparison(result):
+    print(f"{'metric':<16} {'base':>10} {'new':>10} {'change':>9}")
+    for row in result["summary"]:
+        flag = "  << regression" if row["regression"] else ""
+        print(f"{row['metric']:<16} {row['base']:>10} {row['new']:>10} {row['change'] * 100:>8.1f}%{flag}")
+    changed = [f["file"] for f in result["files"] if f["text_changed"]]
+    if changed:
+        print(f"\nTranscript changed: {', '.join(changed)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay audio files through the worker and measure performance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_cmd = sub.add_parser("run", help="Transcribe every WAV/FLAC in a directory")
+    run_cmd.add_argument("audio_dir")
+    run_cmd.add_argument("--out", default=None, help="Write the JSON result here (default: stdout)")
+    run_cmd.add_argument("--model", default=None, help="Override local_model_id")
+    run_cmd.add_argument("--device", default=None, help="Override local_device (cpu / cuda)")
+    run_cmd.add_argument("--compute-type", default=None, help="Override local_compute_type")
+    run_cmd.add_argument("--language", default=None)
+    run_cmd.add_argument("--speed-factor", type=float, default=None)
+    run_cmd.add_argument("--online", action="store_true", help="Use the configured online provider instead of the local model")
+
+    compare_cmd = sub.add_parser("compare", help="Compare two results and report regressions")
+    compare_cmd.add_argument("base")
+    compare_cmd.add_argument("new")
+    compare_cmd.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown (default 10%%)")
+    compare_cmd.add_argument("--json", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        overrides = {}
+        for key, value in (("local_model_id", args.model), ("local_device", args.device),
+                           ("local_compute_type", args.compute_type), ("language", args.language),
+                           ("speed_factor", args.speed_factor)):
+            if value is not None:
+                overrides[key] = value
+        if args.online:
+            overrides["use_local_model"] = False
+        result = run_benchmark(args.audio_dir, overrides)
+        text = json.dumps(result, indent=2, ensure_ascii=False)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+            print(json.dumps(result["summary"], indent=2), file=sys.stderr)
+        else:
+            print(text)
+        # ワーカーは run_benchmark 内で止めてある。キューに残ったログを書き出してから、
+        # モデルのバックグラウンドスレッドを待たずに終了する
+        import log_setup
+        log_setup.stop()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(0)
+
+    if args.command == "compare":
+        with open(args.base, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.new, "r", encoding="utf-8") as f:
+            new = json.load(f)
+        result = compare(base, new, args.tolerance)
+        if args.json:
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+        else:
+            _print_comparison(result)
+        sys.exit(1 if result["regressions"] else 0)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark - デーモン起動からホットキー受付・文字起こし可能になるまでの時間を計測する
+stt_daemon.py を起動し、制御APIの status が返す起動段階の時刻 (monotonic) を
+起動直前の時刻と比べる。起動と終了を --runs 回繰り返し、段階ごとの中央値と最大値を表示する。
+
+段階:
+    process              インタプリタが stt_daemon.py の実行を始めた
+    hotkey_ready         ホットキーのリスナーが動き始めた
+    tray_ready           トレイアイコンが表示された
+    worker_imported      ワーカーの import が終わった (HELLO)
+    transcription_ready  ワーカーが最初の READY を返した（常時保持ならモデルのロード完了）
+
+実行中のデーモンがあると計測できないので、先に終了しておくこと。
+ディスクキャッシュの影響を見たい場合は --runs 1 を OS 再起動直後に実行する。
+
+使い方:
+    python bench_startup.py [--runs 5] [--timeout 120] [--json]
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import subprocess
+
+import control_api
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DAEMON_SCRIPT = os.path.join(PROJECT_ROOT, "stt_daemon.py")
+STAGES = ("process", "hotkey_ready", "tray_ready", "worker_imported", "transcription_ready")
+
+
+def _daemon_running():
+    try:
+        control_api.request("ping", timeout=0.5)
+        return True
+    except control_api.ControlError:
+        return False
+
+
+def _wait_port_free(timeout=10.0):
+    """前回のデーモンが制御ポートを手放すまで待つ"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind((control_api.CONTROL_HOST, control_api.CONTROL_PORT))
+            return True
+        except OSError:
+            time.sleep(0.1)
+        finally:
+            sock.close()
+    return False
+
+
+def run_once(timeout):
+    """デーモンを1回起動して、各段階までの ms を返す"""
+    launched = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, DAEMON_SCRIPT], cwd=PROJECT_ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    stages = {}
+    try:
+        deadline = launched + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"stt_daemon.py exited with code {process.returncode}")
+            try:
+                # 起動直後は古いトークンを読んで拒否されることがあるので、毎回読み直す
+                stages = control_api.request("status", timeout=1.0).get("startup", {})
+            except control_api.ControlError:
+                stages = {}
+            if "transcription_ready" in stages:
+                break
+            time.sleep(0.02)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return {stage: round((t - launched) * 1000, 1) for stage, t in stages.items()}
+
+
+def summarize(runs):
+    summary = {}
+    for stage in STAGES:
+        values = sorted(r[stage] for r in runs if stage in r)
+        if values:
+            summary[stage] = {"count": len(values), "median_ms": values[len(values) // 2], "max_ms": values[-1]}
+    return summary
+
+
+def print_report(runs, summary):
+    print(f"{'stage':<22} {'median ms':>10} {'max ms':>10} {'runs':>5}")
+    for stage in STAGES:
+        s = summary.get(stage)
+        if s is None:
+            print(f"{stage:<22} {'-':>10} {'-':>10} {0:>5}")
+        else:
+            print(f"{stage:<22} {s['median_ms']:>10.0f} {s['max_ms']:>10.0f} {s['count']:>5}")
+    missing = sum(1 for r in runs if "transcription_ready" not in r)
+    if missing:
+        print(f"\n{missing} run(s) did not reach transcription_ready before the timeout.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure STT daemon time-to-hotkey and time-to-transcription")
+    parser.add_argument("--runs", type=int, default=5, help="Number of daemon launches")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for transcription_ready per run")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if _daemon_running():
+        print("An STT daemon is already running. Quit it before benchmarking startup.", file=sys.stderr)
+        sys.exit(1)
+
+    runs = []
+    for i in range(args.runs):
+        if not _wait_port_free():
+            print("Control port is still in use.", file=sys.stderr)
+            sys.exit(1)
+        try:
+            result = run_once(args.timeout)
+        except RuntimeError as e:
+            print(f"Run {i + 1}: {e}", file=sys.stderr)
+            sys.exit(1)
+        runs.append(result)
+        if not args.json:
+            print(f"Run {i + 1}: hotkey {result.get('hotkey_ready', '-')} ms, "
+                  f"transcription {result.get('transcription_ready', '-')} ms", file=sys.stderr)
+
+    summary = summarize(runs)
+    if args.json:
+        print(json.dumps({"runs": runs, "summary": summary}, indent=2))
+    else:
+        print_report(runs, summary)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Wakeup Benchmark - アイドル中のデーモン・ワーカー・オーバーレイの起床回数を計測する (Linux専用)
+/proc/<pid>/task/*/status のコンテキストスイッチ数を計測開始時と終了時に読み、
+1分あたりの起床回数をプロセス別・スレッド別に表示する。
+ポーリングタイマーが残っていると、アイドル中でもここに定常的な値が出る。
+
+使い方:
+    python bench_wakeups.py [--duration 60] [--pid <stt_daemon の PID>] [--json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+PROC = "/proc"
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _cmdline(pid):
+    data = _read(os.path.join(PROC, str(pid), "cmdline"))
+    return data.replace(b"\0", b" ").decode("utf-8", "replace").strip() if data else ""
+
+
+def _ppid(pid):
+    data = _read(os.path.join(PROC, str(pid), "stat"))
+    if not data:
+        return None
+    # comm に空白や括弧が含まれることがあるので、最後の ')' 以降を分割する
+    fields = data[data.rfind(b")") + 2:].split()
+    return int(fields[1])
+
+
+def _all_pids():
+    return [int(n) for n in os.listdir(PROC) if n.isdigit()]
+
+
+def find_daemon_pid():
+    for pid in _all_pids():
+        if pid == os.getpid():
+            continue
+        if "stt_daemon.py" in _cmdline(pid):
+            return pid
+    return None
+
+
+def process_tree(root_pid):
+    """root_pid とその子孫の PID 一覧"""
+    children = {}
+    for pid in _all_pids():
+        ppid = _ppid(pid)
+        if ppid is not None:
+            children.setdefault(ppid, []).append(pid)
+    tree, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def _thread_switches(pid, tid):
+    status = _read(os.path.join(PROC, str(pid), "task", str(tid), "status"))
+    if not status:
+        return None
+    total = 0
+    for line in status.decode("utf-8", "replace").splitlines():
+        if line.startswith(("voluntary_ctxt_switches:", "nonvoluntary_ctxt_switches:")):
+            total += int(line.split(":")[1])
+    return total
+
+
+def snapshot(pids):
+    """{(pid, tid): (スレッド名, コンテキストスイッチ数)}"""
+    result = {}
+    for pid in pids:
+        try:
+            tids = os.listdir(os.path.join(PROC, str(pid), "task"))
+        except OSError:
+            continue
+        for tid in tids:
+            count = _thread_switches(pid, tid)
+            if count is None:
+                continue
+            comm = _read(os.path.join(PROC, str(pid), "task", tid, "comm")) or b"?"
+            result[(pid, int(tid))] = (comm.decode("utf-8", "replace").strip(), count)
+    return result
+
+
+def _label(pid):
+    cmd = _cmdline(pid)
+    for name in ("stt_daemon.py", "stt_worker_unified.py", "status_overlay.py"):
+        if name in cmd:
+            return name
+    return cmd.split(" ")[0] if cmd else str(pid)
+
+
+def measure(root_pid, duration):
+    pids = process_tree(root_pid)
+    before = snapshot(pids)
+    time.sleep(duration)
+    after = snapshot(pids)
+    per_minute = 60.0 / duration
+
+    processes = []
+    for pid in pids:
+        threads = []
+        for (p, tid), (name, count) in sorted(after.items()):
+            if p != pid or (p, tid) not in before:
+                continue
+            rate = (count - before[(p, tid)][1]) * per_minute
+            threads.append({"tid": tid, "name": name, "wakeups_per_min": round(rate, 1)})
+        if not threads:
+            continue
+        threads.sort(key=lambda t: t["wakeups_per_min"], reverse=True)
+        processes.append({
+            "pid": pid,
+            "process": _label(pid),
+            "wakeups_per_min": round(sum(t["wakeups_per_min"] for t in threads), 1),
+            "threads": threads,
+        })
+    return {
+        "duration_sec": duration,
+        "total_wakeups_per_min": round(sum(p["wakeups_per_min"] for p in processes), 1),
+        "processes": processes,
+    }
+
+
+def print_report(report):
+    print(f"Measured {report['duration_sec']:.0f}s — total {report['total_wakeups_per_min']:.1f} wakeups/min")
+    for proc in report["processes"]:
+        print(f"\n{proc['process']} (pid {proc['pid']}): {proc['wakeups_per_min']:.1f}/min")
+        for t in proc["threads"]:
+            print(f"    {t['tid']:>7}  {t['name']:<16} {t['wakeups_per_min']:>8.1f}/min")
+
+
+if __name__ == "__main__":
+    if not os.path.isdir(os.path.join(PROC, "self", "task")):
+        print("This benchmark requires Linux /proc.", file=sys.stderr)
+        sys.exit(1)
+
+    parser = argparse.ArgumentParser(description="Count idle wakeups of the STT daemon process tree")
+    parser.add_argument("--duration", type=float, default=60.0, help="Measurement window in seconds")
+    parser.add_argument("--pid", type=int, default=None, help="PID of stt_daemon.py (default: auto-detect)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    root = args.pid or find_daemon_pid()
+    if root is None:
+        print("stt_daemon.py is not running (use --pid).", file=sys.stderr)
+        sys.exit(1)
+
+    report = measure(root, args.duration)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
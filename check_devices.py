@@ -1,14 +1,24 @@
-import sounddevice as sd
+import sys
 
-def list_audio_devices():
-    print("--- Audio Devices (sounddevice) ---")
-    devices = sd.query_devices()
-    print(devices)
+import device_registry
+
+
+def list_audio_devices(refresh=False):
+    registry = device_registry.get_registry()
+    if refresh:
+        # 調べ済みの結果を捨てて、全デバイスを調べ直す
+        registry.refresh(force=True)
+
+    print("--- Input Devices (device_registry) ---")
+    default = registry.lookup()
+    for dev in registry.devices():
+        marker = "*" if default is not None and dev["index"] == default["index"] else " "
+        rates = ", ".join(str(r) for r in dev["sample_rates"]) or "-"
+        channels = ", ".join(str(c) for c in dev["channels"]) or "-"
+        print(f"{marker} Index {dev['index']}: {dev['name']} [{dev['hostapi']}] "
+              f"(Channels: {channels} / max {dev['max_input_channels']}, Rates: {rates})")
+    print(f"\n* = default input. Cached in {registry.path}; pass --refresh to probe again.")
 
-    print("\n--- Input Devices ---")
-    for i, dev in enumerate(devices):
-        if dev['max_input_channels'] > 0:
-            print(f"Index {i}: {dev['name']} (Channels: {dev['max_input_channels']})")
 
 if __name__ == "__main__":
-    list_audio_devices()
+    list_audio_devices(refresh="--refresh" in sys.argv[1:])
@@ -1,6 +1,8 @@
 import json
 import os
-import sounddevice as sd
+import time
+import threading
+from types import MappingProxyType
 
 # プロジェクトルートディレクトリを取得し、絶対パスで config.json を指定
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -14,6 +16,10 @@ DEFAULT_CONFIG = {
         "google": ""
     },
     "device_index": None, # None means default
+    "device_name": None, # device_index の指すデバイス名。挿抜で番号がずれたら名前で引き直す
+    # 録音中にデバイスが使えなくなったら、録音を続けたまま切り替える先 (デバイス名。None = OS の既定入力)
+    "capture_failover": True,
+    "capture_fallback_device": None,
     "default_device_index": None, # ユーザーが明示的に選んだデフォルト
     "sample_rate": 44100,
     "language": "ja",
@@ -24,7 +30,32 @@ DEFAULT_CONFIG = {
     "local_device": "cuda",
     "local_compute_type": "int8",
     "local_always_loaded": True,
-    "local_ram_cache": False
+    "local_ram_cache": False,
+    # ローカルモデルのロード中にオンラインAPIと並走させる (既定: 無効)
+    "hybrid_race_enabled": False,
+    "hybrid_race_max_seconds": 0, # 0 = 無制限
+    "hybrid_race_languages": [], # 空 = 全言語
+    # オンライン失敗を再送した結果の届け先: "clipboard" (クリップボード+履歴) / "history" (履歴のみ)
+    "retry_delivery": "clipboard",
+    # ローカル推論でセグメントがデコードされるたびに入力する
+    "progressive_output": False,
+    # アイドル終了後も import 済みのワーカーを常に1つ待機させる
+    "worker_standby": True,
+    "worker_standby_max_rss_mb": 512, # 待機中 (モデル未ロード) のRSS上限。超えたら作り直す。0 = 無制限
+    # OpenMetrics エンドポイント (http://127.0.0.1:<metrics_port>/metrics)。変更はデーモン再起動後に反映
+    "metrics_enabled": False,
+    "metrics_port": 9464,
+    # ワーカーのメモリ時系列 (録音・文字起こし・ロード中だけ記録)。0 = 無効。変更はワーカー再起動後に反映
+    "memory_timeline_interval_ms": 250,
+    "memory_timeline_capacity": 4096,
+    # GPU メモリ (NVML) も標本に含めるか。発話のたびに NVML を問い合わせるので既定は無効
+    "memory_timeline_gpu": False,
+    # logs/*.log のローテーション (バイト数・世代数) と形式 ("text" / "json")。変更は再起動後に反映
+    "log_max_bytes": 5242880,
+    "log_backup_count": 3,
+    "log_format": "text",
+    # モデル推薦の目標: 10秒の発話を処理し終えるまでの時間 (ms)
+    "model_target_latency_ms": 1500
 }
 
 def load_config():
@@ -47,14 +78,77 @@ def save_config(config):
     with open(CONFIG_FILE, "w") as f:
         json.dump(config, f, indent=4)
 
+
+def _freeze(value):
+    """dict / list を再帰的に読み取り専用 (MappingProxyType / tuple) にする"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """スナップショットを通常の dict / list に戻す（JSON 保存や編集用）"""
+    if isinstance(value, MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+class ConfigService:
+    """
+    config.json の読み取り専用スナップショットを保持する。
+    ファイルの (mtime, size, inode) が変わった時だけ読み直すので、ホットキー経路から
+    JSON パースが消える。変更確認の stat も check_interval 秒に一度に抑える。
+    スナップショットは差し替えられるだけで中身は変わらないため、タスクに参照を渡してよい。
+    """
+
+    def __init__(self, path=CONFIG_FILE, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get(self, force_reload=False):
+        now = time.monotonic()
+        if not force_reload and self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            signature = self._stat_signature()
+            if force_reload or self._snapshot is None or signature != self._signature:
+                self._snapshot = _freeze(load_config())
+                # load_config が既定値でファイルを作成した場合に備えて取り直す
+                self._signature = self._stat_signature()
+            return self._snapshot
+
+
+_service = ConfigService()
+
+
+def get_config(force_reload=False):
+    """
+    現在の設定スナップショット (読み取り専用 Mapping) を返す。
+    書き換える場合は load_config() / save_config() を使うこと。
+    """
+    return _service.get(force_reload=force_reload)
+
 def get_input_devices():
-    input_devices = []
+    """入力デバイスの一覧 [{"id", "name"}]。device_registry の調べ済みの一覧を使う"""
+    import device_registry
     try:
-        devices = sd.query_devices()
-        for i, dev in enumerate(devices):
-            if dev['max_input_channels'] > 0:
-                input_devices.append({"id": i, "name": dev['name']})
+        devices = device_registry.get_registry().devices()
     except Exception:
-        pass
-            
-    return input_devices
+        return []
+    return [{"id": d["index"], "name": d["name"]} for d in devices]
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Control API - デーモンを外部から操作するためのローカル制御API
+二重起動防止用に確保している 127.0.0.1:34291 をそのまま待ち受けに使い、
+1行1メッセージの JSON (JSON Lines) でリクエストを受け付ける。
+1つの接続で複数のリクエストを送れるので、常駐クライアント (エディタ拡張やフットペダル) は
+接続を張ったままにすればプロセス探索なしでサブミリ秒の往復になる。
+
+リクエスト / レスポンス:
+    → {"token": "...", "cmd": "status", "args": {}}
+    ← {"ok": true, "result": {...}}
+    ← {"ok": false, "error": "..."}
+
+token はデーモン起動時に生成され、TOKEN_FILE (0600) に書き出される。
+同じユーザーだけが読めるので、ローカルの他ユーザーからの操作を防げる。
+
+使い方 (CLI):
+    python control_api.py status
+    python control_api.py start | stop | toggle | cancel
+    python control_api.py reload [--keys hotkey ui_language]
+        （ワーカーが起動時に読む設定はワーカーを作り直して反映する。デーモン自身が起動時に読む
+         metrics_port / log_* などは反映できないので、変わったキーを requires_restart で返す）
+    python control_api.py metrics
+    python control_api.py memdump [--inline]
+    python control_api.py profile [--count 3] [--mode cprofile|sampling] [--interval-ms 5]
+"""
+import os
+import sys
+import json
+import hmac
+import socket
+import secrets
+import logging
+import threading
+
+logger = logging.getLogger("ControlAPI")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+TOKEN_FILE = os.path.join(PROJECT_ROOT, ".control_token")
+CONTROL_HOST = "127.0.0.1"
+CONTROL_PORT = 34291
+MAX_LINE = 64 * 1024
+
+
+class ControlError(Exception):
+    """デーモンに接続できない、またはリクエストが拒否された"""
+
+
+def _write_token(path=TOKEN_FILE):
+    token = secrets.token_hex(16)
+    tmp = path + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    os.replace(tmp, path)
+    return token
+
+
+def read_token(path=TOKEN_FILE):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        raise ControlError("Control token not found (is the daemon running?)")
+
+
+class ControlServer:
+    """
+    bind 済みのソケットで制御リクエストを受け付ける。
+    handlers は {"status": callable(args) -> dict, ...}。例外はエラー応答として返す。
+    """
+
+    def __init__(self, sock, handlers, token_file=TOKEN_FILE):
+        self.sock = sock
+        self.handlers = handlers
+        self.token_file = token_file
+        self.token = None
+        self._thread = None
+
+    def start(self):
+        self.token = _write_token(self.token_file)
+        self.sock.listen(8)
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+        logger.info(f"Control API listening on {CONTROL_HOST}:{self.sock.getsockname()[1]}")
+        return self
+
+    def close(self):
+        try:
+            os.remove(self.token_file)
+        except OSError:
+            pass
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn, conn.makefile("rb") as rfile:
+            while True:
+                line = rfile.readline(MAX_LINE)
+                if not line:
+                    return
+                if not line.strip():
+                    continue
+                response = self._dispatch(line)
+                try:
+                    conn.sendall(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                except OSError:
+                    return
+
+    def _dispatch(self, line):
+        try:
+            request = json.loads(line.decode("utf-8"))
+        except ValueError:
+            return {"ok": False, "error": "invalid JSON"}
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "request must be an object"}
+        if not hmac.compare_digest(str(request.get("token", "")), self.token):
+            return {"ok": False, "error": "invalid token"}
+        cmd = str(request.get("cmd", "")).lower()
+        handler = self.handlers.get(cmd)
+        if handler is None:
+            return {"ok": False, "error": f"unknown command: {cmd}", "commands": sorted(self.handlers)}
+        try:
+            return {"ok": True, "result": handler(request.get("args") or {})}
+        except Exception as e:
+            logger.warning(f"Control command {cmd} failed: {e}")
+            return {"ok": False, "error": str(e)}
+
+
+class ControlClient:
+    """制御APIのクライアント。接続は使い回す。"""
+
+    def __init__(self, host=CONTROL_HOST, port=CONTROL_PORT, token=None, timeout=2.0):
+        self.address = (host, port)
+        self.token = token
+        self.timeout = timeout
+        self._sock = None
+        self._rfile = None
+
+    def _connect(self):
+        if self.token is None:
+            self.token = read_token()
+        try:
+            self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        except OSError as e:
+            raise ControlError(f"Daemon not reachable: {e}")
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._rfile = self._sock.makefile("rb")
+
+    def request(self, cmd, **args):
+        if self._sock is None:
+            self._connect()
+        payload = json.dumps({"token": self.token, "cmd": cmd, "args": args}).encode("utf-8") + b"\n"
+        try:
+            self._sock.sendall(payload)
+            line = self._rfile.readline(MAX_LINE)
+        except OSError as e:
+            self.close()
+            raise ControlError(f"Connection lost: {e}")
+        if not line:
+            self.close()
+            raise ControlError("Connection closed by daemon")
+        response = json.loads(line.decode("utf-8"))
+        if not response.get("ok"):
+            raise ControlError(response.get("error", "request failed"))
+        return response.get("result")
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._rfile.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._rfile = None
+
+
+def request(cmd, timeout=2.0, **args):
+    """1回だけのリクエスト（GUI等から）"""
+    client = ControlClient(timeout=timeout)
+    try:
+        return client.request(cmd, **args)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Control the running STT daemon")
+    parser.add_argument("command", choices=["status", "start", "stop", "toggle", "cancel", "reload", "metrics", "memdump", "profile", "ping"])
+    parser.add_argument("--keys", nargs="*", default=None, help="reload: only apply these config keys")
+    parser.add_argument("--inline", action="store_true", help="memdump: print the timeline instead of writing a file")
+    parser.add_argument("--count", type=int, default=None, help="profile: profile the next N utterances (0 = cancel)")
+    parser.add_argument("--mode", choices=["cprofile", "sampling"], default=None, help="profile: profiler to use")
+    parser.add_argument("--interval-ms", type=float, default=None, help="profile: sampling interval")
+    parser.add_argument("--bench", type=int, default=0, help="Send the command N times and report round-trip time")
+    args = parser.parse_args()
+
+    extra = {"keys": args.keys} if args.command == "reload" and args.keys else {}
+    if args.command == "memdump" and args.inline:
+        extra = {"inline": True}
+    if args.command == "profile":
+        extra = {"count": args.count, "mode": args.mode, "interval_ms": args.interval_ms}
+    client = ControlClient(timeout=10.0)
+    try:
+        if args.bench:
+            samples = []
+            for _ in range(args.bench):
+                t0 = time.perf_counter()
+                client.request(args.command, **extra)
+                samples.append((time.perf_counter() - t0) * 1000)
+            samples.sort()
+            print(json.dumps({"count": len(samples), "p50_ms": round(samples[len(samples) // 2], 3),
+                              "max_ms": round(samples[-1], 3)}, indent=2))
+        else:
+            print(json.dumps(client.request(args.command, **extra), indent=2, ensure_ascii=False))
+    except ControlError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
@@ -2,13 +2,22 @@
 """
 モデルのダウンロードと最適化を行うスクリプト。
 引数でモデルIDを受け取るか、config.json から取得します。
+--from-transformers を付けると、手元の Transformers 形式の Whisper (ファインチューニングしたもの等) を
+--quantization ごとに CTranslate2 形式へ変換し、models/<名前>-<量子化> に書き出して計測する。
+サイズ・ロード時間・RTF は各フォルダの stt_model.json に残る（GUI に表示される）。
+
+ダウンロードは model_downloader で行う（並列・再開可能・ハッシュ検証付き）。
+中断しても、もう一度実行すれば続きから取得する。
+進捗は1ファイルにつき1行の "@@PROGRESS {json}" として標準出力に出す（GUI が読み取って表示する）。
 """
 import os
 import sys
 import shutil
 import json
 import logging
-from faster_whisper import download_model
+import argparse
+import model_downloader
+import model_converter
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - [CONVERT] %(message)s')
@@ -17,12 +26,65 @@ logger = logging.getLogger("Converter")
 CONFIG_FILE = "config.json"
 MODELS_DIR = "models"
 
+PROGRESS_PREFIX = "@@PROGRESS "
+
+
+def report_progress(name, done, total, rate):
+    """GUI 向けの進捗行"""
+    print(PROGRESS_PREFIX + json.dumps({"file": name, "done": done, "total": total, "rate": rate}), flush=True)
+
+
+def convert_local(args):
+    """Transformers 形式のフォルダを量子化ごとに変換して計測する"""
+    source = os.path.abspath(os.path.expanduser(args.from_transformers))
+    name = args.name or os.path.basename(source.rstrip(os.sep))
+    failed = False
+    for quantization in args.quantization or ["int8"]:
+        output_dir = os.path.abspath(os.path.join(MODELS_DIR, f"{name}-{quantization}"))
+        try:
+            model_converter.convert(source, output_dir, quantization, force=args.force)
+            if not args.no_benchmark:
+                model_converter.benchmark(output_dir, args.device, args.bench_audio)
+        except model_converter.ConversionError as e:
+            logger.error(str(e))
+            failed = True
+            continue
+        except Exception as e:
+            # 計測だけの失敗なら変換結果は残す
+            logger.error(f"Benchmark failed for {output_dir}: {e}")
+            failed = True
+            continue
+        print(f"\n[SUCCESS] Model '{name}-{quantization}' is ready: {output_dir}")
+    if failed:
+        exit(1)
+
+
 def main():
     logger.info("--- Model Setup / Update ---")
+    parser = argparse.ArgumentParser(description="Download or convert a Whisper model into models/ (CTranslate2 format)")
+    parser.add_argument("model_id", nargs="?", default=None)
+    parser.add_argument("--revision", default="main")
+    parser.add_argument("--connections", type=int, default=model_downloader.DEFAULT_CONNECTIONS,
+                        help="Parallel ranged connections")
+    parser.add_argument("--from-transformers", metavar="DIR",
+                        help="Convert a local Transformers Whisper folder instead of downloading")
+    parser.add_argument("--quantization", action="append", choices=model_converter.QUANTIZATIONS,
+                        help="Quantization of a converted variant (repeatable, default: int8)")
+    parser.add_argument("--name", help="Output folder prefix for converted variants (default: source folder name)")
+    parser.add_argument("--force", action="store_true", help="Overwrite existing converted variants")
+    parser.add_argument("--benchmark", action="store_true", help="Also measure load time and RTF of a downloaded model")
+    parser.add_argument("--no-benchmark", action="store_true", help="Skip measuring converted variants")
+    parser.add_argument("--device", default=None, help="Device for the benchmark (default: cuda if available)")
+    parser.add_argument("--bench-audio", default=None, help="Audio file for the RTF benchmark (default: 30 s of noise)")
+    args = parser.parse_args()
+
+    if args.from_transformers:
+        convert_local(args)
+        return
     
     # 1. コマンドライン引数からモデルIDを取得（GUIから渡される）
-    if len(sys.argv) > 1:
-        model_id = sys.argv[1]
+    if args.model_id:
+        model_id = args.model_id
         logger.info(f"Model ID from argument: {model_id}")
     else:
         # フォールバック: config.jsonから読み取る
@@ -45,15 +107,18 @@ def main():
     
     logger.info(f"Setting up model in: {output_dir}")
     
-    # 既存の入れ子になった古い形式などがあれば、ユーザーが混乱するため
-    # 既存のフォルダがある場合はそのまま download_model に任せる（faster-whisperが適切に更新する）
+    # 既存のフォルダがある場合は、検証済みのファイルを飛ばして差分と途中のファイルだけを取得する
     
     try:
-        # download_model は CTranslate2 形式でダウンロード/キャッシュしてくれる
-        # local_files_only=False で Hugging Face から取得
-        # 指定した output_dir に直接展開されるようにする
-        path = download_model(model_id, output_dir=output_dir)
+        # CTranslate2 形式のリポジトリから必要なファイルだけを output_dir に直接取得する
+        path = model_downloader.download_model(
+            model_id, output_dir, revision=args.revision,
+            connections=args.connections, progress=report_progress,
+        )
         logger.info(f"Success! Model prepared at: {path}")
+        model_converter.write_metadata(path, source=model_id, kind="downloaded", revision=args.revision)
+        if args.benchmark:
+            model_converter.benchmark(path, args.device, args.bench_audio)
         
         print(f"\n[SUCCESS] Model '{model_name}' is ready.")
         
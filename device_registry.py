@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Device Registry - 入力デバイスの対応チャンネル数・サンプルレートを1度だけ調べて共有する
+各入力デバイスを1台ずつ調べ (sd.check_input_settings: 実際に録音はしない)、結果を device_registry.json に残す。
+PortAudio のデバイス問い合わせはスレッドセーフではないので並列にはしない（調べ済みのデバイスは調べ直さない）。
+デーモン・ワーカー・GUI・mic_checker はここを参照し、録音のたびにデバイスへ問い合わせたり
+チャンネル数を推測したりしない。
+
+- 調べた結果はデバイスの識別子 ("<ホストAPI>/<デバイス名>") ごとに持つ。番号は挿抜で変わるので、
+  列挙し直した時に識別子から引き直す
+- Linux では /proc/asound/cards と /dev/snd の内容を挿抜の印として保存し、変わっていなければ
+  PortAudio を初期化せずに保存済みの一覧を使う（他の OS ではプロセスごとに列挙だけは行う）
+- 挿抜を検知したら PortAudio を初期化し直して列挙し、新しいデバイスだけを調べる。
+  初期化し直せない時（録音ストリームを開いている間）は挿抜の印を更新せず、次に初期化し直せる時まで待つ
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger("DeviceRegistry")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_FILE = os.path.join(PROJECT_ROOT, "device_registry.json")
+
+# 対応を調べるサンプルレート
+CANDIDATE_RATES = (16000, 22050, 32000, 44100, 48000)
+# 挿抜の確認 (stat と listdir) の最短間隔 (秒)
+HOTPLUG_CHECK_INTERVAL = 1.0
+# 挿抜の印が取れない変化 (PulseAudio の仮想デバイスなど) に備えて、これより古い一覧は列挙し直す
+MAX_AGE = 24 * 3600
+
+
+def _os_signature():
+    """挿抜で変わる OS 側の印。取れない OS では None"""
+    try:
+        with open("/proc/asound/cards", "r") as f:
+            cards = f.read()
+        return cards + "|" + ",".join(sorted(os.listdir("/dev/snd")))
+    except OSError:
+        return None
+
+
+def _supported(sd, index, channels, rate):
+    try:
+        sd.check_input_settings(device=index, channels=channels, samplerate=rate, dtype="float32")
+        return True
+    except Exception:
+        return False
+
+
+def _probe(sd, entry):
+    """1デバイス分: 開けるチャンネル数 (少ない順) と、そのチャンネル数で使えるサンプルレート"""
+    index = entry["index"]
+    max_in = entry["max_input_channels"]
+    default_rate = int(entry["default_samplerate"] or 44100)
+    channels = [c for c in sorted({1, 2, max_in}) if 0 < c <= max_in and _supported(sd, index, c, default_rate)]
+    base = channels[0] if channels else min(max_in, 2)
+    rates = [r for r in sorted(set(CANDIDATE_RATES) | {default_rate}) if _supported(sd, index, base, r)]
+    return dict(entry, channels=channels, sample_rates=rates, probed_at=time.time())
+
+
+class DeviceRegistry:
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = None
+        self._checked_at = 0.0
+
+    # --- 永続化 ---
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, state):
+        # 複数のプロセスが同時に書くことがあるので、一時ファイルはプロセスごとに分ける
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save device registry: {e}")
+
+    # --- 列挙と調査 ---
+
+    def _enumerate(self, reinit=False):
+        """(sd, 入力デバイス, 既定の入力番号, 初期化し直したか)"""
+        import sounddevice as sd
+        reinitialized = False
+        if reinit:
+            # PortAudio はデバイス一覧を初期化時に固定するので、挿抜後は初期化し直す。
+            # sounddevice には公開の再スキャン API が無く、非公開の _terminate / _initialize を使うしかない。
+            # 将来の版で無くなった場合は初期化し直さず、印も更新しない（列挙が古いままだと分かるように）
+            terminate = getattr(sd, "_terminate", None)
+            initialize = getattr(sd, "_initialize", None)
+            if callable(terminate) and callable(initialize):
+                terminate()
+                initialize()
+                reinitialized = True
+            else:
+                logger.warning("sounddevice cannot reinitialize PortAudio; new devices need a restart to appear")
+        hostapis = sd.query_hostapis()
+        entries = []
+        for info in sd.query_devices():
+            if info["max_input_channels"] <= 0:
+                continue
+            hostapi = hostapis[info["hostapi"]]["name"]
+            entries.append({
+                "id": f"{hostapi}/{info['name']}",
+                "index": info["index"],
+                "name": info["name"],
+                "hostapi": hostapi,
+                "max_input_channels": info["max_input_channels"],
+                "default_samplerate": info["default_samplerate"],
+            })
+        try:
+            default_index = sd.query_devices(kind="input")["index"]
+        except Exception:
+            default_index = None
+        return sd, entries, default_index, reinitialized
+
+    def _refresh_locked(self, previous=None, reinit=False):
+        started = time.monotonic()
+        # 列挙より前に取る（列挙中の挿抜は次の確認で拾う）
+        signature = _os_signature()
+        try:
+            sd, entries, default_index, reinitialized = self._enumerate(reinit)
+        except Exception as e:
+            logger.warning(f"Could not enumerate audio devices: {e}")
+            self._state = {"os_signature": None, "updated_at": time.time(), "default_index": None, "devices": []}
+            return self._state
+
+        known = {d["id"]: d for d in (previous or {}).get("devices", [])}
+        devices, to_probe = [], []
+        for entry in entries:
+            cached = known.get(entry["id"])
+            if cached and cached["max_input_channels"] == entry["max_input_channels"] \
+                    and cached["default_samplerate"] == entry["default_samplerate"]:
+                # 調べ済みのデバイス: 番号だけ今の列挙に合わせる
+                devices.append(dict(cached, index=entry["index"]))
+            else:
+                to_probe.append(entry)
+        # PortAudio の問い合わせはスレッドセーフではないので1台ずつ
+        devices += [_probe(sd, entry) for entry in to_probe]
+        devices.sort(key=lambda d: d["index"])
+
+        if previous and not reinitialized:
+            # 初期化し直していない列挙は、このプロセスで PortAudio を初期化した時点の一覧かもしれない。
+            # 印を新しくすると以後の挿抜確認で差が出なくなるので、前の印を残して次の確認で列挙し直させる
+            signature = previous.get("os_signature")
+        self._state = {
+            "os_signature": signature,
+            "updated_at": time.time(),
+            "default_index": default_index,
+            "devices": devices,
+        }
+        self._save(self._state)
+        logger.info(f"Device registry refreshed: {len(devices)} input device(s), {len(to_probe)} probed "
+                    f"in {(time.monotonic() - started) * 1000:.0f} ms")
+        return self._state
+
+    def _ensure(self):
+        if self._state is not None:
+            return self._state
+        with self._lock:
+            if self._state is None:
+                saved = self._load()
+                signature = _os_signature()
+                if saved and signature is not None and saved.get("os_signature") == signature \
+                        and time.time() - saved.get("updated_at", 0) < MAX_AGE:
+                    self._state = saved
+                else:
+                    self._refresh_locked(previous=saved)
+            return self._state
+
+    # --- 公開 API ---
+
+    def refresh(self, force=False, reinit=False):
+        """列挙し直す。force なら調べ済みの結果も捨てて全デバイスを調べ直す"""
+        with self._lock:
+            previous = None if force else (self._state or self._load())
+            return self._refresh_locked(previous, reinit=reinit)
+
+    def invalidate(self):
+        """次に参照した時に列挙し直させる（デバイスを開けなかった時など）"""
+        with self._lock:
+            self._state = None
+            self._checked_at = 0.0
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def check_hotplug(self, reinit=True):
+        """
+        挿抜があれば列挙し直して True を返す。stat と listdir だけなので録音開始前に呼んでよい。
+        reinit=True は PortAudio を初期化し直すので、そのプロセスでストリームを開いていない時だけ使うこと。
+        reinit=False では初期化し直さない限り新しい一覧は取れないので、何もせず次の reinit=True の確認に任せる
+        """
+        now = time.monotonic()
+        if now - self._checked_at < HOTPLUG_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        state = self._ensure()
+        signature = _os_signature()
+        if signature is None or signature == state.get("os_signature"):
+            return False
+        if not reinit:
+            logger.info("Audio device change detected; refresh deferred until the input stream is closed")
+            return False
+        logger.info("Audio device change detected, refreshing registry")
+        with self._lock:
+            self._refresh_locked(previous=self._state, reinit=reinit)
+        return True
+
+    def devices(self):
+        return list(self._ensure()["devices"])
+
+    def lookup(self, index=None, name=None):
+        """番号 (None は既定の入力デバイス) で引く。name があり番号の指す先と違えば名前で引き直す"""
+        state = self._ensure()
+        if index is None:
+            index = state.get("default_index")
+        by_index = next((d for d in state["devices"] if d["index"] == index), None)
+        if name and (by_index is None or by_index["name"] != name):
+            by_name = next((d for d in state["devices"] if d["name"] == name), None)
+            if by_name is not None:
+                return by_name
+        return by_index
+
+    def capture_settings(self, index=None, name=None, sample_rate=44100):
+        """
+        録音に使う {"device", "channels", "sample_rate", "name"}。
+        チャンネル数は開ける中で最も少ないもの、サンプルレートは要求値が使えなければ近い対応値
+        """
+        entry = self.lookup(index, name)
+        if entry is None:
+            return {"device": index, "channels": 1, "sample_rate": sample_rate, "name": None}
+        channels = entry["channels"][0] if entry["channels"] else min(entry["max_input_channels"], 2)
+        rates = entry["sample_rates"]
+        if rates and sample_rate not in rates:
+            # 要求より高いものを優先（ダウンサンプルは劣化しない）
+            higher = [r for r in rates if r > sample_rate]
+            sample_rate = min(higher) if higher else max(rates)
+        return {
+            # 既定デバイスは None のまま開く（OS 側の既定の切り替えに従う）
+            "device": entry["index"] if (index is not None or name) else None,
+            "channels": channels,
+            "sample_rate": sample_rate,
+            "name": entry["name"],
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """プロセス内で共有するレジストリ"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = DeviceRegistry()
+    return _registry
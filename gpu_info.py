@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+GPU Info - NVML (nvidia-ml-py) によるプロセス内からの GPU 問い合わせ
+nvidia-smi をサブプロセスで起動せず、NVML を一度だけ初期化して共有する。
+pynvml が無い、または NVIDIA ドライバが無い環境では available() が False になり、
+各関数は None / 空を返す（呼び出し側で CPU/RAM 表示へ切り替える）。
+"""
+import os
+import logging
+import threading
+
+logger = logging.getLogger("GPUInfo")
+
+_lock = threading.Lock()
+_nvml = None
+_handles = None
+_init_failed = False
+
+
+def _get_nvml():
+    """初期化済みの pynvml モジュールを返す（失敗したら以後は試さない）"""
+    global _nvml, _handles, _init_failed
+    if _nvml is not None or _init_failed:
+        return _nvml
+    with _lock:
+        if _nvml is not None or _init_failed:
+            return _nvml
+        try:
+            import pynvml
+            pynvml.nvmlInit()
+            count = pynvml.nvmlDeviceGetCount()
+            _handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(count)]
+            _nvml = pynvml
+        except Exception as e:
+            logger.debug(f"NVML unavailable: {e}")
+            _init_failed = True
+    return _nvml
+
+
+def available():
+    return _get_nvml() is not None and bool(_handles)
+
+
+def device_count():
+    return len(_handles) if _get_nvml() is not None else 0
+
+
+def _decode(value):
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+
+
+def device_info(index=0):
+    """
+    GPU の状態: {"name", "used_mb", "total_mb", "util", "temp"}。
+    取得できない項目は None。GPU が無ければ None。
+    """
+    nvml = _get_nvml()
+    if nvml is None or index >= len(_handles):
+        return None
+    handle = _handles[index]
+    info = {"index": index, "name": None, "used_mb": None, "total_mb": None, "util": None, "temp": None}
+    try:
+        info["name"] = _decode(nvml.nvmlDeviceGetName(handle))
+        memory = nvml.nvmlDeviceGetMemoryInfo(handle)
+        info["used_mb"] = memory.used / (1024 * 1024)
+        info["total_mb"] = memory.total / (1024 * 1024)
+    except Exception as e:
+        logger.debug(f"NVML memory query failed: {e}")
+        return None
+    try:
+        info["util"] = nvml.nvmlDeviceGetUtilizationRates(handle).gpu
+    except Exception:
+        pass
+    try:
+        info["temp"] = nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU)
+    except Exception:
+        pass
+    return info
+
+
+def process_memory_mb(pid=None):
+    """
+    指定プロセスが全 GPU で確保しているメモリ (MB)。
+    GPU が無い、またはドライバが値を返さない (コンテナ内など) 場合は None。
+    """
+    nvml = _get_nvml()
+    if nvml is None:
+        return None
+    pid = os.getpid() if pid is None else pid
+    total = None
+    for handle in _handles:
+        # 同じプロセスが compute と graphics の両方に出ることがあるので GPU ごとに大きい方を取る
+        used_on_device = None
+        for query in (nvml.nvmlDeviceGetComputeRunningProcesses, nvml.nvmlDeviceGetGraphicsRunningProcesses):
+            try:
+                processes = query(handle)
+            except Exception:
+                continue
+            for process in processes:
+                used = getattr(process, "usedGpuMemory", None)
+                if process.pid == pid and used is not None:
+                    used_on_device = max(used_on_device or 0, used)
+        if used_on_device is not None:
+            total = (total or 0) + used_on_device / (1024 * 1024)
+    return total
+
+
+def shutdown():
+    global _nvml, _handles, _init_failed
+    with _lock:
+        if _nvml is not None:
+            try:
+                _nvml.nvmlShutdown()
+            except Exception:
+                pass
+        _nvml = None
+        _handles = None
+        _init_failed = False
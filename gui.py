@@ -1,9 +1,12 @@
 import flet as ft
 import config_manager
 import os
+import json
 import threading
 import i18n
 import platform_utils
+import model_converter
+import model_catalogue
 
 def main(page: ft.Page):
     config = config_manager.load_config()
@@ -291,6 +294,44 @@ def main(page: ft.Page):
         hint_text=t("custom_model_hint"),
         value=model_id if raw_mode == "custom" else "",
     )
+
+    # 選択中のモデルの量子化・サイズ・ロード時間・RTF (convert_model.py が書く stt_model.json)
+    def describe_model(selected):
+        if not selected:
+            return ""
+        model_dir = model_converter.local_model_dir(selected)
+        if not os.path.isfile(os.path.join(model_dir, "model.bin")):
+            return t("model_info_missing")
+        meta = model_converter.read_metadata(model_dir) or {}
+        parts = [meta["quantization"]] if meta.get("quantization") else []
+        size = meta.get("size_bytes") or model_converter.directory_size(model_dir)
+        parts.append(t("model_info_size", size=size / 1e6))
+        bench = meta.get("benchmark")
+        if bench:
+            parts.append(t("model_info_load", seconds=bench["load_seconds"]))
+            if bench.get("rtf") is not None:
+                parts.append(t("model_info_rtf", rtf=bench["rtf"], device=bench["device"],
+                               compute_type=bench.get("compute_type") or "-"))
+        else:
+            parts.append(t("model_info_unmeasured"))
+        return " · ".join(parts)
+
+    txt_model_info = ft.Text(describe_model(dd_model.value), size=12, color="grey")
+    txt_custom_model_info = ft.Text(describe_model(txt_custom_model.value.strip()), size=12, color="grey")
+
+    def refresh_model_info(e=None):
+        txt_model_info.value = describe_model(dd_model.value)
+        txt_custom_model_info.value = describe_model(txt_custom_model.value.strip())
+        page.update()
+
+    dd_model.on_change = refresh_model_info
+    txt_custom_model.on_blur = refresh_model_info
+
+    # ローカル推論の device / compute_type（推薦を適用すると置き換わる）
+    local_runtime = {
+        "device": config.get("local_device", "cuda"),
+        "compute_type": config.get("local_compute_type", "int8"),
+    }
     
     # Device Selection
     current_device_index = config.get("device_index")
@@ -306,6 +347,12 @@ def main(page: ft.Page):
         device_options.append(ft.dropdown.Option(key=str(d["id"]), text=d["name"]))
     
     current_device_str = str(current_device_index) if is_manual_mic else None
+    # 挿抜で番号がずれていたら、保存したデバイス名で選び直す
+    saved_device_name = config.get("device_name")
+    if is_manual_mic and saved_device_name:
+        same_name = [d for d in devices if d["name"] == saved_device_name]
+        if same_name and not any(str(d["id"]) == current_device_str for d in same_name):
+            current_device_str = str(same_name[0]["id"])
     if current_device_str and not any(d.key == current_device_str for d in device_options):
         current_device_str = None
         if device_options:
@@ -352,9 +399,6 @@ def main(page: ft.Page):
     original_config = copy.deepcopy(config)
 
     def save_settings(e):
-        import signal as sig
-        import subprocess
-        
         try:
             # オンラインプロバイダ設定の保存
             prov = dd_provider.value
@@ -404,11 +448,13 @@ def main(page: ft.Page):
             
             if not cb_manual_mic.value or not dd_device.value:
                 config["device_index"] = None
+                config["device_name"] = None
             else:
                 try:
                     config["device_index"] = int(dd_device.value)
                 except ValueError:
                     config["device_index"] = dd_device.value
+                config["device_name"] = next((d["name"] for d in devices if str(d["id"]) == dd_device.value), None)
             
             try:
                 config["speed_factor"] = float(txt_speed.value)
@@ -428,7 +474,8 @@ def main(page: ft.Page):
                 if key in config:
                     del config[key]
             
-            config["local_compute_type"] = "int8"
+            config["local_device"] = local_runtime["device"]
+            config["local_compute_type"] = local_runtime["compute_type"]
             
             # 変更差分を検出
             changes = []
@@ -440,6 +487,7 @@ def main(page: ft.Page):
                 ("model_mode", t("model_mode_label")),
                 ("local_model_id", t("model_select")),
                 ("local_model_timeout", t("timeout_label")),
+                ("local_compute_type", t("compute_type_label")),
                 ("speed_factor", t("speed_factor")),
                 ("add_punctuation", t("add_punctuation")),
                 ("auto_start", t("auto_start")),
@@ -462,18 +510,12 @@ def main(page: ft.Page):
             # 自動起動の設定反映
             platform_utils.set_autostart(cb_auto_start.value)
             
-            # デーモンにSIGUSR1を送信して再読み込み
+            # 制御API経由でデーモンに再読み込みさせる
             daemon_restarted = False
             try:
-                result = subprocess.run(
-                    ["pgrep", "-f", "stt_daemon.py"],
-                    capture_output=True, text=True, timeout=3
-                )
-                pids = result.stdout.strip().split("\n")
-                for pid_str in pids:
-                    if pid_str.strip():
-                        os.kill(int(pid_str.strip()), sig.SIGUSR1)
-                        daemon_restarted = True
+                import control_api
+                control_api.request("reload", timeout=10.0)
+                daemon_restarted = True
             except Exception:
                 pass
             
@@ -519,8 +561,27 @@ def main(page: ft.Page):
                     cwd=os.getcwd()
                 )
                 
+                # ダウンロードの進捗行はファイルごとに1行へまとめて書き換える
+                log_text = txt_console.value
+                progress_lines = {}
                 for line in process.stdout:
-                    txt_console.value += line
+                    if line.startswith("@@PROGRESS "):
+                        try:
+                            p = json.loads(line[len("@@PROGRESS "):])
+                        except ValueError:
+                            continue
+                        total = p["total"] or 0
+                        progress_lines[p["file"]] = t(
+                            "console_progress",
+                            file=p["file"],
+                            percent=100 * p["done"] / total if total else 100.0,
+                            done=p["done"] / 1e6,
+                            total=total / 1e6,
+                            rate=p["rate"] / 1e6,
+                        )
+                    else:
+                        log_text += line
+                    txt_console.value = log_text + "".join(f"{v}\n" for v in progress_lines.values())
                     page.update()
                     
                 process.wait()
@@ -531,7 +592,7 @@ def main(page: ft.Page):
                     stderr = process.stderr.read()
                     txt_console.value += t("console_error", error=stderr)
                 
-                page.update()
+                refresh_model_info()
 
             except Exception as ex:
                 txt_console.value += f"\nException: {ex}"
@@ -542,6 +603,88 @@ def main(page: ft.Page):
     btn_convert = ft.ElevatedButton(t("btn_convert"), on_click=run_converter, icon="download")
     txt_console = ft.Text(value="", font_family="Consolas", size=12)
 
+    # Model Recommendation (model_catalogue.json の計測結果から)
+    target_latency_ms = config.get("model_target_latency_ms", model_catalogue.DEFAULT_TARGET_LATENCY_MS)
+    recommendation = {"entry": None}
+    txt_recommendation = ft.Text("", size=13)
+    txt_calibration_status = ft.Text("", size=12, color="grey")
+
+    def refresh_recommendation():
+        rec = model_catalogue.recommend(model_catalogue.load(), target_latency_ms)
+        recommendation["entry"] = rec
+        if rec is None:
+            txt_recommendation.value = t("recommend_none")
+        else:
+            txt_recommendation.value = t(
+                "recommend_result", model=rec["model_id"], device=rec["device"],
+                compute_type=rec["compute_type"], latency=rec["latency_ms"],
+            )
+            if not rec["meets_target"]:
+                txt_recommendation.value += "\n" + t("recommend_over_target", target=target_latency_ms)
+        btn_apply_recommendation.disabled = rec is None
+
+    def daemon_model_loaded():
+        """常駐中のデーモンがモデルを保持しているか（同じ GPU で測るとメモリ不足や処理の停滞を招く）"""
+        try:
+            import control_api
+            return bool(control_api.request("status", timeout=1.0).get("model_loaded"))
+        except Exception:
+            # デーモンが動いていない
+            return False
+
+    def run_calibration(e=None):
+        def _task():
+            import subprocess
+            btn_calibrate.disabled = True
+            page.update()
+            if daemon_model_loaded():
+                txt_calibration_status.value = t("calibration_daemon_busy")
+                btn_calibrate.disabled = False
+                page.update()
+                return
+            txt_calibration_status.value = ""
+            page.update()
+            try:
+                process = subprocess.Popen(
+                    ["python", "model_catalogue.py", "calibrate"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    cwd=os.getcwd()
+                )
+                for line in process.stdout:
+                    if line.strip():
+                        txt_calibration_status.value = t("calibration_running", line=line.strip())
+                        page.update()
+                process.wait()
+                txt_calibration_status.value = t("calibration_done")
+            except Exception as ex:
+                txt_calibration_status.value = f"Exception: {ex}"
+            btn_calibrate.disabled = False
+            refresh_recommendation()
+            page.update()
+
+        threading.Thread(target=_task, daemon=True).start()
+
+    def apply_recommendation(e):
+        rec = recommendation["entry"]
+        if rec is None:
+            return
+        if rec["model_id"] in preset_keys:
+            rg_mode.value = "local"
+            dd_model.value = rec["model_id"]
+        else:
+            rg_mode.value = "custom"
+            txt_custom_model.value = rec["model_id"]
+        local_runtime["device"] = rec["device"]
+        local_runtime["compute_type"] = rec["compute_type"]
+        on_mode_change(None)
+        refresh_model_info()
+
+    btn_calibrate = ft.ElevatedButton(t("btn_calibrate"), on_click=run_calibration, icon="speed")
+    btn_apply_recommendation = ft.ElevatedButton(t("btn_apply_recommendation"), on_click=apply_recommendation, icon="check")
+    refresh_recommendation()
+
     # --- Grouping & Layout Logic ---
 
     # 1. General Settings Group
@@ -589,6 +732,7 @@ def main(page: ft.Page):
         ft.Text(t("local_model_settings"), size=18, weight="bold"),
         ft.Divider(),
         dd_model,
+        txt_model_info,
         btn_convert,
         ft.Text(t("convert_help"), size=12, color="grey"),
         ft.Container(
@@ -612,6 +756,7 @@ def main(page: ft.Page):
         ft.Text(t("custom_model"), size=18, weight="bold"),
         ft.Divider(),
         txt_custom_model,
+        txt_custom_model_info,
     ])
 
     card_custom_settings = ft.Card(
@@ -637,12 +782,28 @@ def main(page: ft.Page):
         visible=(raw_mode in ["local", "custom"])
     )
 
+    # Model Recommendation (Visible for both local and custom)
+    card_recommendation = ft.Card(
+        content=ft.Container(
+            padding=15,
+            content=ft.Column([
+                ft.Text(t("model_recommendation"), size=18, weight="bold"),
+                ft.Divider(),
+                txt_recommendation,
+                ft.Row([btn_calibrate, btn_apply_recommendation]),
+                txt_calibration_status,
+            ])
+        ),
+        visible=(raw_mode in ["local", "custom"])
+    )
+
     def on_mode_change(e):
         mode = rg_mode.value
         container_online.visible = (mode == "online")
         card_local_settings.visible = (mode == "local")
         card_custom_settings.visible = (mode == "custom")
         card_memory_settings.visible = (mode in ["local", "custom"])
+        card_recommendation.visible = (mode in ["local", "custom"])
         page.update()
 
     rg_mode.on_change = on_mode_change
@@ -678,9 +839,15 @@ def main(page: ft.Page):
         card_inference,
         card_local_settings,
         card_custom_settings,
+        card_recommendation,
         card_memory_settings,
         ft.Container(height=20),
     )
 
+    # 初回起動時（このマシンの計測結果が無い時）は測定を促すだけにする（数分かかり、GPU も使うため）
+    if model_catalogue.needs_calibration():
+        txt_calibration_status.value = t("calibration_prompt")
+        page.update()
+
 if __name__ == "__main__":
     ft.app(target=main)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Hub Stub Server - Hugging Face Hub のローカル代替サーバ
+インターネットなしで model_downloader.py (convert_model.py) の並列取得・再開・ハッシュ検証を
+確認するためのもの。標準ライブラリのみで動作する。
+
+--root 配下の <owner>/<name>/ ディレクトリをそれぞれ1つのモデルリポジトリとして公開する。
+    GET /api/models/<repo>/revision/<rev>?blobs=true   ファイル一覧 (サイズ・sha256・blobId)
+    GET /<repo>/resolve/<rev>/<file>                  本体 (Range 対応)
+
+--rate で1接続あたりの転送速度を絞り、--fail-after で1レスポンスあたり指定バイトで
+接続を切れる（中断からの再開を試す用）。
+
+使い方:
+    HF_ENDPOINT=http://127.0.0.1:8766 python convert_model.py owner/name
+    python hub_stub_server.py --root ./hub [--port 8766] [--rate 50] [--fail-after 0]
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("HubStub")
+
+DEFAULT_PORT = 8766
+# この大きさ以上のファイルは LFS として sha256 を載せる（実際の Hub と同様）
+LFS_THRESHOLD = 10 * 1024 * 1024
+_API_PATH = re.compile(r"^/api/models/(?P<repo>[^/]+/[^/]+)/revision/[^/?]+")
+_RESOLVE_PATH = re.compile(r"^/(?P<repo>[^/]+/[^/]+)/resolve/[^/]+/(?P<file>.+)$")
+
+_hash_cache = {}
+_hash_lock = threading.Lock()
+
+
+def _describe(path, name):
+    """ファイル一覧の1項目。ハッシュは (パス, mtime, サイズ) 単位で覚えておく"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime, stat.st_size)
+    with _hash_lock:
+        cached = _hash_cache.get(key)
+    if cached is None:
+        sha256 = hashlib.sha256()
+        blob = hashlib.sha1(f"blob {stat.st_size}\0".encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+                sha256.update(block)
+                blob.update(block)
+        cached = (sha256.hexdigest(), blob.hexdigest())
+        with _hash_lock:
+            _hash_cache[key] = cached
+    entry = {"rfilename": name, "size": stat.st_size, "blobId": cached[1]}
+    if stat.st_size >= LFS_THRESHOLD:
+        entry["lfs"] = {"sha256": cached[0], "size": stat.st_size}
+    return entry
+
+
+class HubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # サーバ単位の設定 (make_server で上書き)
+    root = "."
+    rate = 0.0          # MB/s (0 = 無制限)
+    fail_after = 0      # バイト (0 = 切らない)
+
+    def log_message(self, fmt, *args):
+        logger.debug(fmt % args)
+
+    def _reply_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _repo_dir(self, repo):
+        path = os.path.realpath(os.path.join(self.root, urllib.parse.unquote(repo)))
+        if not path.startswith(os.path.realpath(self.root) + os.sep) or not os.path.isdir(path):
+            return None
+        return path
+
+    def do_GET(self):
+        match = _API_PATH.match(self.path)
+        if match:
+            self._handle_info(match.group("repo"))
+            return
+        match = _RESOLVE_PATH.match(self.path.split("?")[0])
+        if match:
+            self._handle_file(match.group("repo"), urllib.parse.unquote(match.group("file")))
+            return
+        self._reply_json(404, {"error": "not found"})
+
+    def _handle_info(self, repo):
+        repo_dir = self._repo_dir(repo)
+        if repo_dir is None:
+            self._reply_json(404, {"error": "Repository not found"})
+            return
+        siblings = []
+        for base, _, names in os.walk(repo_dir):
+            for name in sorted(names):
+                path = os.path.join(base, name)
+                siblings.append(_describe(path, os.path.relpath(path, repo_dir).replace(os.sep, "/")))
+        self._reply_json(200, {"id": repo, "sha": "stub", "siblings": siblings})
+
+    def _handle_file(self, repo, name):
+        repo_dir = self._repo_dir(repo)
+        path = os.path.realpath(os.path.join(repo_dir, name)) if repo_dir else None
+        if path is None or not path.startswith(repo_dir + os.sep) or not os.path.isfile(path):
+            self._reply_json(404, {"error": "Entry not found"})
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        length = end - start + 1
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+        sent = 0
+        block_size = 256 * 1024
+        started = time.monotonic()
+        with open(path, "rb") as f:
+            f.seek(start)
+            while sent < length:
+                block = f.read(min(block_size, length - sent))
+                if self.fail_after and sent + len(block) > self.fail_after:
+                    # 途中で接続を切る（クライアント側の再開を試す）
+                    self.wfile.write(block[:max(0, self.fail_after - sent)])
+                    self.close_connection = True
+                    return
+                self.wfile.write(block)
+                sent += len(block)
+                if self.rate:
+                    ahead = sent / (self.rate * 1024 * 1024) - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+
+def make_server(root, port=DEFAULT_PORT, rate=0.0, fail_after=0, host="127.0.0.1"):
+    handler = type("ConfiguredHubHandler", (HubHandler,), {
+        "root": os.path.abspath(root), "rate": rate, "fail_after": fail_after,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_in_thread(root, port=0, rate=0.0, fail_after=0):
+    """バックグラウンドスレッドでサーバを起動して返す（port=0 で空きポート）"""
+    server = make_server(root, port=port, rate=rate, fail_after=fail_after)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [HUB] %(message)s')
+    parser = argparse.ArgumentParser(description="Local stand-in for the Hugging Face Hub")
+    parser.add_argument("--root", required=True, help="Directory containing <owner>/<name>/ model folders")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--rate", type=float, default=0.0, help="Per-connection transfer limit in MB/s (0 = unlimited)")
+    parser.add_argument("--fail-after", type=int, default=0, help="Drop each response after this many bytes (0 = never)")
+    args = parser.parse_args()
+
+    server = make_server(args.root, args.port, args.rate, args.fail_after)
+    logger.info(f"Serving {os.path.abspath(args.root)} on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
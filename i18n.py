@@ -64,6 +64,26 @@ TRANSLATIONS = {
         "ui_pos_bottom": "画面下端（デフォルト）",
         "ui_pos_center": "画面中央（少し下）",
         "ui_pos_top": "画面上端",
+        "retry_delivered": "通信エラーで保留していた音声の文字起こしが完了しました。クリップボードと履歴に保存しました",
+        "recovered_delivered": "ワーカーの異常終了で処理できなかった録音を文字起こししました。クリップボードと履歴に保存しました",
+        "console_progress": "{file}: {percent:.1f}% ({done:.0f} / {total:.0f} MB, {rate:.1f} MB/秒)",
+        "model_info_size": "{size:.0f} MB",
+        "model_info_load": "ロード {seconds:.1f} 秒",
+        "model_info_rtf": "RTF {rtf:.3f} ({device}/{compute_type})",
+        "model_info_missing": "未取得",
+        "model_info_unmeasured": "未計測 (python convert_model.py <ID> --benchmark で計測)",
+        "model_recommendation": "モデルの推薦",
+        "btn_calibrate": "性能を測定",
+        "btn_apply_recommendation": "推薦を適用",
+        "recommend_none": "このマシンでの測定結果がありません。「性能を測定」を押してください",
+        "recommend_result": "推薦: {model} ({device}/{compute_type}) — 10秒の発話で約 {latency} ms",
+        "recommend_over_target": "目標 {target} ms を満たす組み合わせが無いため、最も速いものを推薦しています",
+        "calibration_running": "測定中: {line}",
+        "calibration_done": "測定が完了しました",
+        "calibration_prompt": "このマシンではまだ測定していません。「性能を測定」でインストール済みのモデルを順に計測します（数分かかります）",
+        "calibration_daemon_busy": "常駐中のSTTがモデルを読み込んでいるため測定できません。モデルが解放されてから（またはSTTを停止して）もう一度押してください",
+        "compute_type_label": "計算精度 (compute type)",
+        "device_switched": "{old} が使えなくなったため、録音を続けたまま {new} に切り替えました（{ms:.0f} ms、欠落 {lost_ms:.0f} ms）",
     },
     "en": {
         "title": "STT Config Editor",
@@ -136,6 +156,26 @@ TRANSLATIONS = {
         "ui_pos_bottom": "Bottom (Default)",
         "ui_pos_center": "Center",
         "ui_pos_top": "Top",
+        "retry_delivered": "A transcription held back by a network error has completed. It was saved to the clipboard and history",
+        "recovered_delivered": "A recording interrupted by a worker crash has been transcribed. It was saved to the clipboard and history",
+        "console_progress": "{file}: {percent:.1f}% ({done:.0f} / {total:.0f} MB, {rate:.1f} MB/s)",
+        "model_info_size": "{size:.0f} MB",
+        "model_info_load": "load {seconds:.1f} s",
+        "model_info_rtf": "RTF {rtf:.3f} ({device}/{compute_type})",
+        "model_info_missing": "Not downloaded",
+        "model_info_unmeasured": "Not measured (run python convert_model.py <ID> --benchmark)",
+        "model_recommendation": "Model Recommendation",
+        "btn_calibrate": "Measure performance",
+        "btn_apply_recommendation": "Apply recommendation",
+        "recommend_none": "No measurements for this machine yet. Press \"Measure performance\"",
+        "recommend_result": "Recommended: {model} ({device}/{compute_type}) — about {latency} ms for a 10 s utterance",
+        "recommend_over_target": "Nothing meets the {target} ms target, so the fastest combination is recommended",
+        "calibration_running": "Measuring: {line}",
+        "calibration_done": "Measurement finished",
+        "calibration_prompt": "This machine has not been measured yet. \"Measure performance\" benchmarks each installed model (takes a few minutes)",
+        "calibration_daemon_busy": "The running STT daemon has a model loaded, so measuring now could run out of GPU memory. Try again once the model is unloaded (or stop STT)",
+        "compute_type_label": "Compute type",
+        "device_switched": "{old} stopped working, so recording continued on {new} (switched in {ms:.0f} ms, {lost_ms:.0f} ms of audio lost)",
     },
     "zh": {
         "title": "STT 配置编辑器",
@@ -208,6 +248,26 @@ TRANSLATIONS = {
         "ui_pos_bottom": "底部（默认）",
         "ui_pos_center": "中间",
         "ui_pos_top": "顶部",
+        "retry_delivered": "因网络错误暂存的语音已完成转写，结果已保存到剪贴板和历史记录",
+        "recovered_delivered": "因进程异常中断的录音已完成转写，结果已保存到剪贴板和历史记录",
+        "console_progress": "{file}: {percent:.1f}% ({done:.0f} / {total:.0f} MB, {rate:.1f} MB/秒)",
+        "model_info_size": "{size:.0f} MB",
+        "model_info_load": "加载 {seconds:.1f} 秒",
+        "model_info_rtf": "RTF {rtf:.3f} ({device}/{compute_type})",
+        "model_info_missing": "未下载",
+        "model_info_unmeasured": "未测量 (运行 python convert_model.py <ID> --benchmark)",
+        "model_recommendation": "模型推荐",
+        "btn_calibrate": "测量性能",
+        "btn_apply_recommendation": "应用推荐",
+        "recommend_none": "尚无本机的测量结果。请点击“测量性能”",
+        "recommend_result": "推荐: {model} ({device}/{compute_type}) — 10秒语音约 {latency} ms",
+        "recommend_over_target": "没有满足目标 {target} ms 的组合，因此推荐最快的组合",
+        "calibration_running": "测量中: {line}",
+        "calibration_done": "测量完成",
+        "calibration_prompt": "本机尚未测量。点击“测量性能”将依次测量已安装的模型（需要几分钟）",
+        "calibration_daemon_busy": "常驻的 STT 已加载模型，现在测量可能导致显存不足。请在模型卸载后（或停止 STT 后）重试",
+        "compute_type_label": "计算精度 (compute type)",
+        "device_switched": "{old} 已不可用，录音已继续切换到 {new}（切换 {ms:.0f} ms，丢失 {lost_ms:.0f} ms 音频）",
     }
 }
 
@@ -0,0 +1,121 @@
+"""
+IPC Protocol - デーモン・ワーカー・オーバーレイ間のフレーム化メッセージプロトコル
+各メッセージは 4バイト (ビッグエンディアン) の長さプレフィックス + UTF-8 JSON。
+子プロセスの stdin / stdout パイプ上でやり取りし、ログ出力 (stderr) とは完全に分離する。
+
+メッセージ形式:
+    {
+        "v": 1,                 プロトコルバージョン
+        "kind": "cmd",          cmd / ack / status / result / hello
+        "name": "START",        コマンド名・ステータス名
+        "id": "3f2a9c1d0b7e",   リクエストID（発話単位。START と STOP、結果で共通）
+        "ts": 12345.678901,     送信時の time.monotonic()（同一ホスト内でプロセス間比較可能）
+        "payload": {...}        種類ごとのデータ
+    }
+"""
+import json
+import time
+import uuid
+import struct
+import threading
+
+PROTOCOL_VERSION = 1
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+_HEADER = struct.Struct(">I")
+
+# メッセージ種別
+KIND_CMD = "cmd"          # デーモン → 子プロセス
+KIND_ACK = "ack"          # コマンド受理の応答
+KIND_STATUS = "status"    # 状態遷移の通知 (REC / READY / MODEL_ERROR ...)
+KIND_RESULT = "result"    # 発話の文字起こし結果
+KIND_HELLO = "hello"      # 子プロセスの起動完了（import 済み）
+
+
+class ProtocolError(Exception):
+    """フレームが壊れている、またはバージョン不一致"""
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:12]
+
+
+def make_message(kind, name, req_id=None, payload=None):
+    return {
+        "v": PROTOCOL_VERSION,
+        "kind": kind,
+        "name": name,
+        "id": req_id,
+        "ts": time.monotonic(),
+        "payload": payload or {},
+    }
+
+
+def encode(message):
+    body = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(body) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame too large: {len(body)} bytes")
+    return _HEADER.pack(len(body)) + body
+
+
+def _read_exact(stream, size):
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class FrameWriter:
+    """バイナリストリームへメッセージを書き込む（複数スレッドから呼んでよい）"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        frame = encode(message)
+        with self._lock:
+            self.stream.write(frame)
+            self.stream.flush()
+
+    def send_new(self, kind, name, req_id=None, payload=None):
+        self.send(make_message(kind, name, req_id=req_id, payload=payload))
+
+    def close(self):
+        with self._lock:
+            try:
+                self.stream.close()
+            except Exception:
+                pass
+
+
+class FrameReader:
+    """バイナリストリームからメッセージを読み出す。EOF で None を返す。"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self):
+        header = _read_exact(self.stream, _HEADER.size)
+        if header is None:
+            return None
+        (size,) = _HEADER.unpack(header)
+        if size > MAX_FRAME_SIZE:
+            raise ProtocolError(f"Frame too large: {size} bytes")
+        body = _read_exact(self.stream, size)
+        if body is None:
+            return None
+        message = json.loads(body.decode("utf-8"))
+        if message.get("v") != PROTOCOL_VERSION:
+            raise ProtocolError(f"Unsupported protocol version: {message.get('v')}")
+        return message
+
+    def __iter__(self):
+        while True:
+            message = self.read()
+            if message is None:
+                return
+            yield message
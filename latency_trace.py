@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Latency Trace - 発話ごとの処理段階のタイムスタンプ記録
+デーモンとワーカーがそれぞれ time.monotonic() で段階ごとに印を付け、
+ワーカーは結果メッセージに自分の印を載せて返す。デーモンが発話ID単位で両者を合わせ、
+logs/latency.jsonl に1発話1行で書き出す（同一ホストなら monotonic はプロセス間で比較できる）。
+
+各段階の所要時間は「直前の印からその印まで」。total は最初の印から最後の印まで、
+stop_to_output は停止ホットキーから入力完了までで、体感の待ち時間にあたる。
+
+使い方:
+    python latency_trace.py summary [--window 200]
+    python latency_trace.py chrome [--window 200] [--out logs/latency.trace.json]
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger("LatencyTrace")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+LATENCY_LOG = os.path.join(PROJECT_ROOT, "logs", "latency.jsonl")
+MAX_LOG_BYTES = 5 * 1024 * 1024
+
+_write_lock = threading.Lock()
+
+
+class Trace:
+    """1発話分の段階の印。同じ段階を付け直すと時刻だけ更新する（逐次入力の最後の入力など）。"""
+
+    def __init__(self, utterance_id=None):
+        self.id = utterance_id
+        self.marks = {}
+
+    def mark(self, stage, t=None):
+        self.marks[stage] = time.monotonic() if t is None else t
+
+    def mark_once(self, stage, t=None):
+        if stage not in self.marks:
+            self.mark(stage, t)
+
+    def as_payload(self):
+        return dict(self.marks)
+
+    def merge(self, marks):
+        for stage, t in (marks or {}).items():
+            self.marks.setdefault(stage, t)
+
+
+def breakdown(marks):
+    """印の辞書から {段階: 直前の印からの ms} と合計を求める"""
+    ordered = sorted(marks.items(), key=lambda item: item[1])
+    stages = {}
+    for (_, prev_t), (stage, t) in zip(ordered, ordered[1:]):
+        stages[stage] = round((t - prev_t) * 1000, 2)
+    result = {"stages": stages}
+    if ordered:
+        result["total"] = round((ordered[-1][1] - ordered[0][1]) * 1000, 2)
+    if "stop_hotkey" in marks and "output_done" in marks:
+        result["stop_to_output"] = round((marks["output_done"] - marks["stop_hotkey"]) * 1000, 2)
+    return result
+
+
+def write_record(trace, source=None, path=LATENCY_LOG):
+    """合わせ終えた発話を1行書き出す（大きくなったら .1 へ退避）"""
+    record = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "id": trace.id,
+        "source": source,
+        "marks": trace.marks,
+    }
+    record.update(breakdown(trace.marks))
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _write_lock:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > MAX_LOG_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            logger.warning(f"Failed to write latency record: {e}")
+    return record
+
+
+def chrome_trace_events(marks, utterance_id=None, pid=1, tid=1):
+    """
+    段階の印 {段階: monotonic 秒} を Chrome トレース形式のイベント列にする。
+    各段階は「直前の印からその印まで」の区間 (ph "X")。
+    """
+    ordered = sorted(marks.items(), key=lambda item: item[1])
+    events = []
+    if utterance_id is not None:
+        events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": str(utterance_id)}})
+    for (_, prev_t), (stage, t) in zip(ordered, ordered[1:]):
+        events.append({
+            "ph": "X", "name": stage, "cat": "stage", "pid": pid, "tid": tid,
+            "ts": round(prev_t * 1e6, 1), "dur": round((t - prev_t) * 1e6, 1),
+        })
+    return events
+
+
+def write_chrome_trace(events, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def export_chrome_trace(path=LATENCY_LOG, window=200):
+    """直近 window 発話を1発話1行 (tid) の Chrome トレースイベントにする"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()[-window:]
+    except OSError:
+        return []
+    events = []
+    for tid, line in enumerate(lines, 1):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        events.extend(chrome_trace_events(record.get("marks") or {}, record.get("id"), tid=tid))
+    return events
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 2)
+
+
+def summarize(path=LATENCY_LOG, window=200):
+    """直近 window 発話の段階ごとの p50 / p95 / p99 (ms)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()[-window:]
+    except OSError:
+        return {"count": 0}
+    series = {}
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        for stage, ms in record.get("stages", {}).items():
+            series.setdefault(stage, []).append(ms)
+        for key in ("stop_to_output", "total"):
+            if key in record:
+                series.setdefault(key, []).append(record[key])
+    summary = {}
+    for stage, values in series.items():
+        summary[stage] = {
+            "count": len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "p99": _percentile(values, 99),
+        }
+    return {"count": len(lines), "stages": summary}
+
+
+def print_summary(summary):
+    print(f"Utterances: {summary['count']}")
+    if not summary.get("stages"):
+        return
+    print(f"{'stage':<20} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for stage, s in summary["stages"].items():
+        print(f"{stage:<20} {s['count']:>5} {s['p50']:>10.1f} {s['p95']:>10.1f} {s['p99']:>10.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Per-utterance latency breakdown")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary_cmd = sub.add_parser("summary", help="Print p50/p95/p99 per stage over recent utterances")
+    summary_cmd.add_argument("--window", type=int, default=200, help="Number of most recent utterances")
+    summary_cmd.add_argument("--file", default=LATENCY_LOG)
+    summary_cmd.add_argument("--json", action="store_true")
+    chrome_cmd = sub.add_parser("chrome", help="Export recent utterances as Chrome trace events")
+    chrome_cmd.add_argument("--window", type=int, default=200, help="Number of most recent utterances")
+    chrome_cmd.add_argument("--file", default=LATENCY_LOG)
+    chrome_cmd.add_argument("--out", default=os.path.join(PROJECT_ROOT, "logs", "latency.trace.json"))
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        result = summarize(args.file, args.window)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print_summary(result)
+
+    if args.command == "chrome":
+        events = export_chrome_trace(args.file, args.window)
+        print(write_chrome_trace(events, args.out))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Log Setup - デーモン・ワーカー共通のログ出力設定
+ログ呼び出し側は QueueHandler でレコードをキューへ積むだけにし、整形とファイル書き込みは
+QueueListener の専用スレッドで行う（文字起こしの経路でディスク書き込みを待たない）。
+ファイルは RotatingFileHandler で log_max_bytes ごとに切り替え、log_backup_count 世代まで残す。
+
+extra= で渡した項目 (例: logger.info("...", extra={"utterance_id": uid})) は構造化フィールドとして
+テキスト形式では行末に key=value で、log_format が "json" の時は1行1オブジェクトで出力する。
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = os.path.join(PROJECT_ROOT, "logs")
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+
+# ワーカーを起動する側が "0" を渡すと、ワーカーはログを stderr へ出さない
+CONSOLE_ENV = "STT_LOG_CONSOLE"
+
+# setup() 済みの QueueListener（プロセスで最初の設定を使い続ける）
+_listener = None
+
+# LogRecord が元から持つ属性（これ以外を構造化フィールドとして扱う）
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def _fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED and not k.startswith("_")}
+
+
+class StructuredFormatter(logging.Formatter):
+    """テキスト形式: 既存の書式 + 行末に key=value。json=True で1行1 JSON"""
+
+    def __init__(self, tag, json_lines=False):
+        super().__init__(f"%(asctime)s - [{tag}] %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+        self.tag = tag
+        self.json_lines = json_lines
+
+    def format(self, record):
+        fields = _fields(record)
+        if self.json_lines:
+            entry = {
+                "ts": self.formatTime(record, self.datefmt),
+                "proc": self.tag,
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": record.getMessage(),
+            }
+            entry.update(fields)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        text = super().format(record)
+        if fields:
+            text += " | " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return text
+
+
+def setup(tag, filename, config=None, level=logging.INFO, console=None):
+    """
+    ルートロガーを非同期のローテーション付き出力に切り替える。プロセス起動時に一度だけ呼ぶ。
+    2回目以降の呼び出しは何もせず最初の設定を返す（ベンチマークなどが先に自分のログ先を設定してから
+    ワーカーを import すれば、本番のログに書き込まない）。
+    console が None なら環境変数 STT_LOG_CONSOLE に従う（既定は stderr にも出す）。
+    戻り値の QueueListener は終了時に自動で止まる（残ったレコードを書き出してから）。
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    config = config or {}
+    if console is None:
+        console = os.environ.get(CONSOLE_ENV, "1") != "0"
+    formatter = StructuredFormatter(tag, json_lines=config.get("log_format", "text") == "json")
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    handlers = [logging.handlers.RotatingFileHandler(
+        os.path.join(LOG_DIR, filename),
+        maxBytes=config.get("log_max_bytes", DEFAULT_MAX_BYTES),
+        backupCount=config.get("log_backup_count", DEFAULT_BACKUP_COUNT),
+        encoding="utf-8",
+    )]
+    if console:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop)
+    _listener = listener
+    return listener
+
+
+def stop():
+    """キューに残ったレコードを書き出して止める（os._exit で終わる前に呼ぶ）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
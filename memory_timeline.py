@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Memory Timeline - ワーカーのメモリ使用量の時系列記録
+録音・文字起こし・モデルのロード/アンロードの間だけ、バックグラウンドスレッドが
+interval ごとに RSS とピーク (VmHWM)、取れる場合は GPU メモリを記録する。
+何もしていない間はスレッドは眠ったままで、起床しない。
+
+記録は固定長のリングバッファに入り、古いものから捨てられる。
+段階の開始/終了やモデルの状態遷移は発話IDと共に注記として残すので、
+dump() の結果でメモリの山がどの処理で起きたかを突き合わせられる。
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+import gpu_info
+
+logger = logging.getLogger("MemoryTimeline")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DUMP_DIR = os.path.join(PROJECT_ROOT, "logs")
+
+DEFAULT_INTERVAL = 0.25
+DEFAULT_CAPACITY = 4096
+
+
+def read_process_memory(pid="self"):
+    """(RSS MB, ピーク RSS MB) を返す。/proc が無い環境では RSS は None、ピークは getrusage の値"""
+    rss = hwm = None
+    try:
+        with open(f"/proc/{pid}/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    hwm = int(line.split()[1]) / 1024
+                elif line.startswith(b"VmRSS:"):
+                    # VmHWM の次の行なのでここで打ち切る
+                    rss = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        if pid == "self":
+            try:
+                import resource
+                peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                # macOS はバイト、Linux は KB
+                hwm = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+            except ImportError:
+                pass
+    return rss, hwm
+
+
+class MemoryTimeline:
+    """
+    begin()/end() で囲まれた区間だけ標本を取る。区間は入れ子・並行してよい
+    （録音中に前の発話の文字起こしが走る等）。interval <= 0 なら無効で、注記も記録しない。
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, capacity=DEFAULT_CAPACITY, gpu=False):
+        self.interval = interval
+        self.enabled = interval > 0
+        # (monotonic, rss_mb, hwm_mb, gpu_mb)
+        self.samples = deque(maxlen=capacity)
+        # (monotonic, label, utterance_id)
+        self.events = deque(maxlen=max(64, capacity // 8))
+        self.gpu = gpu and gpu_info.available()
+        self.started_at = time.monotonic()
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sample_count = 0
+        self._sample_cost = 0.0
+        self._thread = None
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        t0 = time.perf_counter()
+        rss, hwm = read_process_memory()
+        gpu_mb = gpu_info.process_memory_mb() if self.gpu else None
+        self.samples.append((time.monotonic(), rss, hwm, gpu_mb))
+        self._sample_cost += time.perf_counter() - t0
+        self._sample_count += 1
+
+    def _loop(self):
+        while True:
+            if self._busy <= 0:
+                # 区間外は次の begin() まで眠る
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                self._sample()
+            except Exception as e:
+                logger.debug(f"Memory sample failed: {e}")
+            time.sleep(self.interval)
+
+    def annotate(self, label, utterance_id=None):
+        """出来事を記録し、その時点の標本も1つ取る"""
+        if not self.enabled:
+            return
+        self.events.append((time.monotonic(), label, utterance_id))
+        try:
+            self._sample()
+        except Exception:
+            pass
+
+    def begin(self, label, utterance_id=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._busy += 1
+        self.annotate(f"{label}_start", utterance_id)
+        self._wake.set()
+
+    def end(self, label, utterance_id=None):
+        if not self.enabled:
+            return
+        self.annotate(f"{label}_end", utterance_id)
+        with self._lock:
+            self._busy = max(0, self._busy - 1)
+
+    def dump(self):
+        """記録全体を JSON 化できる辞書で返す（時刻は開始からの秒）"""
+        base = self.started_at
+        samples = list(self.samples)
+        events = list(self.events)
+        peak = max((s[2] for s in samples if s[2] is not None), default=None)
+        return {
+            "pid": os.getpid(),
+            "interval_ms": round(self.interval * 1000, 1),
+            "capacity": self.samples.maxlen,
+            "gpu": self.gpu,
+            "sample_count": self._sample_count,
+            "sample_cost_us": round(self._sample_cost / self._sample_count * 1e6, 1) if self._sample_count else None,
+            "peak_rss_mb": round(peak, 1) if peak is not None else None,
+            "columns": ["t", "rss_mb", "peak_mb", "gpu_mb"],
+            "samples": [
+                [round(t - base, 3)] + [round(v, 1) if v is not None else None for v in values]
+                for t, *values in samples
+            ],
+            "events": [{"t": round(t - base, 3), "label": label, "id": uid} for t, label, uid in events],
+        }
+
+    def write(self, directory=DUMP_DIR):
+        """logs/memory_timeline-<日時>-<pid>.json へ書き出してパスを返す"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"memory_timeline-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.dump(), f)
+        return path
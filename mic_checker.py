@@ -8,36 +8,33 @@ import logging
 import numpy as np
 import sounddevice as sd
 
+import device_registry
+
 logger = logging.getLogger("MicChecker")
 
 # 完全無音の判定閾値（RMS）
 SILENCE_THRESHOLD = 0.0001
 
 
-def check_device(device_index, sample_rate=44100, duration=0.5):
+def check_device(device_index, sample_rate=44100, duration=0.5, device_name=None):
     """
     指定デバイスで短時間録音し、無音かどうかを返す。
-    デバイスの max_input_channels に合わせてチャンネル数を自動選択する。
+    チャンネル数とサンプルレートは device_registry で調べ済みの対応値を使う（推測しない）。
     
     Returns:
         {"silent": bool, "rms": float, "error": str|None, "device_name": str}
     """
+    label = device_name or ("System Default" if device_index is None else f"Device {device_index}")
     try:
-        # デバイス情報取得
-        if device_index is not None:
-            dev_info = sd.query_devices(device_index)
-            device_name = dev_info['name']
-            channels = min(dev_info['max_input_channels'], 2)  # 最大2ch
-        else:
-            device_name = "System Default"
-            channels = 1
+        settings = device_registry.get_registry().capture_settings(device_index, device_name, sample_rate)
+        label = settings["name"] or label
 
         # 短時間録音
         audio = sd.rec(
-            int(duration * sample_rate),
-            samplerate=sample_rate,
-            channels=channels,
-            device=device_index,
+            int(duration * settings["sample_rate"]),
+            samplerate=settings["sample_rate"],
+            channels=settings["channels"],
+            device=settings["device"],
             dtype='float32'
         )
         sd.wait()
@@ -49,22 +46,24 @@ def check_device(device_index, sample_rate=44100, duration=0.5):
         rms = float(np.sqrt(np.mean(audio ** 2)))
         silent = rms < SILENCE_THRESHOLD
 
-        logger.info(f"Device {device_index} ({device_name}): RMS={rms:.6f}, silent={silent}")
+        logger.info(f"Device {device_index} ({label}): RMS={rms:.6f}, silent={silent}")
 
         return {
             "silent": silent,
             "rms": rms,
             "error": None,
-            "device_name": device_name
+            "device_name": label
         }
 
     except Exception as e:
         logger.warning(f"Device {device_index} check failed: {e}")
+        # 対応値が古い可能性があるので、次に参照した時に調べ直させる
+        device_registry.get_registry().invalidate()
         return {
             "silent": True,
             "rms": 0.0,
             "error": str(e),
-            "device_name": f"Device {device_index}"
+            "device_name": label
         }
 
 
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Model Catalogue - このマシンでの各モデルの性能表と、目標遅延に合うモデルの推薦
+インストール済みのモデル (models/ 配下の CTranslate2 形式) を compute_type ごとに別プロセスで読み込み、
+ロード時間・RTF・ピークのメモリ (RSS / GPU) を model_catalogue.json に記録する。
+マシン (ホスト名・CPU・GPU) が変わったら記録は使わずに測り直す。
+
+推薦: 10秒の発話の処理時間 (RTF × 10秒) が model_target_latency_ms 以下の組み合わせのうち、
+精度の高いモデル → 精度の高い compute_type → 速い順で選ぶ。満たすものが無ければ最も速いもの。
+
+計測用の音声はプロジェクト直下の calibration.wav があればそれを使い、無ければ合成音声
+（デコードが短くなるので RTF は実際の発話より小さめに出る）。
+
+使い方:
+    python model_catalogue.py calibrate [--audio 音声ファイル]
+    python model_catalogue.py show
+    python model_catalogue.py recommend [--target-ms 1500]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import threading
+import subprocess
+
+import model_converter
+
+logger = logging.getLogger("ModelCatalogue")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+CATALOGUE_FILE = os.path.join(PROJECT_ROOT, "model_catalogue.json")
+CALIBRATION_AUDIO = os.path.join(PROJECT_ROOT, "calibration.wav")
+
+CALIBRATION_SECONDS = 10.0
+# 推薦で遅延を見積もる発話の長さ
+REFERENCE_UTTERANCE_SECONDS = 10.0
+DEFAULT_TARGET_LATENCY_MS = 1500
+# 1つの組み合わせの計測を打ち切るまでの秒数
+MEASURE_TIMEOUT = 600
+
+# device ごとに試す compute_type
+COMPUTE_TYPES = {
+    "cuda": ("float16", "int8_float16", "int8"),
+    "cpu": ("int8", "float32"),
+}
+# 精度の高い順。ここに無いモデル (変換したものなど) はこれらの下に置く
+QUALITY_ORDER = (
+    "Systran/faster-whisper-large-v3",
+    "deepdml/faster-whisper-large-v3-turbo-ct2-int8",
+    "RoachLin/kotoba-whisper-v2.2-faster",
+    "Systran/faster-whisper-medium",
+    "Systran/faster-whisper-small",
+)
+PRECISION_ORDER = ("float32", "float16", "bfloat16", "int8_float16", "int8_bfloat16", "int8_float32", "int16", "int8")
+
+RESULT_PREFIX = "@@RESULT "
+
+
+class CalibrationError(Exception):
+    """1つの組み合わせの計測に失敗した"""
+
+
+def machine_fingerprint():
+    """記録を使い回してよいかの判定に使う"""
+    gpu = None
+    try:
+        import gpu_info
+        info = gpu_info.device_info(0)
+        gpu = info["name"] if info else None
+    except Exception:
+        pass
+    return {
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "cpu": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "gpu": gpu,
+    }
+
+
+def installed_models():
+    """[(model_id, フォルダ)]。プリセットは HF ID、それ以外の models/ 配下のフォルダは絶対パスを ID にする"""
+    found = []
+    seen = set()
+    for model_id in QUALITY_ORDER:
+        model_dir = model_converter.local_model_dir(model_id)
+        if os.path.isfile(os.path.join(model_dir, "model.bin")):
+            found.append((model_id, model_dir))
+            seen.add(os.path.abspath(model_dir))
+    if os.path.isdir(model_converter.MODELS_DIR):
+        for name in sorted(os.listdir(model_converter.MODELS_DIR)):
+            model_dir = os.path.abspath(os.path.join(model_converter.MODELS_DIR, name))
+            if model_dir not in seen and os.path.isfile(os.path.join(model_dir, "model.bin")):
+                found.append((model_dir, model_dir))
+    return found
+
+
+def load():
+    """このマシンで取った記録を返す。無い・別のマシンの記録なら None"""
+    try:
+        with open(CATALOGUE_FILE, "r", encoding="utf-8") as f:
+            catalogue = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if catalogue.get("machine") != machine_fingerprint():
+        return None
+    return catalogue
+
+
+def save(catalogue):
+    with open(CATALOGUE_FILE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(catalogue, f, indent=2, ensure_ascii=False)
+    os.replace(CATALOGUE_FILE + ".tmp", CATALOGUE_FILE)
+
+
+def needs_calibration():
+    return load() is None and bool(installed_models())
+
+
+def _measure_in_subprocess(model_dir, device, compute_type, audio_path):
+    """別プロセスで計測する（ピークメモリを分けて測り、メモリ不足で落ちても続けられる）"""
+    command = [sys.executable, os.path.abspath(__file__), "measure", model_dir,
+               "--device", device, "--compute-type", compute_type]
+    if audio_path:
+        command += ["--audio", audio_path]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=MEASURE_TIMEOUT, cwd=PROJECT_ROOT)
+    except subprocess.TimeoutExpired:
+        raise CalibrationError(f"timed out after {MEASURE_TIMEOUT}s")
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    lines = (completed.stderr or "").strip().splitlines()
+    raise CalibrationError(lines[-1] if lines else f"exit code {completed.returncode}")
+
+
+def _print_line(message):
+    # GUI がパイプで1行ずつ読むので都度書き出す
+    print(message, flush=True)
+
+
+def calibrate(audio_path=None, log=_print_line):
+    """インストール済みのモデルを compute_type ごとに測って保存し、記録を返す"""
+    if audio_path is None and os.path.isfile(CALIBRATION_AUDIO):
+        audio_path = CALIBRATION_AUDIO
+    device = model_converter.default_device()
+    catalogue = {
+        "machine": machine_fingerprint(),
+        "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "audio": os.path.basename(audio_path) if audio_path else "synthetic",
+        "entries": [],
+    }
+    models = installed_models()
+    if not models:
+        log("No installed models found under models/.")
+        return catalogue
+    for model_id, model_dir in models:
+        for compute_type in COMPUTE_TYPES.get(device, ("default",)):
+            log(f"Measuring {model_id} ({device}/{compute_type}) ...")
+            try:
+                entry = _measure_in_subprocess(model_dir, device, compute_type, audio_path)
+            except CalibrationError as e:
+                log(f"  skipped: {e}")
+                continue
+            entry["model_id"] = model_id
+            entry["compute_type"] = compute_type
+            catalogue["entries"].append(entry)
+            log(f"  load {entry['load_seconds']:.1f}s, RTF {entry['rtf']:.3f}, peak RSS {entry.get('peak_rss_mb') or 0:.0f} MB")
+            # 途中で止めても、測り終えた分は残す
+            save(catalogue)
+    save(catalogue)
+    return catalogue
+
+
+def _quality_rank(model_id):
+    return QUALITY_ORDER.index(model_id) if model_id in QUALITY_ORDER else len(QUALITY_ORDER)
+
+
+def _precision_rank(compute_type):
+    return PRECISION_ORDER.index(compute_type) if compute_type in PRECISION_ORDER else len(PRECISION_ORDER)
+
+
+def estimated_latency_ms(entry):
+    return entry["rtf"] * REFERENCE_UTTERANCE_SECONDS * 1000
+
+
+def recommend(catalogue, target_latency_ms=DEFAULT_TARGET_LATENCY_MS):
+    """推薦する記録 (latency_ms / meets_target を付けたもの) を返す。記録が無ければ None"""
+    if not catalogue:
+        return None
+    candidates = [e for e in catalogue.get("entries", []) if e.get("rtf") is not None]
+    if not candidates:
+        return None
+    meeting = [e for e in candidates if estimated_latency_ms(e) <= target_latency_ms]
+    if meeting:
+        best = min(meeting, key=lambda e: (
+            _quality_rank(e["model_id"]), _precision_rank(e["compute_type"]), estimated_latency_ms(e)
+        ))
+    else:
+        best = min(candidates, key=estimated_latency_ms)
+    return dict(best, latency_ms=round(estimated_latency_ms(best)), meets_target=bool(meeting))
+
+
+def _measure_main(args):
+    """measure サブコマンド: この1プロセスで1つの組み合わせを測って @@RESULT 行を出す"""
+    import memory_timeline
+    import gpu_info
+
+    peak_gpu = [None]
+    stop = threading.Event()
+
+    def _poll_gpu():
+        while not stop.wait(0.1):
+            used = gpu_info.process_memory_mb(os.getpid())
+            if used is not None and (peak_gpu[0] is None or used > peak_gpu[0]):
+                peak_gpu[0] = used
+
+    poller = None
+    if args.device == "cuda" and gpu_info.available():
+        poller = threading.Thread(target=_poll_gpu, daemon=True)
+        poller.start()
+    audio = model_converter.load_benchmark_audio(args.audio, seconds=CALIBRATION_SECONDS)
+    result = model_converter.measure(args.model_dir, args.device, args.compute_type, audio=audio)
+    stop.set()
+    if poller is not None:
+        poller.join(timeout=1.0)
+    result["peak_rss_mb"] = memory_timeline.read_process_memory()[1]
+    result["peak_gpu_mb"] = peak_gpu[0]
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def _print_catalogue(catalogue):
+    print(f"{'model':<50} {'compute':<14} {'load s':>7} {'RTF':>7} {'RSS MB':>7} {'GPU MB':>7}")
+    for e in catalogue.get("entries", []):
+        print(f"{e['model_id'][-50:]:<50} {e['compute_type']:<14} {e['load_seconds']:>7.1f} {e['rtf']:>7.3f} "
+              f"{e.get('peak_rss_mb') or 0:>7.0f} {e.get('peak_gpu_mb') or 0:>7.0f}")
+
+
+def _print_recommendation(rec, target_ms):
+    if rec is None:
+        print("No measurements yet. Run: python model_catalogue.py calibrate")
+        return
+    verdict = "meets" if rec["meets_target"] else "nothing meets"
+    print(f"Recommended: {rec['model_id']} ({rec['device']}/{rec['compute_type']}), "
+          f"~{rec['latency_ms']} ms per {REFERENCE_UTTERANCE_SECONDS:.0f} s utterance ({verdict} the {target_ms} ms target)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [CATALOGUE] %(message)s')
+    parser = argparse.ArgumentParser(description="Per-machine model benchmark catalogue and recommendation")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_cal = sub.add_parser("calibrate", help="Measure every installed model on this machine")
+    p_cal.add_argument("--audio", default=None, help="Reference audio (default: calibration.wav or synthetic)")
+    p_cal.add_argument("--target-ms", type=int, default=None)
+    sub.add_parser("show", help="Print the stored catalogue")
+    p_rec = sub.add_parser("recommend", help="Print the recommended model for the target latency")
+    p_rec.add_argument("--target-ms", type=int, default=None)
+    p_meas = sub.add_parser("measure", help=argparse.SUPPRESS)
+    p_meas.add_argument("model_dir")
+    p_meas.add_argument("--device", required=True)
+    p_meas.add_argument("--compute-type", required=True)
+    p_meas.add_argument("--audio", default=None)
+    args = parser.parse_args()
+
+    if args.command == "measure":
+        _measure_main(args)
+        sys.exit(0)
+
+    target_ms = getattr(args, "target_ms", None)
+    if target_ms is None:
+        import config_manager
+        target_ms = config_manager.get_config().get("model_target_latency_ms", DEFAULT_TARGET_LATENCY_MS)
+
+    if args.command == "calibrate":
+        catalogue = calibrate(args.audio)
+    else:
+        catalogue = load()
+        if catalogue is None:
+            print("No catalogue for this machine. Run: python model_catalogue.py calibrate")
+            sys.exit(1)
+    if args.command in ("calibrate", "show"):
+        _print_catalogue(catalogue)
+    _print_recommendation(recommend(catalogue, target_ms), target_ms)
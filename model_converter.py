@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Model Converter - Transformers 形式の Whisper を CTranslate2 形式に変換し、量子化した版ごとに計測する
+変換には ctranslate2 の TransformersConverter を使う（transformers と torch が別途必要）。
+
+変換・取得したモデルのフォルダには stt_model.json を置き、次の情報を残す（GUI が表示する）:
+    source / kind          元のモデル (ディレクトリまたは HF ID) と "converted" / "downloaded"
+    quantization           変換時の量子化 (取得したモデルでは不明なので null)
+    size_bytes             フォルダのディスク上のサイズ
+    benchmark              load_seconds (ロード時間) と rtf (処理時間 / 音声の長さ)、計測した device / compute_type
+"""
+import os
+import json
+import time
+import logging
+
+logger = logging.getLogger("ModelConverter")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
+METADATA_NAME = "stt_model.json"
+
+# ctranslate2 の変換で指定できる量子化
+QUANTIZATIONS = (
+    "int8", "int8_float16", "int8_bfloat16", "int8_float32",
+    "int16", "float16", "bfloat16", "float32",
+)
+# faster_whisper が読む付随ファイル（元のフォルダにあればそのままコピーする）
+COPY_FILES = ("tokenizer.json", "preprocessor_config.json")
+
+SAMPLE_RATE = 16000
+# 計測用の音声を指定しない場合の長さ（Whisper の1窓分）
+SYNTHETIC_SECONDS = 30.0
+
+
+class ConversionError(Exception):
+    """変換に必要なものが揃っていない、または変換に失敗した"""
+
+
+def local_model_dir(model_id):
+    """ワーカーと同じ規則で、モデルID / パスからローカルのフォルダを返す"""
+    expanded = os.path.expanduser(model_id.rstrip("/"))
+    if os.path.isabs(expanded) or expanded.startswith("."):
+        return expanded
+    return os.path.join(MODELS_DIR, model_id.split("/")[-1])
+
+
+def directory_size(path):
+    total = 0
+    for base, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(base, name))
+            except OSError:
+                pass
+    return total
+
+
+def read_metadata(model_dir):
+    try:
+        with open(os.path.join(model_dir, METADATA_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_metadata(model_dir, **fields):
+    """既存の内容に fields を重ねて保存する"""
+    data = read_metadata(model_dir) or {}
+    data.update(fields)
+    data["size_bytes"] = directory_size(model_dir)
+    path = os.path.join(model_dir, METADATA_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+    return data
+
+
+def convert(source_dir, output_dir, quantization="int8", force=False):
+    """Transformers 形式のフォルダを CTranslate2 形式で output_dir に書き出す"""
+    if quantization not in QUANTIZATIONS:
+        raise ConversionError(f"Unknown quantization: {quantization} (expected one of {', '.join(QUANTIZATIONS)})")
+    if not os.path.isfile(os.path.join(source_dir, "config.json")):
+        raise ConversionError(f"Not a Transformers model folder (config.json missing): {source_dir}")
+    if os.path.isfile(os.path.join(source_dir, "model.bin")):
+        raise ConversionError(f"Already a CTranslate2 model: {source_dir}")
+    try:
+        from ctranslate2.converters import TransformersConverter
+        import transformers  # noqa: F401  変換時に必要。ここで無ければ案内を出す
+    except ImportError as e:
+        raise ConversionError(f"Conversion needs transformers and torch ({e}). Run: pip install transformers torch")
+
+    copy_files = [name for name in COPY_FILES if os.path.isfile(os.path.join(source_dir, name))]
+    started = time.monotonic()
+    logger.info(f"Converting {source_dir} -> {output_dir} ({quantization})")
+    try:
+        converter = TransformersConverter(source_dir, copy_files=copy_files, low_cpu_mem_usage=True)
+        converter.convert(output_dir, quantization=quantization, force=force)
+    except Exception as e:
+        raise ConversionError(f"Conversion failed: {e}")
+    logger.info(f"Converted in {time.monotonic() - started:.1f}s")
+    return write_metadata(
+        output_dir,
+        source=os.path.abspath(source_dir),
+        kind="converted",
+        quantization=quantization,
+        created_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+    )
+
+
+def load_benchmark_audio(path=None, seconds=SYNTHETIC_SECONDS):
+    """16kHz モノラル float32 と説明を返す。path が無ければ弱いノイズを使う（デコードは短くなる）"""
+    import numpy as np
+    if path is None:
+        rng = np.random.default_rng(0)
+        audio = (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.01).astype(np.float32)
+        return audio, "synthetic"
+    import soundfile
+    data, rate = soundfile.read(path, dtype="float32", always_2d=True)
+    audio = data.mean(axis=1)
+    if rate != SAMPLE_RATE:
+        from scipy.signal import resample_poly
+        audio = resample_poly(audio, SAMPLE_RATE, rate)
+    return audio.astype(np.float32), os.path.basename(path)
+
+
+def default_device():
+    try:
+        import ctranslate2
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    except Exception:
+        return "cpu"
+
+
+def measure(model_dir, device=None, compute_type="default", audio=None, language="ja"):
+    """
+    ロード時間と RTF を測って返す。audio は load_benchmark_audio() の戻り値（省略時は合成音声）。
+    compute_type の "default" は保存時の量子化のまま読み込む（その device で使えない型なら近いものになる）
+    """
+    from faster_whisper import WhisperModel
+
+    device = device or default_device()
+    samples, label = audio if audio is not None else load_benchmark_audio()
+    audio_seconds = len(samples) / SAMPLE_RATE
+
+    started = time.perf_counter()
+    model = WhisperModel(model_dir, device=device, compute_type=compute_type, local_files_only=True)
+    load_seconds = time.perf_counter() - started
+
+    # 初回はカーネルの準備などが入るので、短い区間で1度流してから測る
+    list(model.transcribe(samples[:SAMPLE_RATE], beam_size=5, language=language)[0])
+    started = time.perf_counter()
+    segments, _ = model.transcribe(samples, beam_size=5, language=language)
+    list(segments)
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "device": device,
+        "compute_type": getattr(model.model, "compute_type", None) or compute_type,
+        "load_seconds": round(load_seconds, 3),
+        "rtf": round(elapsed / audio_seconds, 4) if audio_seconds else None,
+        "audio": label,
+        "audio_seconds": round(audio_seconds, 2),
+        "measured_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    del model
+    return result
+
+
+def benchmark(model_dir, device=None, audio_path=None, language="ja"):
+    """保存時の量子化で measure() し、stt_model.json に記録して返す"""
+    result = measure(model_dir, device, audio=load_benchmark_audio(audio_path), language=language)
+    logger.info(f"Benchmark {os.path.basename(model_dir)}: load {result['load_seconds']}s, "
+                f"RTF {result['rtf']} ({result['device']})")
+    write_metadata(model_dir, benchmark=result)
+    return result
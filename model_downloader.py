@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Model Downloader - Hugging Face Hub からの再開可能・並列・ハッシュ検証付きダウンロード
+ファイル一覧とハッシュは Hub API (/api/models/<repo>/revision/<rev>?blobs=true) から取得し、
+本体は /<repo>/resolve/<rev>/<file> から Range 指定で取得する。
+
+- 大きなファイルは SEGMENT_SIZE ごとに区切って複数接続で並行取得する
+- 途中経過は <file>.part と <file>.part.json (区間ごとの取得済みバイト数) に残し、
+  中断後に再実行すると続きから取得する
+- 取得後に LFS ファイルは sha256、通常ファイルは git の blob ハッシュで検証し、
+  一致した時だけ本来の名前に置き換える。検証済みの情報は .download_manifest.json に残し、
+  次回はサイズが一致すれば読み直さない
+
+HF_ENDPOINT (既定 https://huggingface.co) と HF_TOKEN の環境変数に従う。
+hub_stub_server.py を HF_ENDPOINT に指定すれば、ネットワークなしで動作を確認できる。
+"""
+import os
+import json
+import time
+import fnmatch
+import hashlib
+import logging
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("ModelDownloader")
+
+DEFAULT_ENDPOINT = "https://huggingface.co"
+# faster_whisper.download_model と同じ対象
+ALLOW_PATTERNS = ["config.json", "preprocessor_config.json", "model.bin", "tokenizer.json", "vocabulary.*"]
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_CONNECTIONS = 4
+MAX_RETRIES = 5
+MANIFEST_NAME = ".download_manifest.json"
+
+
+class DownloadError(Exception):
+    """取得やハッシュ検証に失敗した"""
+
+
+def _endpoint():
+    return os.environ.get("HF_ENDPOINT", DEFAULT_ENDPOINT).rstrip("/")
+
+
+def _open(url, headers=None, timeout=30):
+    request = urllib.request.Request(url, headers=dict(headers or {}))
+    token = os.environ.get("HF_TOKEN")
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    request.add_header("User-Agent", "stt-model-downloader")
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def list_files(repo_id, revision="main", allow_patterns=ALLOW_PATTERNS):
+    """[{"name", "size", "sha256" or None, "blob_id"}] を返す"""
+    url = f"{_endpoint()}/api/models/{repo_id}/revision/{urllib.parse.quote(revision, safe='')}?blobs=true"
+    try:
+        with _open(url) as response:
+            info = json.load(response)
+    except urllib.error.HTTPError as e:
+        raise DownloadError(f"Model {repo_id}@{revision} not found on {_endpoint()} (HTTP {e.code})")
+    except (urllib.error.URLError, OSError) as e:
+        raise DownloadError(f"Cannot reach {_endpoint()}: {e}")
+    files = []
+    for sibling in info.get("siblings", []):
+        name = sibling["rfilename"]
+        if allow_patterns and not any(fnmatch.fnmatch(name, p) for p in allow_patterns):
+            continue
+        lfs = sibling.get("lfs") or {}
+        files.append({
+            "name": name,
+            "size": lfs.get("size", sibling.get("size")),
+            "sha256": lfs.get("sha256"),
+            "blob_id": sibling.get("blobId"),
+        })
+    if not files:
+        raise DownloadError(f"No model files in {repo_id}@{revision}")
+    return files
+
+
+def file_digest(path, entry):
+    """LFS は sha256、通常ファイルは git blob の sha1 を求める"""
+    if entry.get("sha256"):
+        digest = hashlib.sha256()
+    else:
+        digest = hashlib.sha1()
+        digest.update(f"blob {os.path.getsize(path)}\0".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE * 8), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _expected_digest(entry):
+    return entry.get("sha256") or entry.get("blob_id")
+
+
+class _FileState:
+    """1ファイル分の区間と進捗。<file>.part.json に保存して再開に使う"""
+
+    def __init__(self, path, entry):
+        self.path = path
+        self.entry = entry
+        self.part_path = path + ".part"
+        self.state_path = path + ".part.json"
+        self.size = entry["size"]
+        self.lock = threading.Lock()
+        self.segments = self._load_segments()
+        self.started = time.monotonic()
+        self.resumed_bytes = self.done_bytes()
+
+    def _load_segments(self):
+        size = self.size or 0
+        fresh = [[start, min(start + SEGMENT_SIZE, size), 0] for start in range(0, size, SEGMENT_SIZE)] or [[0, 0, 0]]
+        try:
+            with open(self.state_path, "r") as f:
+                saved = json.load(f)
+            if saved.get("size") == size and saved.get("digest") == _expected_digest(self.entry) \
+                    and os.path.exists(self.part_path):
+                return saved["segments"]
+        except (OSError, ValueError, KeyError):
+            pass
+        # 最初から: .part を確保しておく（各区間はオフセット指定で書き込む）
+        with open(self.part_path, "wb") as f:
+            f.truncate(size)
+        return fresh
+
+    def save(self):
+        # 複数の区間スレッドから呼ばれるので、一時ファイルの書き込みごと排他する
+        with self.lock:
+            data = {"size": self.size, "digest": _expected_digest(self.entry), "segments": self.segments}
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.state_path)
+
+    def done_bytes(self):
+        with self.lock:
+            return sum(done for _, _, done in self.segments)
+
+    def advance(self, index, amount):
+        with self.lock:
+            self.segments[index][2] += amount
+
+
+class ModelDownloader:
+    """
+    progress(name, done_bytes, total_bytes, bytes_per_sec) を取得中に呼ぶ（ファイルごと、最短 0.5 秒間隔）。
+    """
+
+    def __init__(self, connections=DEFAULT_CONNECTIONS, progress=None):
+        self.connections = max(1, connections)
+        self.progress = progress
+        self._last_report = {}
+
+    def download(self, repo_id, output_dir, revision="main", allow_patterns=ALLOW_PATTERNS):
+        files = list_files(repo_id, revision, allow_patterns)
+        os.makedirs(output_dir, exist_ok=True)
+        manifest = self._load_manifest(output_dir)
+
+        states = []
+        for entry in files:
+            path = os.path.join(output_dir, entry["name"])
+            known = manifest.get(entry["name"])
+            if os.path.exists(path) and known == {"size": entry["size"], "digest": _expected_digest(entry)} \
+                    and os.path.getsize(path) == entry["size"]:
+                logger.info(f"{entry['name']}: already verified, skipping")
+                self._report(entry["name"], entry["size"], entry["size"], 0.0, force=True)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            state = _FileState(path, entry)
+            if state.resumed_bytes:
+                logger.info(f"{entry['name']}: resuming at {state.resumed_bytes / 1e6:.1f} / {state.size / 1e6:.1f} MB")
+            states.append(state)
+
+        url_base = f"{_endpoint()}/{repo_id}/resolve/{urllib.parse.quote(revision, safe='')}/"
+        jobs = [
+            (state, index, url_base + urllib.parse.quote(state.entry["name"]))
+            for state in states
+            for index, (start, end, done) in enumerate(state.segments)
+            if start + done < end
+        ]
+        error = None
+        with ThreadPoolExecutor(max_workers=self.connections) as pool:
+            for future in [pool.submit(self._fetch_segment, *job) for job in jobs]:
+                try:
+                    future.result()
+                except DownloadError as e:
+                    error = error or e
+
+        # 一部が失敗しても、取得し終えたファイルは検証して確定しておく
+        for state in states:
+            if all(start + done >= end for start, end, done in state.segments):
+                try:
+                    self._finish(state, output_dir, manifest)
+                except DownloadError as e:
+                    error = error or e
+        if error is not None:
+            raise error
+        return output_dir
+
+    def _fetch_segment(self, state, index, url):
+        for attempt in range(1, MAX_RETRIES + 1):
+            start, end, done = state.segments[index]
+            if start + done >= end:
+                return
+            try:
+                self._fetch_range(state, index, url, start + done, end)
+                return
+            except (urllib.error.URLError, OSError, http.client.HTTPException, DownloadError) as e:
+                # 途中で切れた転送は IncompleteRead (HTTPException) になる
+                state.save()
+                if attempt == MAX_RETRIES:
+                    raise DownloadError(f"{state.entry['name']}: giving up after {attempt} attempts ({e})")
+                delay = min(30, 2 ** attempt)
+                logger.warning(f"{state.entry['name']}: transfer interrupted ({e}); retrying in {delay}s")
+                time.sleep(delay)
+            except Exception as e:
+                # 想定外の失敗も取得済みの分は残し、他の区間と同じく DownloadError として返す
+                state.save()
+                raise DownloadError(f"{state.entry['name']}: transfer failed ({type(e).__name__}: {e})") from e
+
+    def _fetch_range(self, state, index, url, offset, end):
+        headers = {"Range": f"bytes={offset}-{end - 1}"} if end > 0 else {}
+        with _open(url, headers) as response, open(state.part_path, "r+b") as out:
+            if offset and response.status != 206:
+                raise DownloadError("server ignored the Range request")
+            out.seek(offset)
+            saved_at = time.monotonic()
+            while offset < end:
+                block = response.read(min(CHUNK_SIZE, end - offset))
+                if not block:
+                    raise DownloadError(f"connection closed at byte {offset}")
+                out.write(block)
+                offset += len(block)
+                state.advance(index, len(block))
+                self._report_state(state)
+                if time.monotonic() - saved_at > 2.0:
+                    # 書き込んだ分だけを進捗として残す（再開時に取り直しが最小になる）
+                    out.flush()
+                    state.save()
+                    saved_at = time.monotonic()
+            out.flush()
+        state.save()
+
+    def _finish(self, state, output_dir, manifest):
+        name = state.entry["name"]
+        self._report_state(state, force=True)
+        if os.path.getsize(state.part_path) != state.size:
+            raise DownloadError(f"{name}: size mismatch")
+        digest = file_digest(state.part_path, state.entry)
+        expected = _expected_digest(state.entry)
+        if expected and digest != expected:
+            # 壊れた取得分は捨てる（次回は最初から）
+            os.remove(state.part_path)
+            os.remove(state.state_path)
+            raise DownloadError(f"{name}: hash mismatch (expected {expected}, got {digest})")
+        os.replace(state.part_path, state.path)
+        os.remove(state.state_path)
+        manifest[name] = {"size": state.size, "digest": expected}
+        self._save_manifest(output_dir, manifest)
+        logger.info(f"{name}: verified ({digest[:12]})")
+
+    def _report_state(self, state, force=False):
+        done = state.done_bytes()
+        elapsed = time.monotonic() - state.started
+        rate = (done - state.resumed_bytes) / elapsed if elapsed > 0 else 0.0
+        self._report(state.entry["name"], done, state.size, rate, force)
+
+    def _report(self, name, done, total, rate, force=False):
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_report.get(name, 0) < 0.5:
+            return
+        self._last_report[name] = now
+        self.progress(name, done, total, rate)
+
+    @staticmethod
+    def _load_manifest(output_dir):
+        try:
+            with open(os.path.join(output_dir, MANIFEST_NAME), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_manifest(output_dir, manifest):
+        path = os.path.join(output_dir, MANIFEST_NAME)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+def download_model(repo_id, output_dir, revision="main", connections=DEFAULT_CONNECTIONS, progress=None):
+    return ModelDownloader(connections, progress).download(repo_id, output_dir, revision)
@@ -2,6 +2,7 @@ import sys
 import os
 import subprocess
 import shutil
+import threading
 
 def get_platform():
     if sys.platform.startswith("linux"):
@@ -50,68 +51,256 @@ def play_sound(sound_type="start"):
     except Exception:
         pass
 
-def copy_text(text):
-    """Cross-platform copy."""
-    # Try pyperclip first as it handles many cases
-    try:
-        import pyperclip
-        # Linux Wayland fix
-        if get_platform() == "linux" and os.environ.get("WAYLAND_DISPLAY"):
-            if shutil.which("wl-copy"):
-                p = subprocess.Popen(["wl-copy"], stdin=subprocess.PIPE)
-                p.communicate(input=text.encode('utf-8'))
+# --- Text Injection ---
+
+# クリップボードの所有権取得を待つ上限（固定スリープではなく、確認できた時点で進む）
+CLIPBOARD_READY_TIMEOUT = 0.5
+# 貼り付け後、元のクリップボード内容を戻すまでの猶予（貼り付け先アプリが読み終えるのを待つ）
+CLIPBOARD_RESTORE_DELAY = 0.5
+
+
+class _TkClipboardOwner:
+    """
+    プロセス内に常駐するクリップボード所有者。
+    専用スレッドで Tk のイベントループを回し続けるので、コピーのたびに
+    wl-copy / xclip を起動する必要がなく、所有権の取得完了もその場で確認できる。
+    (macOS の Tk はメインスレッド専用のため使わない)
+    """
+    resident = True
+
+    def __init__(self):
+        self._root = None
+        self._error = None
+        started = threading.Event()
+
+        def _run():
+            try:
+                import tkinter as tk
+                self._root = tk.Tk()
+                self._root.withdraw()
+            except Exception as e:
+                self._error = e
+                started.set()
                 return
-        
-        pyperclip.copy(text)
-    except Exception as e:
-        print(f"Copy failed: {e}")
+            started.set()
+            self._root.mainloop()
 
-def paste_text():
-    """Simulate Ctrl+V / Cmd+V using pynput, falling back to OS commands."""
-    plat = get_platform()
-    try:
-        from pynput.keyboard import Key, Controller
-        keyboard = Controller()
-        mod_key = Key.cmd if plat == "mac" else Key.ctrl
-        keyboard.press(mod_key)
-        keyboard.press('v')
-        keyboard.release('v')
-        keyboard.release(mod_key)
-        return
-    except Exception as e:
-        print(f"Paste via pynput failed: {e}")
-        
-    try:
-        if plat == "linux":
-            # Use xdotool if available (X11/XWayland)
-            if shutil.which("xdotool"):
-                subprocess.run(["xdotool", "key", "--clearmodifiers", "ctrl+v"])
-            else:
-                print("xdotool not found.")
-        
-        elif plat == "mac":
-            # AppleScript to send Cmd+V
-            script = 'tell application "System Events" to keystroke "v" using command down'
-            subprocess.run(["osascript", "-e", script])
+        threading.Thread(target=_run, daemon=True, name="ClipboardOwner").start()
+        started.wait(timeout=5)
+        if self._root is None:
+            raise RuntimeError(f"Tk clipboard owner unavailable: {self._error}")
+
+    def _call(self, fn):
+        """Tk スレッドで fn を実行し、完了を待って結果を返す"""
+        done = threading.Event()
+        result = {}
+
+        def _wrapped():
+            try:
+                result["value"] = fn()
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+        self._root.after(0, _wrapped)
+        if not done.wait(CLIPBOARD_READY_TIMEOUT):
+            raise TimeoutError("Clipboard owner did not respond")
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+    def get(self):
+        def _get():
+            try:
+                return self._root.clipboard_get()
+            except Exception:
+                # 空、またはテキスト以外が入っている
+                return None
+        return self._call(_get)
+
+    def set(self, text):
+        def _set():
+            self._root.clipboard_clear()
+            self._root.clipboard_append(text)
+            # 所有権の取得を確定させてから戻る
+            self._root.update_idletasks()
+        self._call(_set)
+
+
+class _CommandClipboard:
+    """
+    外部コマンド / pyperclip によるクリップボード操作（Tk が使えない環境向け）。
+    ネイティブ Wayland (DISPLAY 無し) では内容を差し替えられる常駐の所有者を置けないので、
+    コピーごとに wl-copy を1回だけ起動する。wl-copy / xclip は選択を確保してから戻るので読み戻しはしない。
+    プロセスを増やさないよう、クリップボードの復元は行わない（resident = False）。
+    """
+    resident = False
+
+    def __init__(self):
+        self.wayland = get_platform() == "linux" and os.environ.get("WAYLAND_DISPLAY") and shutil.which("wl-copy")
+
+    def get(self):
+        try:
+            import pyperclip
+            return pyperclip.paste()
+        except Exception:
+            return None
+
+    def set(self, text):
+        if self.wayland:
+            p = subprocess.Popen(["wl-copy"], stdin=subprocess.PIPE)
+            p.communicate(input=text.encode('utf-8'))
+        else:
+            import pyperclip
+            pyperclip.copy(text)
+
+
+class TextInjector:
+    """
+    クリップボード経由でアクティブなウィンドウへテキストを入力するエンジン。
+    クリップボード所有者と pynput の Controller を使い回し、
+    clipboard_restore 指定時は貼り付け後に元の内容をバックグラウンドで戻す。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clipboard = None
+        self._controller = None
+        self._restore_timer = None
+        self._saved = None
+        self._injected = None
+
+    def _get_clipboard(self):
+        if self._clipboard is None:
+            plat = get_platform()
+            # Linux は X11 / XWayland の DISPLAY がある場合のみ Tk で常駐できる
+            if plat == "windows" or (plat == "linux" and os.environ.get("DISPLAY")):
+                try:
+                    self._clipboard = _TkClipboardOwner()
+                except Exception as e:
+                    print(f"Resident clipboard owner failed, using commands: {e}")
+            if self._clipboard is None:
+                self._clipboard = _CommandClipboard()
+        return self._clipboard
+
+    def _get_controller(self):
+        if self._controller is None:
+            from pynput.keyboard import Controller
+            self._controller = Controller()
+        return self._controller
+
+    def copy(self, text):
+        with self._lock:
+            try:
+                self._get_clipboard().set(text)
+            except Exception as e:
+                print(f"Copy failed: {e}")
+
+    def paste(self):
+        """Simulate Ctrl+V / Cmd+V using pynput, falling back to OS commands."""
+        plat = get_platform()
+        try:
+            from pynput.keyboard import Key
+            keyboard = self._get_controller()
+            mod_key = Key.cmd if plat == "mac" else Key.ctrl
+            keyboard.press(mod_key)
+            keyboard.press('v')
+            keyboard.release('v')
+            keyboard.release(mod_key)
+            return
+        except Exception as e:
+            print(f"Paste via pynput failed: {e}")
             
-        elif plat == "windows":
-            pass
+        try:
+            if plat == "linux":
+                # Use xdotool if available (X11/XWayland)
+                if shutil.which("xdotool"):
+                    subprocess.run(["xdotool", "key", "--clearmodifiers", "ctrl+v"])
+                else:
+                    print("xdotool not found.")
             
-    except Exception as e:
-        print(f"Paste fallback failed: {e}")
+            elif plat == "mac":
+                # AppleScript to send Cmd+V
+                script = 'tell application "System Events" to keystroke "v" using command down'
+                subprocess.run(["osascript", "-e", script])
+                
+            elif plat == "windows":
+                pass
+                
+        except Exception as e:
+            print(f"Paste fallback failed: {e}")
+
+    def type_text(self, text, restore_clipboard=False):
+        with self._lock:
+            clipboard = self._get_clipboard()
+            # 退避と復元は常駐の所有者がある時だけ（コマンド版では読み書きのたびにプロセスが増える）
+            restore_clipboard = restore_clipboard and clipboard.resident
+            if self._restore_timer is not None:
+                # 連続入力中は最初に退避した内容を保持したまま、復元を先送りする
+                self._restore_timer.cancel()
+                self._restore_timer = None
+            elif restore_clipboard:
+                try:
+                    self._saved = clipboard.get()
+                except Exception:
+                    self._saved = None
+
+            try:
+                clipboard.set(text)
+            except Exception as e:
+                print(f"Copy failed: {e}")
+                return
+            self.paste()
+            self._injected = text
+
+            if restore_clipboard and self._saved is not None:
+                self._restore_timer = threading.Timer(CLIPBOARD_RESTORE_DELAY, self._restore)
+                self._restore_timer.daemon = True
+                self._restore_timer.start()
+
+    def _restore(self):
+        with self._lock:
+            self._restore_timer = None
+            saved, self._saved = self._saved, None
+            try:
+                clipboard = self._get_clipboard()
+                # ユーザーがその間に別の内容をコピーしていたら上書きしない
+                if saved is not None and clipboard.get() == self._injected:
+                    clipboard.set(saved)
+            except Exception as e:
+                print(f"Clipboard restore failed: {e}")
+
+
+_injector = None
+_injector_lock = threading.Lock()
 
 
+def get_injector():
+    global _injector
+    with _injector_lock:
+        if _injector is None:
+            _injector = TextInjector()
+        return _injector
 
-def type_text(text):
+
+def copy_text(text):
+    """Cross-platform copy."""
+    get_injector().copy(text)
+
+def paste_text():
+    """Simulate Ctrl+V / Cmd+V using pynput, falling back to OS commands."""
+    get_injector().paste()
+
+def type_text(text, restore_clipboard=False):
     """
     Simulate typing by copying text to clipboard and pasting.
     This is generally more reliable than simulating individual keystrokes for large text.
+    The clipboard is confirmed ready before pasting, and with restore_clipboard the
+    previous contents are put back in the background once the paste has been consumed.
     """
-    import time
-    copy_text(text)
-    # Wait a bit for clipboard to update
-    time.sleep(0.1)
-    paste_text()
+    get_injector().type_text(text, restore_clipboard=restore_clipboard)
+
 
 def set_autostart(enabled: bool):
     """
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Profiling - 動作中のワーカーを再起動せずにプロファイルする
+PROFILE コマンドで「次の N 発話」を対象に指定すると、その発話の文字起こし中だけ
+プロファイラを動かし、結果を logs/profiles/ に書き出す。モデルは読み込んだまま。
+
+モード:
+    cprofile  決定的プロファイル (cProfile)。.prof (pstats / snakeviz 等で開ける) と上位関数の .txt
+    sampling  処理スレッドのスタックを interval_ms ごとに採取。flamegraph.pl / speedscope で開ける
+              折りたたみ形式 (.folded)。オーバーヘッドが小さく、ネイティブ処理の待ちも見える
+どちらのモードでも、その発話の段階の印を Chrome のトレース形式 (.trace.json) で書き出す
+（chrome://tracing や Perfetto で開ける）。
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+
+import latency_trace
+
+logger = logging.getLogger("Profiling")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.path.join(PROJECT_ROOT, "logs", "profiles")
+
+MODES = ("cprofile", "sampling")
+DEFAULT_INTERVAL_MS = 5
+# 書き出したファイルを覚えておく数 (PROFILE の応答で返す)
+MAX_RECENT = 20
+
+
+class _StackSampler:
+    """指定スレッドのスタックを一定間隔で採取し、折りたたみ形式で数える"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+
+class _Session:
+    def __init__(self, utterance_id, mode, interval):
+        self.utterance_id = utterance_id
+        self.mode = mode
+        self.started = time.time()
+        self.profile = None
+        self.sampler = None
+        if mode == "cprofile":
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.sampler = _StackSampler(threading.get_ident(), interval)
+            self.sampler.start()
+
+    def stop(self):
+        if self.profile is not None:
+            self.profile.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+
+
+class UtteranceProfiler:
+    """次の N 発話だけプロファイルする。対象外の発話では begin() が None を返すだけ。"""
+
+    def __init__(self, directory=PROFILE_DIR):
+        self.directory = directory
+        self.remaining = 0
+        self.mode = "cprofile"
+        self.interval = DEFAULT_INTERVAL_MS / 1000
+        self.recent = []
+        self._lock = threading.Lock()
+
+    def arm(self, count, mode="cprofile", interval_ms=DEFAULT_INTERVAL_MS):
+        if mode not in MODES:
+            raise ValueError(f"unknown profile mode: {mode} (expected one of {', '.join(MODES)})")
+        with self._lock:
+            self.remaining = max(0, int(count))
+            self.mode = mode
+            self.interval = max(1, float(interval_ms)) / 1000
+        if self.remaining:
+            logger.info(f"Profiling the next {self.remaining} utterance(s) ({mode})")
+        return self.status()
+
+    def status(self):
+        return {
+            "remaining": self.remaining,
+            "mode": self.mode,
+            "interval_ms": round(self.interval * 1000, 1),
+            "directory": self.directory,
+            "written": list(self.recent),
+        }
+
+    def begin(self, utterance_id):
+        """処理スレッドから呼ぶ。対象の発話ならプロファイルを開始してセッションを返す"""
+        if not self.remaining:
+            return None
+        with self._lock:
+            if not self.remaining:
+                return None
+            self.remaining -= 1
+            mode, interval = self.mode, self.interval
+        return _Session(utterance_id, mode, interval)
+
+    def end(self, session, trace=None):
+        """begin() と同じスレッドから呼ぶ。結果を書き出す"""
+        if session is None:
+            return
+        session.stop()
+        try:
+            self._write(session, trace)
+        except Exception as e:
+            logger.error(f"Failed to write profile: {e}")
+
+    def _write(self, session, trace):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(session.started))
+        base = os.path.join(self.directory, f"{stamp}-{session.utterance_id or 'task'}")
+        written = []
+        if session.profile is not None:
+            import io
+            import pstats
+            session.profile.dump_stats(base + ".prof")
+            summary = io.StringIO()
+            pstats.Stats(session.profile, stream=summary).sort_stats("cumulative").print_stats(40)
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(summary.getvalue())
+            written += [base + ".prof", base + ".txt"]
+        if session.sampler is not None:
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for stack, count in session.sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            written.append(base + ".folded")
+        if trace is not None and trace.marks:
+            written.append(latency_trace.write_chrome_trace(
+                latency_trace.chrome_trace_events(trace.marks, session.utterance_id), base + ".trace.json"
+            ))
+        logger.info(f"Profile written: {', '.join(written)}")
+        with self._lock:
+            self.recent = (self.recent + written)[-MAX_RECENT:]
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Recording Spool - 確定した録音をワーカーの異常終了から守るメモリマップ式スプール
+stop_and_transcribe で前処理済みの音声をキューへ積む前に spool/recordings.bin へ追記し、
+テキストを届け終えたら確認済み (ACK) にする。ワーカーが CUDA エラーや OOM で落ちても、
+次に起動したワーカーが未確認のエントリを拾い直して文字起こしする。
+プロセス内で失敗した（モデルのロード失敗、API キー未設定など）エントリは fail() で試行回数を数え、
+MAX_ATTEMPTS に達したら確認済みにして諦める（未確認が残り続けてファイルが伸び続けないように）。
+
+ファイルは mmap で開いたままにし、追記と ACK はメモリへの書き込みだけで済ませる
+（書き込んだページはプロセスが落ちてもOSのページキャッシュに残る）。
+
+エントリ形式 (リトルエンディアン):
+    magic "RSP1" | state u8 | attempts u8 | reserved u16 | id 16B | meta_len u32 | audio_len u32
+    meta (JSON) | audio (float32 16kHz モノラル)
+state: 1=書き込み中 2=未確認 3=確認済み。先頭から順にたどり、magic が無い位置が末尾。
+全エントリが確認済みになったら先頭から書き直す。
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import logging
+import threading
+
+logger = logging.getLogger("RecordingSpool")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+SPOOL_FILE = os.path.join(PROJECT_ROOT, "spool", "recordings.bin")
+
+MAGIC = b"RSP1"
+STATE_WRITING = 1
+STATE_PENDING = 2
+STATE_DONE = 3
+
+# 拾い直しても落ち続けるエントリは諦める（起動時の拾い直しと、同じプロセス内での再試行の合計）
+MAX_ATTEMPTS = 3
+# 同じプロセス内で再試行するまでの秒数（失敗回数に比例して延ばす）
+RETRY_DELAY = 10.0
+INITIAL_SIZE = 16 * 1024 * 1024
+LOCK_TIMEOUT = 5.0
+
+_HEADER = struct.Struct("<4sBBH16sII")
+_STATE_OFFSET = 4
+_ATTEMPTS_OFFSET = 5
+
+
+def _try_lock(fd):
+    """他のワーカーが同じスプールを開いていないことを保証する（非ブロッキング）"""
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class RecordingSpool:
+    def __init__(self, path=SPOOL_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = None
+        self._mm = None
+        self._write_pos = 0
+        self._offsets = {}   # 未確認エントリの id -> ヘッダ位置
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o600)
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        # 入れ替わり直前のワーカーがまだ終了処理中のことがあるので少し待つ
+        while not _try_lock(fd):
+            if time.monotonic() > deadline:
+                os.close(fd)
+                raise OSError(f"Recording spool is locked by another process: {self.path}")
+            time.sleep(0.2)
+        self._fd = fd
+        if os.fstat(fd).st_size < INITIAL_SIZE:
+            os.ftruncate(fd, INITIAL_SIZE)
+        self._mm = mmap.mmap(fd, 0)
+        return self
+
+    def _grow(self, needed):
+        size = len(self._mm)
+        while size < needed:
+            size *= 2
+        self._mm.flush()
+        self._mm.close()
+        os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, 0)
+
+    def append(self, entry_id, audio_np, meta):
+        """録音を追記して未確認状態にする。ACK まではクラッシュ後も残る。"""
+        import numpy as np
+        audio = np.ascontiguousarray(audio_np, dtype=np.float32).tobytes()
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        key = entry_id.encode("ascii")[:16].ljust(16, b"\0")
+        with self._lock:
+            pos = self._write_pos
+            end = pos + _HEADER.size + len(meta_bytes) + len(audio)
+            # 末尾の目印 (magic を消した4バイト) の分も確保する
+            if end + 4 > len(self._mm):
+                self._grow(end + 4)
+            mm = self._mm
+            mm[pos:pos + _HEADER.size] = _HEADER.pack(MAGIC, STATE_WRITING, 0, 0, key, len(meta_bytes), len(audio))
+            body = pos + _HEADER.size
+            mm[body:body + len(meta_bytes)] = meta_bytes
+            mm[body + len(meta_bytes):end] = audio
+            mm[end:end + 4] = b"\0\0\0\0"
+            # 本体を書き終えてから未確認にする（書き込み途中で落ちたエントリは無視される）
+            mm[pos + _STATE_OFFSET] = STATE_PENDING
+            self._write_pos = end
+            self._offsets[entry_id] = pos
+
+    def ack(self, entry_id):
+        """テキストを届けた（または再送キューへ引き渡した）エントリを確認済みにする"""
+        with self._lock:
+            pos = self._offsets.pop(entry_id, None)
+            if pos is None:
+                return
+            self._mm[pos + _STATE_OFFSET] = STATE_DONE
+            if not self._offsets:
+                # 未確認が無くなったら先頭から使い直す
+                self._mm[0:4] = b"\0\0\0\0"
+                self._write_pos = 0
+
+    def fail(self, entry_id):
+        """
+        文字起こしに失敗したエントリの試行回数を増やす。再試行してよければ試行回数を、
+        MAX_ATTEMPTS に達したら確認済みにして None を返す（失敗したエントリで先頭からの使い直しを止めない）
+        """
+        with self._lock:
+            pos = self._offsets.get(entry_id)
+            if pos is None:
+                return None
+            attempts = self._mm[pos + _ATTEMPTS_OFFSET] + 1
+            self._mm[pos + _ATTEMPTS_OFFSET] = min(attempts, 255)
+            if attempts < MAX_ATTEMPTS:
+                return attempts
+        logger.error(f"Dropping recording {entry_id}: transcription failed {attempts} times")
+        self.ack(entry_id)
+        return None
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._offsets)
+
+    def recover(self):
+        """
+        前回のワーカーが届けられなかったエントリを返す: [(entry_id, audio_np, meta), ...]
+        起動時に一度だけ呼ぶ。MAX_ATTEMPTS 回拾い直しても終わらないエントリは破棄する。
+        """
+        import numpy as np
+        recovered = []
+        with self._lock:
+            mm = self._mm
+            pos = 0
+            while pos + _HEADER.size <= len(mm):
+                magic, state, attempts, _, key, meta_len, audio_len = _HEADER.unpack_from(mm, pos)
+                if magic != MAGIC:
+                    break
+                body = pos + _HEADER.size
+                end = body + meta_len + audio_len
+                if end > len(mm):
+                    break
+                if state == STATE_PENDING:
+                    entry_id = key.rstrip(b"\0").decode("ascii", "replace")
+                    if attempts >= MAX_ATTEMPTS:
+                        logger.error(f"Dropping recording {entry_id}: worker failed on it {attempts} times")
+                        mm[pos + _STATE_OFFSET] = STATE_DONE
+                    else:
+                        mm[pos + _ATTEMPTS_OFFSET] = attempts + 1
+                        try:
+                            meta = json.loads(bytes(mm[body:body + meta_len]).decode("utf-8"))
+                            audio_np = np.frombuffer(bytes(mm[body + meta_len:end]), dtype=np.float32)
+                        except Exception as e:
+                            logger.error(f"Broken spooled recording {entry_id}: {e}")
+                            mm[pos + _STATE_OFFSET] = STATE_DONE
+                        else:
+                            recovered.append((entry_id, audio_np, meta))
+                            self._offsets[entry_id] = pos
+                pos = end
+            self._write_pos = pos if self._offsets else 0
+            if not self._offsets:
+                mm[0:4] = b"\0\0\0\0"
+        if recovered:
+            logger.info(f"Recovered {len(recovered)} unacknowledged recording(s) from {self.path}")
+        return recovered
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+                self._mm.close()
+                self._mm = None
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Retry Spool - 失敗したオンライン文字起こしの再送キュー
+オンラインAPIが失敗した録音を 圧縮音声 (wav.gz) + 設定スナップショット (json) として
+ディスクに退避し、バックグラウンドで指数バックオフしながら再送する。
+
+再送に成功した結果は、その時点でフォーカスされているウィンドウには入力せず、
+クリップボードと履歴ファイルへ届ける（入力先がすでに変わっている可能性が高いため）。
+"""
+import os
+import io
+import json
+import time
+import gzip
+import uuid
+import wave
+import random
+import logging
+import threading
+
+import config_manager
+
+logger = logging.getLogger("RetrySpool")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+SPOOL_DIR = os.path.join(PROJECT_ROOT, "spool", "retry")
+HISTORY_FILE = os.path.join(PROJECT_ROOT, "logs", "transcription_history.jsonl")
+
+SAMPLE_RATE = 16000
+BASE_DELAY = 5.0       # 初回再送までの秒数
+MAX_DELAY = 600.0      # バックオフの上限
+MAX_AGE = 24 * 3600    # これより古いエントリは諦めて dead/ へ移す
+
+
+def append_history(text, origin):
+    """文字起こし結果を履歴ファイル (JSON Lines) に追記する"""
+    os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+    record = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "origin": origin, "text": text}
+    with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def deliver_deferred(text, config, origin):
+    """
+    遅れて得られた結果を届ける。
+    retry_delivery: "clipboard" (既定) はクリップボードにもコピー、"history" は履歴のみ。
+    """
+    append_history(text, origin)
+    if config.get("retry_delivery", "clipboard") == "clipboard":
+        import platform_utils
+        platform_utils.copy_text(text)
+
+
+def _encode_audio(audio_np):
+    """float32 音声を int16 WAV にして gzip 圧縮する"""
+    import numpy as np
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((np.clip(audio_np, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    return gzip.compress(buf.getvalue(), compresslevel=6)
+
+
+def _decode_audio(data):
+    import numpy as np
+    with wave.open(io.BytesIO(gzip.decompress(data)), "rb") as wav:
+        frames = wav.readframes(wav.getnframes())
+    return np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32767
+
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class RetrySpool:
+    """
+    失敗タスクのディスク退避と再送を担う。
+    transcribe(audio_np, config) -> text は再送時に呼ばれ、失敗時は例外を送出すること。
+    on_delivered(text, config) は再送成功時に呼ばれる。
+    """
+
+    def __init__(self, transcribe, on_delivered, spool_dir=SPOOL_DIR):
+        self.transcribe = transcribe
+        self.on_delivered = on_delivered
+        self.spool_dir = spool_dir
+        self.dead_dir = os.path.join(spool_dir, "dead")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _paths(self, entry_id):
+        base = os.path.join(self.spool_dir, entry_id)
+        return base + ".wav.gz", base + ".json"
+
+    def add(self, audio_np, config):
+        """失敗した録音を退避する。entry_id を返す。"""
+        entry_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:6]}"
+        audio_path, meta_path = self._paths(entry_id)
+        now = time.time()
+        meta = {
+            "id": entry_id,
+            "created": now,
+            "attempts": 0,
+            "next_retry": now + BASE_DELAY,
+            "config": config_manager.thaw(config),
+        }
+        with self._lock:
+            # 音声を先に書き、メタデータの存在をエントリ完成の印にする
+            _write_atomic(audio_path, _encode_audio(audio_np))
+            _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        logger.info(f"Spooled failed transcription {entry_id} for retry.")
+        self._wake.set()
+        return entry_id
+
+    def pending_count(self):
+        try:
+            return sum(1 for n in os.listdir(self.spool_dir) if n.endswith(".json"))
+        except OSError:
+            return 0
+
+    def kick(self):
+        """ネットワーク復旧が疑われる時に、待機中のエントリを即座に再送させる"""
+        with self._lock:
+            for meta_path in self._meta_files():
+                meta = self._read_meta(meta_path)
+                if meta and meta["next_retry"] > time.time():
+                    meta["next_retry"] = time.time()
+                    _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _meta_files(self):
+        try:
+            names = sorted(n for n in os.listdir(self.spool_dir) if n.endswith(".json"))
+        except OSError:
+            return []
+        return [os.path.join(self.spool_dir, n) for n in names]
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Broken spool entry {meta_path}: {e}")
+            return None
+
+    def _remove(self, entry_id):
+        for path in self._paths(entry_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _bury(self, entry_id):
+        """再送を諦めたエントリを dead/ へ移す（手動で救出できるよう削除はしない）"""
+        os.makedirs(self.dead_dir, exist_ok=True)
+        for path in self._paths(entry_id):
+            if os.path.exists(path):
+                os.replace(path, os.path.join(self.dead_dir, os.path.basename(path)))
+        logger.error(f"Giving up on spooled transcription {entry_id}; moved to {self.dead_dir}")
+
+    def _retry_one(self, meta_path, meta):
+        entry_id = meta["id"]
+        audio_path, _ = self._paths(entry_id)
+        try:
+            with open(audio_path, "rb") as f:
+                audio_np = _decode_audio(f.read())
+        except Exception as e:
+            logger.error(f"Spool entry {entry_id} has unreadable audio: {e}")
+            self._bury(entry_id)
+            return
+
+        try:
+            text = self.transcribe(audio_np, meta["config"])
+        except Exception as e:
+            meta["attempts"] += 1
+            if time.time() - meta["created"] > MAX_AGE:
+                self._bury(entry_id)
+                return
+            delay = min(MAX_DELAY, BASE_DELAY * (2 ** meta["attempts"]))
+            meta["next_retry"] = time.time() + delay * random.uniform(0.8, 1.2)
+            with self._lock:
+                _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+            logger.warning(f"Retry {meta['attempts']} for {entry_id} failed ({e}); next in {delay:.0f}s")
+            return
+
+        logger.info(f"Retry succeeded for {entry_id}: {text}")
+        if text:
+            self.on_delivered(text, meta["config"])
+        # 届け終えてから消す（on_delivered が失敗したらエントリを残して再送させる）
+        self._remove(entry_id)
+
+    def _run(self):
+        failures = 0
+        while True:
+            next_due = None
+            failed = False
+            try:
+                for meta_path in self._meta_files():
+                    try:
+                        meta = self._read_meta(meta_path)
+                        if meta is None:
+                            continue
+                        if meta["next_retry"] <= time.time():
+                            self._retry_one(meta_path, meta)
+                            meta = self._read_meta(meta_path) if os.path.exists(meta_path) else None
+                        if meta is not None:
+                            next_due = meta["next_retry"] if next_due is None else min(next_due, meta["next_retry"])
+                    except Exception:
+                        # 1つのエントリの想定外の失敗 (壊れた gzip、on_delivered の例外など) でスレッドを止めない
+                        logger.exception(f"Unexpected error while retrying {meta_path}")
+                        failed = True
+            except Exception:
+                logger.exception("Unexpected error in retry loop")
+                failed = True
+
+            # 次の期限まで（エントリが無ければ追加されるまで）眠る
+            timeout = None if next_due is None else max(0.0, next_due - time.time())
+            if failed:
+                # 失敗したエントリは期限が進まないので、バックオフを挟んで回し直す
+                failures += 1
+                backoff = min(MAX_DELAY, BASE_DELAY * (2 ** (failures - 1)))
+                timeout = backoff if timeout is None else min(timeout, backoff)
+            else:
+                failures = 0
+            self._wake.wait(timeout=timeout)
+            self._wake.clear()
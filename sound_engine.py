@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Sound Engine - 効果音をプロセス内で再生するエンジン
+起動時に効果音ファイルを一度だけデコードしてメモリに保持し、開きっぱなしの
+sounddevice 出力ストリームへ流し込む。ホットキーのたびに paplay / afplay を
+起動していた頃の fork/exec とデコード待ちが無くなる。
+
+ホットキー検出から音がDACに届くまでの遅延を計測し、latency_stats() で参照できる。
+
+出力ストリームはコールバックで常に起床するため、しばらく鳴らさなければ一時停止し、
+ホットキーの最初のキーが押された時点 (warm) で再開しておく。
+
+使い方 (計測):
+    python sound_engine.py [--repeat 10]
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+import platform_utils
+
+logger = logging.getLogger("SoundEngine")
+
+OUTPUT_SAMPLE_RATE = 48000
+# 最後に鳴らしてからこの秒数が経ったら出力ストリームを一時停止する
+IDLE_SUSPEND_SECONDS = 30.0
+
+CUE_FILES = {
+    "linux": {
+        "start": "/usr/share/sounds/freedesktop/stereo/camera-shutter.oga",
+        "stop": "/usr/share/sounds/freedesktop/stereo/complete.oga",
+        "error": "/usr/share/sounds/freedesktop/stereo/dialog-warning.oga"
+    },
+    "mac": {
+        "start": "/System/Library/Sounds/Tink.aiff",
+        "stop": "/System/Library/Sounds/Pop.aiff",
+        "error": "/System/Library/Sounds/Basso.aiff"
+    },
+}
+
+# ファイルが読めない環境 (Windows / soundfile 未導入) 向けの合成音: (周波数Hz, 長さ秒) の並び
+SYNTH_CUES = {
+    "start": [(1000, 0.12)],
+    "stop": [(800, 0.12)],
+    "error": [(400, 0.15), (0, 0.05), (400, 0.15)],
+}
+
+
+def _synthesize(tones, rate=OUTPUT_SAMPLE_RATE):
+    parts = []
+    for freq, duration in tones:
+        t = np.arange(int(duration * rate)) / rate
+        if freq <= 0:
+            parts.append(np.zeros_like(t))
+            continue
+        tone = 0.3 * np.sin(2 * np.pi * freq * t)
+        # クリックノイズ防止のフェード
+        fade = min(len(t) // 4, int(0.005 * rate))
+        if fade:
+            ramp = np.linspace(0.0, 1.0, fade)
+            tone[:fade] *= ramp
+            tone[-fade:] *= ramp[::-1]
+        parts.append(tone)
+    return np.concatenate(parts).astype(np.float32)
+
+
+def _load_file(path, rate=OUTPUT_SAMPLE_RATE):
+    """効果音ファイルをモノラル float32 にデコードし、出力レートへ変換する"""
+    import soundfile
+    data, file_rate = soundfile.read(path, dtype="float32", always_2d=True)
+    mono = data.mean(axis=1)
+    if file_rate != rate:
+        n = int(len(mono) * rate / file_rate)
+        mono = np.interp(np.linspace(0, len(mono) - 1, n), np.arange(len(mono)), mono)
+    return mono.astype(np.float32)
+
+
+class SoundEngine:
+    def __init__(self, samplerate=OUTPUT_SAMPLE_RATE):
+        self.samplerate = samplerate
+        self.cues = {}
+        self.stream = None
+        # ストリームの再開・一時停止・終了 (ホットキーのスレッドとタイマーから来る) を直列にする。
+        # stream.stop() はコールバックの終了を待つので、コールバックが取る _lock とは分け、必ずこちらを先に取る
+        self._stream_lock = threading.RLock()
+        self._last_used = time.monotonic()
+        self._lock = threading.Lock()
+        self._current = None   # 再生中のバッファ
+        self._pos = 0
+        self._pending = None   # (要求時の stream.time, ホットキーからの経過秒) 最初の出力で遅延を確定する
+        self._suspend_timer = None
+        self.latencies_ms = deque(maxlen=200)
+
+    def load(self):
+        """効果音を一度だけデコードする"""
+        files = CUE_FILES.get(platform_utils.get_platform(), {})
+        for name, tones in SYNTH_CUES.items():
+            path = files.get(name)
+            if path and os.path.exists(path):
+                try:
+                    self.cues[name] = _load_file(path, self.samplerate)
+                    continue
+                except Exception as e:
+                    logger.info(f"Could not decode {path}, using synthesized cue: {e}")
+            self.cues[name] = _synthesize(tones, self.samplerate)
+        return self
+
+    def start(self):
+        """出力ストリームを開いたままにする"""
+        import sounddevice as sd
+        if not self.cues:
+            self.load()
+        self.stream = sd.OutputStream(
+            samplerate=self.samplerate,
+            channels=1,
+            dtype="float32",
+            latency="low",
+            callback=self._callback,
+        )
+        self.stream.start()
+        self._schedule_suspend()
+        logger.info(f"Sound engine ready (output latency {self.stream.latency * 1000:.1f} ms)")
+        return self
+
+    def _schedule_suspend(self):
+        if self._suspend_timer is not None:
+            self._suspend_timer.cancel()
+        self._suspend_timer = threading.Timer(IDLE_SUSPEND_SECONDS, self._suspend)
+        self._suspend_timer.daemon = True
+        self._suspend_timer.start()
+
+    def _suspend(self):
+        """アイドル中はストリームを止めてコールバックによる起床をなくす（デバイスは開いたまま）"""
+        with self._stream_lock:
+            with self._lock:
+                playing = self._current is not None
+            # タイマーの起動後に warm / play が来ていたら止めずに先送りする
+            if playing or time.monotonic() - self._last_used < IDLE_SUSPEND_SECONDS:
+                self._schedule_suspend()
+                return
+            try:
+                if self.stream is not None and self.stream.active:
+                    self.stream.stop()
+                    logger.debug("Sound engine suspended.")
+            except Exception as e:
+                logger.info(f"Failed to suspend output stream: {e}")
+
+    def warm(self):
+        """一時停止中なら再開しておく（ホットキーの押し始めに呼ぶ。動作中なら使った時刻だけ更新する）"""
+        with self._stream_lock:
+            self._last_used = time.monotonic()
+            if self.stream is None or self.stream.active:
+                return
+            self.stream.start()
+            self._schedule_suspend()
+
+    def close(self):
+        with self._stream_lock:
+            if self._suspend_timer is not None:
+                self._suspend_timer.cancel()
+            if self.stream is not None:
+                try:
+                    self.stream.close()
+                except Exception:
+                    pass
+                self.stream = None
+
+    @property
+    def ready(self):
+        return self.stream is not None
+
+    def play(self, name, requested_at=None):
+        """
+        効果音を鳴らす（即座に戻る）。
+        requested_at にホットキー検出時刻 (time.monotonic()) を渡すと、そこからDAC出力までを計測する。
+        """
+        cue = self.cues.get(name)
+        if cue is None:
+            return False
+        # 再開してから鳴らし始めるまでの間に一時停止されないよう、まとめて _stream_lock の中で行う
+        with self._stream_lock:
+            if not self.ready:
+                return False
+            try:
+                self.warm()
+            except Exception as e:
+                logger.info(f"Output stream unavailable: {e}")
+                return False
+            self._schedule_suspend()
+            since_hotkey = time.monotonic() - requested_at if requested_at is not None else 0.0
+            with self._lock:
+                self._current = cue
+                self._pos = 0
+                self._pending = (self.stream.time, since_hotkey)
+        return True
+
+    def _callback(self, outdata, frames, time_info, status):
+        with self._lock:
+            cue = self._current
+            if cue is None:
+                outdata.fill(0)
+                return
+            chunk = cue[self._pos:self._pos + frames]
+            outdata[:len(chunk), 0] = chunk
+            outdata[len(chunk):] = 0
+            self._pos += len(chunk)
+            if self._pending is not None:
+                requested_stream_time, since_hotkey = self._pending
+                self._pending = None
+                latency = time_info.outputBufferDacTime - requested_stream_time + since_hotkey
+                self.latencies_ms.append(latency * 1000)
+            if self._pos >= len(cue):
+                self._current = None
+
+    def latency_stats(self):
+        """ホットキー→効果音出力の遅延統計 (ms)"""
+        values = sorted(self.latencies_ms)
+        if not values:
+            return {"count": 0}
+        def pct(p):
+            return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 2)
+        return {"count": len(values), "last": round(self.latencies_ms[-1], 2), "p50": pct(50), "p95": pct(95), "max": round(values[-1], 2)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [SOUND] %(message)s')
+    parser = argparse.ArgumentParser(description="Measure hotkey-to-cue latency of the in-process sound engine")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = SoundEngine().start()
+    for i in range(args.repeat):
+        for name in ("start", "stop"):
+            engine.play(name, requested_at=time.monotonic())
+            time.sleep(0.4)
+    engine.close()
+    print(json.dumps(engine.latency_stats(), indent=2))
@@ -9,19 +9,12 @@ import threading
 import time
 import tkinter as tk
 import platform
-import json
-import os
-
-PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
-CONFIG_FILE = os.path.join(PROJECT_ROOT, "config.json")
+import ipc_protocol
+import config_manager
 
 def load_ui_position():
-    try:
-        with open(CONFIG_FILE, "r") as f:
-            c = json.load(f)
-            return c.get("ui_position", "bottom")
-    except:
-        return "bottom"
+    # 設定スナップショットを参照する（config.json が変わった時だけ読み直される）
+    return config_manager.get_config().get("ui_position", "bottom")
 
 class FloatingOverlay:
     def __init__(self):
@@ -71,12 +64,12 @@ class FloatingOverlay:
         self.running = True
         self.start_time = 0
         self.current_state = "READY"
+        # 録音中のみ動かすタイマー / エラー表示の解除予約
+        self.timer_job = None
+        self.error_job = None
         
         # Start stdin monitor in background
         threading.Thread(target=self._monitor_stdin, daemon=True).start()
-        
-        # タイマー更新ループ
-        self._update_timer()
 
     def _recenter_window(self):
         self.root.update_idletasks()
@@ -98,13 +91,24 @@ class FloatingOverlay:
         self.root.geometry(f"+{x}+{y}")
 
     def set_status(self, state):
+        if state == "READY" and self.error_job is not None:
+            # デーモンはエラーの直後に READY を送ってくるので、2秒の表示は _clear_error に任せる
+            return
         self.current_state = state
+        # 表示が切り替わったら、録音タイマーとエラー解除予約は不要になる
+        if self.timer_job is not None:
+            self.root.after_cancel(self.timer_job)
+            self.timer_job = None
+        if self.error_job is not None and state != "ERROR":
+            self.root.after_cancel(self.error_job)
+            self.error_job = None
         if state == "READY":
             self.root.withdraw()
         else:
             if state == "REC":
                 self.start_time = time.time()
                 self.label.config(text="🔴 録音中 [00:00]", fg="#ff4444")
+                self.timer_job = self.root.after(1000, self._update_timer)
             elif state == "PROC_LOCAL":
                 self.label.config(text="⏳ 処理中... (Local)", fg="#ffff44")
             elif state == "PROC_ONLINE":
@@ -118,22 +122,37 @@ class FloatingOverlay:
             self.root.deiconify()
 
     def _update_timer(self):
-        if self.running:
-            if self.current_state == "REC":
-                elapsed = int(time.time() - self.start_time)
-                mins, secs = divmod(elapsed, 60)
-                self.label.config(text=f"🔴 録音中 [{mins:02d}:{secs:02d}]")
-                self._recenter_window()
-            # 1秒（1000ms）ごとに再実行
-            self.root.after(1000, self._update_timer)
+        """録音中だけ1秒ごとに経過時間を更新する（非表示の間はタイマー自体を止める）"""
+        self.timer_job = None
+        if self.running and self.current_state == "REC":
+            elapsed = int(time.time() - self.start_time)
+            mins, secs = divmod(elapsed, 60)
+            self.label.config(text=f"🔴 録音中 [{mins:02d}:{secs:02d}]")
+            self._recenter_window()
+            # 次の秒の境目に合わせて再実行
+            delay = 1000 - int((time.time() - self.start_time) * 1000) % 1000
+            self.timer_job = self.root.after(delay, self._update_timer)
+
+    def _show_error(self):
+        if self.error_job is not None:
+            self.root.after_cancel(self.error_job)
+        self.set_status("ERROR")
+        # エラー表示を2秒残してREADYに戻る
+        self.error_job = self.root.after(2000, self._clear_error)
+
+    def _clear_error(self):
+        self.error_job = None
+        if self.current_state == "ERROR":
+            self.set_status("READY")
 
     def _monitor_stdin(self):
+        reader = ipc_protocol.FrameReader(sys.stdin.buffer)
         while self.running:
             try:
-                line = sys.stdin.readline()
-                if not line: break
+                message = reader.read()
+                if message is None: break
                 
-                cmd = line.strip().upper()
+                cmd = message.get("name", "").upper()
                 
                 # GUI thread safe call
                 if cmd == "REC":
@@ -145,9 +164,7 @@ class FloatingOverlay:
                 elif cmd == "READY":
                     self.root.after(0, self.set_status, "READY")
                 elif "ERROR" in cmd:
-                    self.root.after(0, self.set_status, "ERROR")
-                    time.sleep(2) # エラー表示を2秒残してREADYに戻る
-                    self.root.after(0, self.set_status, "READY")
+                    self.root.after(0, self._show_error)
                 elif cmd == "QUIT":
                     self.running = False
                     self.root.after(0, self.root.quit)
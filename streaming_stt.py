@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Streaming STT - 録音中に音声をオンラインプロバイダへ逐次送信するバックエンド
+START でセッションを開き、録音コールバックから届いたフレームを HTTP chunked 転送で送り続ける。
+STOP では残りのフレームを流し切って最終テキストを待つだけなので、
+アップロードとデコードの大部分が録音時間の裏に隠れる。
+
+注意: 下記はこのツール独自のプロトコルで、groq / openai など LiteLLM 経由のプロバイダは話さない
+（各社のリアルタイム API は WebSocket で形式も異なる）。stream_url には、このプロトコルを受けて
+手元の推論サーバや各社のリアルタイム API へ中継する自前のブリッジ (またはテスト用の
+streaming_stub_server.py) を指定する。
+
+プロトコル (streaming_stub_server.py が同じものを実装):
+    POST <stream_url>
+    Transfer-Encoding: chunked
+    Content-Type: audio/L16; rate=<Hz>; channels=1   (リトルエンディアン int16 PCM)
+    X-Language: ja                                  (任意)
+    X-Prompt: <initial prompt, URLエンコード>        (任意)
+    Authorization: Bearer <api_key>                 (任意)
+    → 200 {"text": "..."}
+
+使い方 (ベンチマーク):
+    python streaming_stt.py bench [--url http://127.0.0.1:8765] [--seconds 5]
+"""
+import sys
+import json
+import time
+import queue
+import logging
+import threading
+import http.client
+import urllib.parse
+
+logger = logging.getLogger("StreamingSTT")
+
+# sender スレッドへの終了通知
+_END = object()
+_CANCEL = object()
+
+
+class StreamingError(Exception):
+    """ストリーミングセッションの失敗"""
+
+
+class ChunkedHTTPStream:
+    """録音中の音声フレームを HTTP chunked 転送で逐次送信するセッション"""
+
+    def __init__(self, url, sample_rate, language="", prompt="", api_key="", timeout=30.0):
+        self.url = url
+        self.sample_rate = int(sample_rate)
+        self.language = language
+        self.prompt = prompt
+        self.api_key = api_key
+        self.timeout = timeout
+
+        self._frames = queue.Queue()
+        self._done = threading.Event()
+        self._text = None
+        self._error = None
+        self._thread = None
+        self.bytes_sent = 0
+
+    def start(self):
+        """送信スレッドを開始する（接続確立も裏で行い、START をブロックしない）"""
+        self._thread = threading.Thread(target=self._sender, daemon=True)
+        self._thread.start()
+        return self
+
+    def feed(self, frames):
+        """
+        録音コールバックから呼ばれる。float32 [-1, 1] のモノラルフレームを受け取る。
+        コールバックを止めないよう、変換してキューに積むだけにする。
+        """
+        if self._done.is_set():
+            return
+        import numpy as np
+        pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        self._frames.put(pcm)
+
+    def finish(self, timeout=None):
+        """残りのフレームを流し切り、最終テキストを返す。失敗時は StreamingError を送出する。"""
+        self._frames.put(_END)
+        if not self._done.wait(timeout=timeout if timeout is not None else self.timeout):
+            raise StreamingError("Timed out waiting for final transcript")
+        if self._error:
+            raise StreamingError(self._error)
+        return self._text
+
+    def cancel(self):
+        """セッションを破棄する（結果は使わない）"""
+        self._frames.put(_CANCEL)
+
+    def _headers(self):
+        headers = {
+            "Transfer-Encoding": "chunked",
+            "Content-Type": f"audio/L16; rate={self.sample_rate}; channels=1",
+        }
+        if self.language:
+            headers["X-Language"] = self.language
+        if self.prompt:
+            headers["X-Prompt"] = urllib.parse.quote(self.prompt)
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _sender(self):
+        conn = None
+        try:
+            parsed = urllib.parse.urlsplit(self.url)
+            conn_cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+            conn = conn_cls(parsed.hostname, parsed.port, timeout=self.timeout)
+            path = parsed.path or "/"
+            if parsed.query:
+                path += "?" + parsed.query
+
+            conn.putrequest("POST", path, skip_accept_encoding=True)
+            for key, value in self._headers().items():
+                conn.putheader(key, value)
+            conn.endheaders()
+
+            while True:
+                item = self._frames.get()
+                if item is _CANCEL:
+                    return
+                # 溜まっているフレームはまとめて1チャンクで送る（syscall削減）
+                chunk = [] if item is _END else [item]
+                finished = item is _END
+                while not finished:
+                    try:
+                        nxt = self._frames.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is _CANCEL:
+                        return
+                    if nxt is _END:
+                        finished = True
+                    else:
+                        chunk.append(nxt)
+
+                payload = b"".join(chunk)
+                if payload:
+                    conn.send(f"{len(payload):X}\r\n".encode("ascii") + payload + b"\r\n")
+                    self.bytes_sent += len(payload)
+                if finished:
+                    conn.send(b"0\r\n\r\n")
+                    break
+
+            response = conn.getresponse()
+            body = response.read()
+            if response.status != 200:
+                raise StreamingError(f"HTTP {response.status}: {body[:200]!r}")
+            self._text = json.loads(body.decode("utf-8")).get("text", "").strip()
+        except Exception as e:
+            self._error = str(e)
+            logger.warning(f"Streaming session failed: {e}")
+        finally:
+            self._done.set()
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def open_session(config, sample_rate, initial_prompt=""):
+    """
+    設定中のオンラインプロバイダが stream_url を持っていればセッションを開いて返す。
+    ストリーミング非対応なら None。stream_url は上記の独自プロトコルを話す自前のブリッジを指すこと。
+    """
+    provider_name = config.get("online_provider", "groq")
+    provider_cfg = config.get("online_providers", {}).get(provider_name, {})
+    url = provider_cfg.get("stream_url")
+    if not url:
+        return None
+    session = ChunkedHTTPStream(
+        url,
+        sample_rate,
+        language=config.get("language", ""),
+        prompt=initial_prompt,
+        api_key=provider_cfg.get("api_key", ""),
+    )
+    return session.start()
+
+
+# --- Benchmark ---
+
+def _batch_request(url, pcm, sample_rate):
+    """比較用: 録音終了後に全音声を一括アップロードする従来方式"""
+    import io
+    import wave
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    parsed = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+    conn.request("POST", "/v1/audio/transcriptions", body=buf.getvalue(), headers={"Content-Type": "audio/wav"})
+    response = conn.getresponse()
+    text = json.loads(response.read().decode("utf-8")).get("text", "")
+    conn.close()
+    return text
+
+
+def run_benchmark(base_url=None, seconds=5.0, sample_rate=16000, block=1024):
+    """
+    実時間で録音を模擬しながら、STOP から最終テキストまでの待ち時間を
+    ストリーミング方式と一括方式で比較する。base_url 未指定ならスタブサーバを内部起動する。
+    """
+    import numpy as np
+
+    server = None
+    if base_url is None:
+        import streaming_stub_server
+        server = streaming_stub_server.start_in_thread(port=0)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(int(seconds * sample_rate)) * 0.1).astype(np.float32)
+    blocks = [audio[i:i + block] for i in range(0, len(audio), block)]
+    block_sec = block / sample_rate
+
+    try:
+        # ストリーミング: 録音と並行して送信
+        session = ChunkedHTTPStream(base_url + "/v1/audio/stream", sample_rate).start()
+        for b in blocks:
+            session.feed(b)
+            time.sleep(block_sec)
+        t0 = time.perf_counter()
+        session.finish()
+        stream_latency = time.perf_counter() - t0
+
+        # 一括: 録音終了後にアップロード
+        for _ in blocks:
+            time.sleep(block_sec)
+        pcm = (audio * 32767).astype("<i2").tobytes()
+        t0 = time.perf_counter()
+        _batch_request(base_url, pcm, sample_rate)
+        batch_latency = time.perf_counter() - t0
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    return {
+        "audio_seconds": seconds,
+        "stream_stop_to_text_ms": round(stream_latency * 1000, 1),
+        "batch_stop_to_text_ms": round(batch_latency * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [STREAM] %(message)s')
+    parser = argparse.ArgumentParser(description="Streaming STT backend utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="Compare stop-to-text latency of streaming vs batch upload")
+    bench.add_argument("--url", default=None, help="Base URL of a stand-in server (default: start one in-process)")
+    bench.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        print(json.dumps(run_benchmark(args.url, args.seconds), indent=2))
+        sys.exit(0)
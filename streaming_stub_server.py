@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Streaming Stub Server - ストリーミングSTTプロバイダのローカル代替サーバ
+インターネットなしで streaming_stt.py の動作確認とレイテンシ計測を行うためのもの。
+標準ライブラリのみで動作する。
+
+エンドポイント:
+    POST /v1/audio/stream          chunked 転送の PCM16 を受信しながら逐次「デコード」する
+    POST /v1/audio/transcriptions  WAV 本体を一括受信してから「デコード」する（比較用）
+
+デコード時間は音声長 × --rtf で模擬する。ストリーミングでは受信済みチャンクを
+到着ごとに処理するため、終了時に残るのは最後のチャンク分 + --tail だけになる。
+
+使い方:
+    python streaming_stub_server.py [--port 8765] [--rtf 0.1] [--tail 0.05]
+"""
+import re
+import json
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("StreamingStub")
+
+DEFAULT_PORT = 8765
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # サーバ単位の設定 (make_server で上書き)
+    rtf = 0.1
+    tail = 0.05
+
+    def log_message(self, fmt, *args):
+        logger.debug(fmt % args)
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _iter_chunks(self):
+        """chunked 転送のボディをチャンク単位で読み出す（途中切断時は aborted を立てる）"""
+        self.aborted = False
+        while True:
+            size_line = self.rfile.readline()
+            if not size_line:
+                # クライアントがキャンセルして切断した
+                self.aborted = True
+                return
+            size = int(size_line.split(b";")[0].strip(), 16)
+            if size == 0:
+                # trailer を読み捨てる
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            data = self.rfile.read(size)
+            self.rfile.readline()  # CRLF
+            yield data
+
+    def _sample_rate(self, default=16000):
+        match = re.search(r"rate=(\d+)", self.headers.get("Content-Type", ""))
+        return int(match.group(1)) if match else default
+
+    def do_POST(self):
+        if self.path.startswith("/v1/audio/stream"):
+            self._handle_stream()
+        elif self.path.startswith("/v1/audio/transcriptions"):
+            self._handle_batch()
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def _handle_stream(self):
+        if "chunked" not in self.headers.get("Transfer-Encoding", "").lower():
+            self._reply(400, {"error": "chunked transfer encoding required"})
+            return
+        rate = self._sample_rate()
+        total_samples = 0
+        for chunk in self._iter_chunks():
+            samples = len(chunk) // 2
+            total_samples += samples
+            # 到着したチャンクをその場で「デコード」する
+            time.sleep(samples / rate * self.rtf)
+        if self.aborted:
+            self.close_connection = True
+            return
+        time.sleep(self.tail)
+        seconds = total_samples / rate
+        self._reply(200, {"text": f"stub transcript ({seconds:.2f}s)", "audio_seconds": seconds})
+
+    def _handle_batch(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        body = self.rfile.read(length)
+        rate = 16000
+        # WAV ヘッダからサンプルレートを読む（無ければ 16kHz とみなす）
+        if body[:4] == b"RIFF" and len(body) >= 44:
+            rate = int.from_bytes(body[24:28], "little")
+            body = body[44:]
+        seconds = (len(body) // 2) / rate
+        time.sleep(seconds * self.rtf + self.tail)
+        self._reply(200, {"text": f"stub transcript ({seconds:.2f}s)", "audio_seconds": seconds})
+
+
+def make_server(port=DEFAULT_PORT, rtf=0.1, tail=0.05, host="127.0.0.1"):
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"rtf": rtf, "tail": tail})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_in_thread(port=0, rtf=0.1, tail=0.05):
+    """バックグラウンドスレッドでサーバを起動して返す（port=0 で空きポート）"""
+    server = make_server(port=port, rtf=rtf, tail=tail)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [STUB] %(message)s')
+    parser = argparse.ArgumentParser(description="Local stand-in for a streaming STT provider")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--rtf", type=float, default=0.1, help="Simulated decode real-time factor")
+    parser.add_argument("--tail", type=float, default=0.05, help="Simulated finalization delay (seconds)")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.rtf, args.tail)
+    logger.info(f"Listening on http://127.0.0.1:{server.server_address[1]} (rtf={args.rtf}, tail={args.tail}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
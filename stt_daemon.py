@@ -3,56 +3,69 @@
 STT Daemon - pystray Edition (Cross-Platform)
 ホットキーを監視し、Unified Workerを制御する。
 pystrayでシステムトレイに常駐するクロスプラットフォーム実装。
+
+起動は段階的に行う: まずホットキーとトレイを用意し、オーバーレイ・ワーカー・効果音・
+メトリクス・マイクチェックはトレイ表示後にバックグラウンドで起動する。
+各段階の時刻は制御APIの status (startup) で確認できる（bench_startup.py が使う）。
 """
+import time
+# 起動時間の計測基準（他の import より前に取る）
+PROCESS_STARTED = time.monotonic()
+
 import sys
 import os
-import time
 import subprocess
 import threading
 import signal
 import socket
+from collections import deque
 from pynput import keyboard
 import config_manager
 import platform_utils
+import ipc_protocol
+import control_api
+import latency_trace
+import metrics
+import log_setup
 import logging
 
-log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - [DAEMON] %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, "stt_daemon.log")),
-        logging.StreamHandler()
-    ]
-)
+log_setup.setup("DAEMON", "stt_daemon.log", config_manager.get_config(), console=True)
 logger = logging.getLogger("Daemon")
 
 def check_singleton():
-    """Ensure only one instance runs using a local TCP port."""
+    """Ensure only one instance runs using a local TCP port (also serves the control API)."""
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
-        sock.bind(("127.0.0.1", 34291))
+        sock.bind((control_api.CONTROL_HOST, control_api.CONTROL_PORT))
         # Keep socket open to hold the lock
         return sock 
     except socket.error:
         print("Another instance is already running. Exiting.")
         sys.exit(1)
 
-# pystray imports
-import pystray
-from PIL import Image
-
 # --- Configuration ---
 WORKER_SCRIPT = "stt_worker_unified.py"
 OVERLAY_SCRIPT = "status_overlay.py"
 PYTHON_CMD = sys.executable
 ICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stt_icon.png")
 
+# 起動直後に落ち続けるワーカーの再起動間隔 (秒)
+MIN_HEALTHY_SECONDS = 10.0
+MAX_RESPAWN_DELAY = 60.0
+
+# ワーカーが起動時にだけ読む設定。これらが変わった時だけワーカーを再起動する
+WORKER_RESTART_KEYS = {
+    "local_model_id", "local_device", "local_compute_type", "hybrid_timeout", "local_model_timeout",
+    "metrics_enabled", "memory_timeline_interval_ms", "memory_timeline_capacity", "memory_timeline_gpu",
+    "log_max_bytes", "log_backup_count", "log_format",
+}
+# デーモン自身が起動時にだけ読む設定。reload では反映できないので requires_restart として返す
+DAEMON_RESTART_KEYS = {"metrics_enabled", "metrics_port", "log_max_bytes", "log_backup_count", "log_format"}
+
 class OverlayManager:
     def __init__(self):
         self.process = None
+        self.writer = None
         self.lock = threading.RLock()
         
     def ensure_running(self):
@@ -68,21 +81,20 @@ class OverlayManager:
                 stdin=subprocess.PIPE,
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.DEVNULL,
-                text=True,
-                bufsize=1,
+                bufsize=0,
                 cwd=os.path.dirname(os.path.abspath(__file__))
             )
+            self.writer = ipc_protocol.FrameWriter(self.process.stdin)
         except Exception as e:
             logger.info(f"Failed to spawn overlay: {e}")
             self.process = None
 
-    def send_command(self, cmd):
+    def send_command(self, cmd, req_id=None):
         self.ensure_running()
         with self.lock:
             if self.process:
                 try:
-                    self.process.stdin.write(cmd + "\n")
-                    self.process.stdin.flush()
+                    self.writer.send_new(ipc_protocol.KIND_CMD, cmd, req_id=req_id)
                 except:
                     self.process = None
                     
@@ -90,19 +102,35 @@ class OverlayManager:
         with self.lock:
             if self.process:
                 try:
-                    self.process.stdin.write("QUIT\n")
-                    self.process.stdin.flush()
+                    self.writer.send_new(ipc_protocol.KIND_CMD, "QUIT")
                     self.process.wait(timeout=1)
                 except:
                     self.process.terminate()
                 self.process = None
 
 class WorkerManager:
-    def __init__(self, status_callback=None):
+    def __init__(self, status_callback=None, result_callback=None, registry=None):
         self.process = None
+        self.writer = None
         self.lock = threading.RLock()
         self.status_callback = status_callback
+        self.result_callback = result_callback
         self.monitor_thread = None
+        # HELLO 受信 (= import 完了) を示す
+        self.ready_event = threading.Event()
+        self.spawned_at = 0.0
+        # 最初のワーカーが import を終えた時刻 (起動時間の計測用)
+        self.first_hello_at = None
+        self.respawn_delay = 0.0
+        # ワーカーがモデルを保持している間 True (MODEL_LOADED 〜 UNLOADED / 終了)
+        self.model_loaded = False
+        # 応答待ちのリクエスト: req_id -> [Event, ACK メッセージ]
+        self.pending_replies = {}
+        registry = registry or metrics.NullRegistry()
+        self.m_spawns = registry.counter("stt_worker_spawns", "Worker processes spawned")
+        registry.gauge("stt_worker_ready", "1 while a worker that has finished importing is running").set_function(
+            lambda: 1 if self.ready_event.is_set() and self.process is not None and self.process.poll() is None else 0
+        )
         
     def ensure_running(self):
         with self.lock:
@@ -116,103 +144,239 @@ class WorkerManager:
     def _spawn(self):
         try:
             logger.info("Spawning worker...")
+            self.ready_event.clear()
+            self.model_loaded = False
+            self.spawned_at = time.monotonic()
+            self.m_spawns.inc()
+            # stdin/stdout はフレーム化メッセージ。ワーカーのログは stt_worker.log にだけ書かせ、
+            # stderr にはログ以外の出力（捕まえられなかった例外やネイティブライブラリの警告）だけが来る
             self.process = subprocess.Popen(
                 [PYTHON_CMD, WORKER_SCRIPT],
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                cwd=os.path.dirname(os.path.abspath(__file__))
+                stderr=subprocess.PIPE,
+                bufsize=0,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                env=dict(os.environ, **{log_setup.CONSOLE_ENV: "0"})
             )
-            self.monitor_thread = threading.Thread(target=self._monitor_output, daemon=True)
+            self.writer = ipc_protocol.FrameWriter(self.process.stdin)
+            self.monitor_thread = threading.Thread(target=self._monitor_output, args=(self.process,), daemon=True)
             self.monitor_thread.start()
+            threading.Thread(target=self._monitor_log, args=(self.process,), daemon=True).start()
             
         except Exception as e:
             logger.info(f"Failed to spawn worker: {e}")
             self.process = None
 
-    def _monitor_output(self):
-        if not self.process: return
-        
+    def _monitor_output(self, process):
+        """ワーカーからのフレーム化メッセージを処理する"""
         try:
-            for line in iter(self.process.stdout.readline, ''):
-                if not line: break
-                line = line.strip()
-                logger.info(f"[WORKER] {line}")
-                
-                if line.startswith("[STATUS]"):
-                    status = line.replace("[STATUS]", "").strip()
+            for message in ipc_protocol.FrameReader(process.stdout):
+                kind = message.get("kind")
+                name = message.get("name")
+                if kind == ipc_protocol.KIND_STATUS:
+                    logger.info(f"[WORKER] status {name}", extra={"utterance_id": message.get("id")})
+                    if name == "MODEL_LOADED":
+                        self.model_loaded = True
+                    elif name in ("UNLOADED", "MODEL_ERROR"):
+                        self.model_loaded = False
                     if self.status_callback:
-                        self.status_callback(status)
+                        self.status_callback(name, message)
+                elif kind == ipc_protocol.KIND_RESULT:
+                    if self.result_callback:
+                        self.result_callback(message)
+                elif kind == ipc_protocol.KIND_HELLO:
+                    self.ready_event.set()
+                    if self.first_hello_at is None:
+                        self.first_hello_at = message["ts"]
+                    startup_ms = (message["ts"] - self.spawned_at) * 1000
+                    logger.info(f"[WORKER] hello (pid={message['payload'].get('pid')}, imports done in {startup_ms:.0f} ms)")
+                elif kind == ipc_protocol.KIND_ACK:
+                    logger.debug(f"[WORKER] ack {name} (id={message.get('id')})")
+                    waiter = self.pending_replies.get(message.get("id"))
+                    if waiter is not None:
+                        waiter[1] = message
+                        waiter[0].set()
         except Exception as e:
             logger.info(f"Monitor error: {e}")
         
         # ワーカープロセス終了時: 録音状態を確実にリセット
         logger.info("[WORKER] Process exited. Resetting state.")
+        if self.process is process:
+            self.model_loaded = False
         if self.status_callback:
-            self.status_callback("READY")
+            self.status_callback("READY", None)
+        self._respawn_standby(process)
+
+    def _respawn_standby(self, process):
+        """
+        ワーカーが終了したら、次の START を待たずに import 済みの待機ワーカーを用意する。
+        起動直後に落ち続ける場合は間隔を倍々に空ける。cleanup() による終了では起動しない。
+        """
+        if not config_manager.get_config().get("worker_standby", True):
+            return
+        with self.lock:
+            if self.process is not process:
+                return
+            lived = time.monotonic() - self.spawned_at
+        if lived < MIN_HEALTHY_SECONDS:
+            self.respawn_delay = min(MAX_RESPAWN_DELAY, max(1.0, self.respawn_delay * 2))
+            logger.info(f"Worker exited after {lived:.1f}s; respawning in {self.respawn_delay:.0f}s")
+            time.sleep(self.respawn_delay)
+        else:
+            self.respawn_delay = 0.0
+        with self.lock:
+            # 待っている間に START で起動済みなら何もしない
+            if self.process is process:
+                self._spawn()
 
-    def send_command(self, cmd):
+    def _monitor_log(self, process):
+        """ワーカーの stderr を読む（ログは来ないので、来たものは異常として残す）"""
+        try:
+            for line in iter(process.stderr.readline, b''):
+                logger.warning(f"[WORKER stderr] {line.decode('utf-8', errors='replace').rstrip()}")
+        except Exception:
+            pass
+
+    def send_command(self, cmd, req_id=None, payload=None):
         self.ensure_running()
+        message = ipc_protocol.make_message(ipc_protocol.KIND_CMD, cmd, req_id=req_id, payload=payload)
         with self.lock:
             if self.process and self.process.poll() is None:
                 try:
-                    self.process.stdin.write(cmd + "\n")
-                    self.process.stdin.flush()
+                    self.writer.send(message)
                 except BrokenPipeError:
                     logger.info("Worker pipe broken. Restarting...")
                     self.process = None
                     self._spawn()
                     if self.process:
-                        self.process.stdin.write(cmd + "\n")
-                        self.process.stdin.flush()
+                        self.writer.send(message)
+        return message
+
+    def request(self, cmd, timeout=1.0, payload=None):
+        """コマンドを送り、ワーカーの ACK (応答データ付き) を待って返す。応答が無ければ None"""
+        req_id = ipc_protocol.new_request_id()
+        waiter = [threading.Event(), None]
+        self.pending_replies[req_id] = waiter
+        try:
+            self.send_command(cmd, req_id=req_id, payload=payload)
+            waiter[0].wait(timeout)
+            return waiter[1]
+        finally:
+            self.pending_replies.pop(req_id, None)
 
     def cleanup(self):
         with self.lock:
-            if self.process:
+            # 先に手放しておき、終了検知側が待機ワーカーを起動し直さないようにする
+            process, self.process = self.process, None
+            if process:
                 try:
-                    self.process.stdin.write("QUIT\n")
-                    self.process.stdin.flush()
-                    self.process.wait(timeout=2)
+                    self.writer.send_new(ipc_protocol.KIND_CMD, "QUIT")
+                    process.wait(timeout=2)
                 except:
-                    self.process.terminate()
-                self.process = None
+                    process.terminate()
+
+def _latency_summary(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    def pct(p):
+        return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 1)
+    return {"count": len(values), "p50": pct(50), "p95": pct(95), "max": round(values[-1], 1)}
 
 class STTDaemon:
-    def __init__(self):
-        self.config = config_manager.load_config()
+    def __init__(self, control_socket=None):
+        self.config = config_manager.get_config()
         self.hotkey = self.config.get("hotkey", "<ctrl>+<shift>+<space>")
         
+        # 性能カウンタ (metrics_enabled が false の間は何もしない)
+        self.metrics = metrics.create_registry(self.config)
+        self.m_hotkeys = self.metrics.counter("stt_hotkey_actions", "Recording start/stop/cancel requests", ("action",))
+        self.m_stop_to_result = self.metrics.histogram(
+            "stt_stop_to_result_seconds", "Time from STOP sent to the worker's result"
+        )
+        
         self.overlay_mgr = OverlayManager()
-        self.worker_mgr = WorkerManager(status_callback=self.on_worker_status)
+        self.worker_mgr = WorkerManager(
+            status_callback=self.on_worker_status, result_callback=self.on_worker_result, registry=self.metrics
+        )
         
         self.recording = False
+        # 録音状態の遷移 (ホットキーのスレッドと制御APIの接続ごとのスレッドから来る) を直列にする
+        self.state_lock = threading.RLock()
+        # 録音中の発話のリクエストID と、発話ごとの段階の印 (結果との突き合わせ用)
+        self.utterance_id = None
+        self.traces = {}
+        self.result_latencies_ms = deque(maxlen=200)
         self.listener = None
         
+        # 効果音エンジン（デコードとストリーム準備は段階2でバックグラウンドに）
+        self.sound = None
+        
+        # 起動段階の時刻 (monotonic): process / hotkey_ready / tray_ready / worker_imported / transcription_ready
+        self.startup = {"process": PROCESS_STARTED}
+        self.metrics_server = None
+        
+        # 段階1: トレイアイコンとホットキー（オーバーレイやワーカーの起動は待たない）
+        import pystray
         self.icon = pystray.Icon("stt-daemon")
         self.icon.title = "STT Daemon"
+        self.icon.icon = self._load_icon_image()
+        
+        # メニュー作成 (ホットキーのリスナーもここで起動する)
+        self.rebuild_menu()
+        self._mark_startup("hotkey_ready")
+        
+        # 二重起動防止のソケットで制御APIを提供する（GUI・外部ツール用）
+        self.control = None
+        if control_socket is not None:
+            try:
+                self.control = control_api.ControlServer(control_socket, self._control_handlers()).start()
+            except Exception as e:
+                logger.info(f"Control API unavailable: {e}")
+        
+        logger.info(f"--- STT Daemon (pystray) ---")
+
+    def _load_icon_image(self):
+        from PIL import Image
         try:
-            self.icon.icon = Image.open(ICON_PATH)
+            return Image.open(ICON_PATH)
         except Exception as e:
             logger.error(f"Failed to load icon: {e}")
-            self.icon.icon = Image.new('RGB', (64, 64), color='black')
-        
-        # メニュー作成
-        self.rebuild_menu()
+            return Image.new('RGB', (64, 64), color='black')
+
+    def _mark_startup(self, stage):
+        if stage not in self.startup:
+            self.startup[stage] = time.monotonic()
+            logger.info(f"Startup: {stage} after {(self.startup[stage] - PROCESS_STARTED) * 1000:.0f} ms")
+
+    def _start_background(self, icon=None):
+        """段階2: トレイ表示後に重い部品を起動する（pystray の setup スレッドで呼ばれる）"""
+        if icon is not None:
+            icon.visible = True
+        self._mark_startup("tray_ready")
         
-        # プリロード
-        self.overlay_mgr.ensure_running()
+        # ワーカーを先に起動し、import とモデルのロードを他の準備と並行させる
         self.worker_mgr.ensure_running()
+        self.overlay_mgr.ensure_running()
         
-        # 起動時マイクチェック（バックグラウンド）
+        # 効果音エンジン・起動時マイクチェック
+        threading.Thread(target=self._init_sound, daemon=True).start()
         threading.Thread(target=self._startup_mic_check, daemon=True).start()
         
-        logger.info(f"--- STT Daemon (pystray) ---")
+        # OpenMetrics エンドポイント（有効時のみ）
+        if self.metrics.enabled:
+            port = self.config.get("metrics_port", metrics.DEFAULT_PORT)
+            try:
+                self.metrics_server = metrics.serve(self._collect_metrics, port=port)
+                logger.info(f"Metrics endpoint: http://127.0.0.1:{port}/metrics")
+            except OSError as e:
+                logger.info(f"Metrics endpoint unavailable on port {port}: {e}")
         
     def rebuild_menu(self):
         """設定言語に基づいてメニューを再構築"""
         import i18n
+        import pystray
         lang = self.config.get("ui_language", "ja")
         
         menu_items = [
@@ -225,20 +389,28 @@ class STTDaemon:
         self.hotkey_mode = self.config.get("hotkey_mode", "toggle")
         self.setup_hotkey()
         
-    def on_worker_status(self, status):
-        self.overlay_mgr.send_command(status)
+    def _reset_recording(self):
+        with self.state_lock:
+            self.recording = False
+
+    def on_worker_status(self, status, message=None):
+        req_id = message.get("id") if message else None
+        if status == "READY" and message is not None:
+            # 最初の READY = モデルのロード完了（オンデマンド時は import 完了直後）
+            self._mark_startup("transcription_ready")
+        self.overlay_mgr.send_command(status, req_id)
         # ワーカーがREADYに戻った場合、デーモン側の状態もリセット
         # （録音エラー時のデッドロック防止）
         if status == "READY":
-            self.recording = False
+            self._reset_recording()
         elif status == "UNLOADED":
             # モデルアンロード完了 → オーバーレイをクリア
-            self.recording = False
+            self._reset_recording()
             self.overlay_mgr.send_command("READY")
         elif status == "MODEL_ERROR":
-            self.recording = False
+            self._reset_recording()
             self.overlay_mgr.send_command("READY")
-            platform_utils.play_sound("error")
+            self.play_cue("error")
             import i18n
             lang = self.config.get("ui_language", "ja")
             self._send_notification(
@@ -247,24 +419,221 @@ class STTDaemon:
                 "critical"
             )
         elif status == "DEVICE_ERROR":
-            self.recording = False
+            self._reset_recording()
             self.overlay_mgr.send_command("READY")
-            platform_utils.play_sound("error")
+            self.play_cue("error")
             self._send_notification(
                 "STT - Device Error",
                 "マイクデバイスにアクセスできませんでした。\nUSBを挿し直すか、設定を確認してください。",
                 "critical"
             )
+        elif status == "DEVICE_SWITCHED":
+            # 録音は続いているので状態は変えず、切り替えたことだけ知らせる
+            import i18n
+            lang = self.config.get("ui_language", "ja")
+            info = (message or {}).get("payload") or {}
+            rate = info.get("sample_rate") or 1
+            self._send_notification("STT - Mic Switched", i18n.get_text(
+                "device_switched", lang,
+                old=info.get("from") or "?", new=info.get("to") or "?",
+                ms=info.get("switch_ms") or 0, lost_ms=1000 * (info.get("lost_samples") or 0) / rate,
+            ))
+        elif status == "RETRY_DELIVERED":
+            import i18n
+            lang = self.config.get("ui_language", "ja")
+            self._send_notification("STT - Retry", i18n.get_text("retry_delivered", lang))
+        elif status == "RECOVERED_DELIVERED":
+            import i18n
+            lang = self.config.get("ui_language", "ja")
+            self._send_notification("STT - Recovered", i18n.get_text("recovered_delivered", lang))
         elif status == "SILENT_ERROR":
-            self.recording = False
+            self._reset_recording()
             self.overlay_mgr.send_command("READY")
-            platform_utils.play_sound("error")
+            self.play_cue("error")
             self._send_notification(
                 "STT - Mic Warning",
                 "マイクが音を拾っていません。\nミュートになっていないか、接続を確認してください。",
                 "normal"
             )
 
+    def on_worker_result(self, message):
+        """発話の文字起こし結果。ワーカー側の印と合わせて段階ごとの所要時間を記録する"""
+        received_at = time.monotonic()
+        req_id = message.get("id")
+        payload = message.get("payload", {})
+        trace = self.traces.pop(req_id, None) or latency_trace.Trace(req_id)
+        trace.merge(payload.get("marks"))
+        trace.mark("result_received", received_at)
+        elapsed = "no STOP recorded"
+        stop_ts = trace.marks.get("stop_sent")
+        if stop_ts is not None:
+            self.result_latencies_ms.append((message['ts'] - stop_ts) * 1000)
+            self.m_stop_to_result.observe(message['ts'] - stop_ts)
+            elapsed = f"{self.result_latencies_ms[-1]:.0f} ms after STOP"
+        logger.info(f"Result for {req_id}: {len(payload.get('text', ''))} chars via {payload.get('source')} ({elapsed})")
+        latency_trace.write_record(trace, payload.get("source"))
+
+    def _start_utterance(self, hotkey_at=None):
+        self.utterance_id = ipc_protocol.new_request_id()
+        trace = latency_trace.Trace(self.utterance_id)
+        trace.mark("hotkey", hotkey_at)
+        # play_cue は呼び出し済み（エンジンへ渡して戻った時刻）
+        trace.mark("cue_queued")
+        self.traces[self.utterance_id] = trace
+        # 結果が返らなかった発話 (無音・中止等) の分が溜まり続けないようにする
+        while len(self.traces) > 100:
+            self.traces.pop(next(iter(self.traces)))
+        message = self.worker_mgr.send_command("START", req_id=self.utterance_id)
+        trace.mark("start_sent", message["ts"])
+        self.m_hotkeys.labels("start").inc()
+        self.recording = True
+
+    def _stop_utterance(self, hotkey_at=None):
+        trace = self.traces.get(self.utterance_id)
+        if trace is not None:
+            trace.mark("stop_hotkey", hotkey_at)
+        message = self.worker_mgr.send_command("STOP", req_id=self.utterance_id)
+        if trace is not None:
+            trace.mark("stop_sent", message["ts"])
+        self.m_hotkeys.labels("stop").inc()
+        self.recording = False
+
+    def _cancel_utterance(self):
+        self.traces.pop(self.utterance_id, None)
+        self.worker_mgr.send_command("CANCEL", req_id=self.utterance_id)
+        self.m_hotkeys.labels("cancel").inc()
+        self.recording = False
+
+    # --- Control API ---
+
+    def _control_handlers(self):
+        return {
+            "ping": lambda args: {"pong": True},
+            "status": self._control_status,
+            "start": self._control_start,
+            "stop": self._control_stop,
+            "toggle": self._control_toggle,
+            "cancel": self._control_cancel,
+            "reload": self._control_reload,
+            "metrics": self._control_metrics,
+            "memdump": self._control_memdump,
+            "profile": self._control_profile,
+        }
+
+    def _control_status(self, args):
+        worker = self.worker_mgr.process
+        return {
+            "recording": self.recording,
+            "utterance_id": self.utterance_id if self.recording else None,
+            "worker_pid": worker.pid if worker is not None and worker.poll() is None else None,
+            "worker_ready": self.worker_mgr.ready_event.is_set(),
+            "model_loaded": self.worker_mgr.model_loaded,
+            "hotkey": self.hotkey,
+            "hotkey_mode": self.hotkey_mode,
+            "awaiting_results": sum(1 for t in self.traces.values() if "stop_sent" in t.marks),
+            "startup": self._startup_stages(),
+        }
+
+    def _startup_stages(self):
+        """起動段階の時刻 (monotonic 秒)。同一ホストなら他プロセスの monotonic と比較できる"""
+        stages = dict(self.startup)
+        if self.worker_mgr.first_hello_at is not None:
+            stages["worker_imported"] = self.worker_mgr.first_hello_at
+        return stages
+
+    def _control_start(self, args):
+        with self.state_lock:
+            if not self.recording:
+                logger.info("Control: START")
+                requested_at = time.monotonic()
+                self.play_cue("start", requested_at)
+                self._start_utterance(requested_at)
+            return {"recording": True, "id": self.utterance_id}
+
+    def _control_stop(self, args):
+        with self.state_lock:
+            if self.recording:
+                logger.info("Control: STOP")
+                requested_at = time.monotonic()
+                self.play_cue("stop", requested_at)
+                self._stop_utterance(requested_at)
+            return {"recording": False, "id": self.utterance_id}
+
+    def _control_toggle(self, args):
+        with self.state_lock:
+            return self._control_stop(args) if self.recording else self._control_start(args)
+
+    def _control_cancel(self, args):
+        with self.state_lock:
+            cancelled = self.recording
+            if cancelled:
+                logger.info("Control: CANCEL")
+                self._cancel_utterance()
+            return {"cancelled": cancelled, "id": self.utterance_id}
+
+    def _control_reload(self, args):
+        keys = args.get("keys")
+        if keys is not None and not isinstance(keys, list):
+            raise ValueError("keys must be a list")
+        return self.reload_config(keys=keys)
+
+    def _control_metrics(self, args):
+        return {
+            "stop_to_result_ms": _latency_summary(self.result_latencies_ms),
+            "cue_latency_ms": self.sound.latency_stats() if self.sound is not None else {"count": 0},
+        }
+
+    def _control_memdump(self, args):
+        """ワーカーのメモリ時系列を書き出させる"""
+        process = self.worker_mgr.process
+        if process is None or process.poll() is not None:
+            raise RuntimeError("worker is not running")
+        reply = self.worker_mgr.request("MEMDUMP", timeout=5.0, payload={"inline": bool(args.get("inline"))})
+        if reply is None:
+            raise RuntimeError("worker did not respond")
+        result = reply.get("payload") or {}
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+
+    def _control_profile(self, args):
+        """ワーカーに次の count 発話のプロファイルを予約させる（count 省略時は状態の確認）"""
+        process = self.worker_mgr.process
+        if process is None or process.poll() is not None:
+            raise RuntimeError("worker is not running")
+        payload = {key: args[key] for key in ("count", "mode", "interval_ms") if args.get(key) is not None}
+        reply = self.worker_mgr.request("PROFILE", timeout=2.0, payload=payload)
+        if reply is None:
+            raise RuntimeError("worker did not respond")
+        result = reply.get("payload") or {}
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+
+    def _collect_metrics(self):
+        """デーモンとワーカーのカウンタを1つの OpenMetrics テキストにまとめる"""
+        text = self.metrics.render(eof=False)
+        process = self.worker_mgr.process
+        if process is not None and process.poll() is None:
+            reply = self.worker_mgr.request("METRICS", timeout=1.0)
+            if reply is not None:
+                text += reply.get("payload", {}).get("text", "")
+        return text + "# EOF\n"
+
+    def _init_sound(self):
+        """効果音を一度だけデコードし、出力ストリームを開いたままにする"""
+        try:
+            import sound_engine
+            self.sound = sound_engine.SoundEngine().start()
+        except Exception as e:
+            logger.info(f"Sound engine unavailable, falling back to system player: {e}")
+
+    def play_cue(self, sound_type, requested_at=None):
+        """効果音を鳴らす。エンジンが使えない場合は従来の外部プレイヤーで鳴らす"""
+        if self.sound is not None and self.sound.play(sound_type, requested_at=requested_at):
+            return
+        platform_utils.play_sound(sound_type)
+
     def _startup_mic_check(self):
         """起動時のマイクチェック（警告のみ、config書き換えなし）"""
         import i18n
@@ -278,7 +647,8 @@ class STTDaemon:
         sample_rate = self.config.get("sample_rate", 44100)
         
         logger.info(f"Mic check: device = {device_idx}")
-        result = mic_checker.check_device(device_idx, sample_rate=sample_rate)
+        result = mic_checker.check_device(device_idx, sample_rate=sample_rate,
+                                          device_name=self.config.get("device_name"))
         
         if result["error"]:
             # デバイスを開けなかった
@@ -302,34 +672,36 @@ class STTDaemon:
 
     def on_activate(self):
         """Toggle mode の動作"""
-        if self.recording:
-            logger.info("Hotkey: STOP (Toggle)")
-            # 効果音再生
-            platform_utils.play_sound("stop")
-            self.worker_mgr.send_command("STOP")
-            self.recording = False
-        else:
-            logger.info("Hotkey: START (Toggle)")
-            # 効果音再生
-            platform_utils.play_sound("start")
-            self.worker_mgr.send_command("START")
-            self.recording = True
+        pressed_at = time.monotonic()
+        with self.state_lock:
+            if self.recording:
+                logger.info("Hotkey: STOP (Toggle)")
+                # 効果音再生
+                self.play_cue("stop", pressed_at)
+                self._stop_utterance(pressed_at)
+            else:
+                logger.info("Hotkey: START (Toggle)")
+                # 効果音再生
+                self.play_cue("start", pressed_at)
+                self._start_utterance(pressed_at)
 
     def on_press_hold(self):
         """Hold mode の開始動作"""
-        if not self.recording:
-            logger.info("Hotkey: START (Hold)")
-            platform_utils.play_sound("start")
-            self.worker_mgr.send_command("START")
-            self.recording = True
+        pressed_at = time.monotonic()
+        with self.state_lock:
+            if not self.recording:
+                logger.info("Hotkey: START (Hold)")
+                self.play_cue("start", pressed_at)
+                self._start_utterance(pressed_at)
 
     def on_release_hold(self):
         """Hold mode の終了動作"""
-        if self.recording:
-            logger.info("Hotkey: STOP (Hold)")
-            platform_utils.play_sound("stop")
-            self.worker_mgr.send_command("STOP")
-            self.recording = False
+        released_at = time.monotonic()
+        with self.state_lock:
+            if self.recording:
+                logger.info("Hotkey: STOP (Hold)")
+                self.play_cue("stop", released_at)
+                self._stop_utterance(released_at)
 
     def setup_hotkey(self):
         try:
@@ -354,7 +726,14 @@ class STTDaemon:
             self.hotkey_obj = keyboard.HotKey(keys, _on_activate_wrapped)
             
             def on_press(key):
-                self.hotkey_obj.press(self.listener.canonical(key))
+                canonical_key = self.listener.canonical(key)
+                # ホットキーの押し始めに効果音ストリームを起こしておく
+                if self.sound is not None and canonical_key in keys:
+                    try:
+                        self.sound.warm()
+                    except Exception:
+                        pass
+                self.hotkey_obj.press(canonical_key)
             
             def on_release(key):
                 # ホールドモードの場合、ホットキーのどれか1つでも離されたらSTOP
@@ -371,14 +750,28 @@ class STTDaemon:
             self.listener.start()
             
             logger.info(f"Hotkey Listener Started: {self.hotkey} (Mode: {self.hotkey_mode})")
-            self.overlay_mgr.send_command("READY")
+            # 起動直後はオーバーレイがまだ無い（起動時は READY 表示で始まるので送らない）
+            if self.overlay_mgr.process is not None:
+                self.overlay_mgr.send_command("READY")
         except Exception as e:
             logger.info(f"Hotkey Error: {e}")
 
-    def reload_config(self):
-        logger.info("Reloading configuration...")
+    def reload_config(self, keys=None):
+        """
+        設定を読み直して反映する。keys を渡すと、そのキーに関係する部分だけを反映する
+        （例: ホットキーだけならワーカーを再起動しない）。反映した内容と、デーモンの再起動が
+        必要な変更 (requires_restart) を返す。
+        """
+        logger.info(f"Reloading configuration... (keys={keys if keys is not None else 'all'})")
+        applied = []
         try:
-            self.config = config_manager.load_config()
+            previous = self.config
+            self.config = config_manager.get_config(force_reload=True)
+            requires_restart = sorted(
+                key for key in DAEMON_RESTART_KEYS if previous.get(key) != self.config.get(key)
+            )
+            if requires_restart:
+                logger.info(f"Daemon restart needed to apply: {', '.join(requires_restart)}")
             new_hotkey = self.config.get("hotkey", "<ctrl>+<shift>+<space>")
             new_mode = self.config.get("hotkey_mode", "toggle")
             
@@ -389,17 +782,27 @@ class STTDaemon:
                 if self.listener:
                     self.listener.stop()
                 self.setup_hotkey()
+                applied.append("hotkey")
 
-            self.worker_mgr.restart()
-            self.overlay_mgr.cleanup()
-            self.overlay_mgr.ensure_running()
+            # それ以外の設定はワーカーとオーバーレイが次の操作時にスナップショットから読む
+            if keys is None or WORKER_RESTART_KEYS.intersection(keys):
+                self.worker_mgr.restart()
+                applied.append("worker")
+            if keys is None:
+                self.overlay_mgr.cleanup()
+                self.overlay_mgr.ensure_running()
+                applied.append("overlay")
             
             # メニューを再構築
-            self.rebuild_menu()
-            self.icon.update_menu()
+            if keys is None or "ui_language" in keys:
+                self.rebuild_menu()
+                self.icon.update_menu()
+                applied.append("menu")
             
         except Exception as e:
             logger.info(f"Reload failed: {e}")
+            raise
+        return {"applied": applied, "requires_restart": requires_restart}
 
     def on_settings(self, icon, item):
         def _run():
@@ -407,7 +810,6 @@ class STTDaemon:
             try:
                 subprocess.run([PYTHON_CMD, "gui.py"], cwd=os.path.dirname(os.path.abspath(__file__)))
                 logger.info("GUI closed.")
-                self.reload_config()
             except Exception as e:
                 logger.info(f"GUI Error: {e}")
         threading.Thread(target=_run, daemon=True).start()
@@ -416,6 +818,12 @@ class STTDaemon:
         logger.info("Exiting...")
         if self.listener:
             self.listener.stop()
+        if self.sound is not None:
+            self.sound.close()
+        if self.control is not None:
+            self.control.close()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
         self.worker_mgr.cleanup()
         self.overlay_mgr.cleanup()
         self.icon.stop()
@@ -425,7 +833,10 @@ class STTDaemon:
         def _handle_signal(sig, frame):
             logger.info(f"Received signal {sig}")
             if hasattr(signal, "SIGUSR1") and sig == signal.SIGUSR1:
-                self.reload_config()
+                try:
+                    self.reload_config()
+                except Exception:
+                    pass
             else:
                 self.on_exit(None, None)
 
@@ -434,11 +845,11 @@ class STTDaemon:
         signal.signal(signal.SIGINT, _handle_signal)
         signal.signal(signal.SIGTERM, _handle_signal)
         
-        self.icon.run()
+        self.icon.run(setup=self._start_background)
 
 if __name__ == "__main__":
     # Prevent double execution
     lock_socket = check_singleton()
     
-    app = STTDaemon()
+    app = STTDaemon(control_socket=lock_socket)
     app.run()
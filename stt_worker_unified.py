@@ -15,20 +15,24 @@ import numpy as np
 import sounddevice as sd
 import config_manager
 import platform_utils
+import ipc_protocol
+import streaming_stt
+import retry_spool
+import recording_spool
+import latency_trace
+import metrics
+import memory_timeline
+import log_setup
+import profiling
+import device_registry
 
 import gc
 
 # --- Logging Setup ---
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - [WORKER] %(message)s', datefmt='%H:%M:%S')
+# デーモンから起動された場合は stderr へは出さない（ログは stt_worker.log だけに書く）
+log_setup.setup("WORKER", "stt_worker.log", config_manager.get_config())
 logger = logging.getLogger("UnifiedWorker")
 
-log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-os.makedirs(log_dir, exist_ok=True)
-file_handler = logging.FileHandler(os.path.join(log_dir, "stt_worker.log"))
-file_formatter = logging.Formatter('%(asctime)s - [WORKER] %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
-
 # 初期メモリ使用量ログ
 try:
     import resource
@@ -60,15 +64,107 @@ def log_memory_usage(label=""):
     except Exception as e:
         pass
 
+def _claim_ipc_channel():
+    """
+    stdout をフレーム化メッセージ専用にする。
+    ライブラリの print 等が紛れ込まないよう、元の stdout を複製して確保した上で
+    fd 1 と sys.stdout を stderr (ログ) へ向け直す。
+    """
+    sys.stdout.flush()
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "wb", buffering=0)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    return ipc_protocol.FrameWriter(out), ipc_protocol.FrameReader(sys.stdin.buffer)
+
 # --- Constants ---
 DEFAULT_SAMPLE_RATE = 16000
 INFERENCE_SAMPLE_RATE = 16000  # Whisperモデルが要求するサンプルレート
 CHANNELS = 1
 BLOCK_SIZE = 1024
 
+# 録音中のデバイス切り替え: コールバックがこの秒数届かなければ停止とみなす / 1録音あたりの切り替え回数の上限
+CAPTURE_STALL_SECONDS = 1.5
+CAPTURE_WATCH_INTERVAL = 0.2
+MAX_CAPTURE_FAILOVERS = 3
+# 切り替えで欠けた区間に入れる無音の上限（前後の単語がつながらない程度）
+MAX_GAP_FILL_SECONDS = 0.3
+
+# 逐次入力: 前にスペースを入れない文字（句読点・閉じ括弧など）
+NO_SPACE_BEFORE = set(".,!?;:%)]}…、。，．！？；：）」』】〉》")
+# 逐次入力: 後ろにスペースを入れない文字（開き括弧など）
+NO_SPACE_AFTER = set("([{「『【〈《（")
+# 単語間をスペースで区切らない言語
+CJK_LANGUAGES = ("ja", "zh")
+
+def join_segment(previous, segment, lang):
+    """
+    逐次入力用に、入力済みの文字列 previous の後ろへ続けるセグメント文字列を返す。
+    ja/zh は空白を挟まず（英単語同士が隣接する場合のみ1つ入れる）、
+    それ以外の言語は単語間に空白を1つ入れる。句読点の前・開き括弧の後には入れない。
+    """
+    text = segment.strip()
+    if not text or not previous:
+        return text
+    last, first = previous[-1], text[0]
+    if last.isspace() or first in NO_SPACE_BEFORE or last in NO_SPACE_AFTER:
+        return text
+    if lang in CJK_LANGUAGES:
+        if last.isascii() and last.isalnum() and first.isascii() and first.isalnum():
+            return " " + text
+        return text
+    return " " + text
+
+def resample_chunk(chunk, src_rate, dst_rate):
+    """(N, 1) のチャンクを線形補間で dst_rate にする（切り替え先のデバイスのレートが違う時だけ使う）"""
+    n = max(1, int(round(len(chunk) * dst_rate / src_rate)))
+    x = np.linspace(0, len(chunk) - 1, n)
+    return np.interp(x, np.arange(len(chunk)), chunk[:, 0]).astype(np.float32).reshape(-1, 1)
+
+def preprocess_audio(audio_np, rec_sample_rate, speed_factor=1.0):
+    """録音した音声を推論用 (16kHz) にリサンプリングし、speed_factor 分だけ間引く"""
+    if rec_sample_rate != INFERENCE_SAMPLE_RATE:
+        import scipy.signal
+        num_samples = int(len(audio_np) * INFERENCE_SAMPLE_RATE / rec_sample_rate)
+        audio_np = scipy.signal.resample(audio_np, num_samples).astype(np.float32)
+        logger.info(f"Resampled audio: {rec_sample_rate}Hz -> {INFERENCE_SAMPLE_RATE}Hz")
+    
+    if speed_factor > 1.0:
+        indices = np.arange(0, len(audio_np), speed_factor)
+        audio_np = audio_np[indices.astype(int)]
+    return audio_np
+
 class UnifiedSTTWorker:
-    def __init__(self):
-        self.config = config_manager.load_config()
+    def __init__(self, config=None, interactive=True, output_sink=None):
+        """
+        interactive=False はデーモンを介さずに使うモード（bench_replay.py 等）。
+        IPC・コマンド受付・スプールを使わず、結果は output_sink(text) に渡す。
+        """
+        self.interactive = interactive
+        self.output_sink = output_sink
+        if interactive:
+            # デーモンとの通信路 (import 完了をまず知らせる)
+            self.ipc, ipc_reader = _claim_ipc_channel()
+            self.ipc.send_new(ipc_protocol.KIND_HELLO, "WORKER", payload={"pid": os.getpid()})
+        else:
+            self.ipc = ipc_protocol.FrameWriter(open(os.devnull, "wb"))
+        
+        self.config = config if config is not None else config_manager.get_config()
+        
+        # 性能カウンタ (metrics_enabled が false の間は何もしない)
+        self._init_metrics(metrics.create_registry(self.config))
+        
+        # メモリ時系列 (処理中だけ標本を取る。MEMDUMP で書き出す)
+        self.memory = memory_timeline.MemoryTimeline(
+            interval=self.config.get("memory_timeline_interval_ms", 250) / 1000,
+            capacity=self.config.get("memory_timeline_capacity", 4096),
+            gpu=self.config.get("memory_timeline_gpu", False) and self.config.get("local_device", "cuda") == "cuda",
+        ).start()
+        
+        # PROFILE コマンドで指定された発話だけプロファイルする
+        self.profiler = profiling.UtteranceProfiler()
+        # 入力デバイスの対応チャンネル数・サンプルレート（調べ済みの結果を共有する）
+        self.devices = device_registry.get_registry()
+        self.capture = None
         
         # モデルIDから読み込みパスを解決
         self.model_id = self.config.get("local_model_id", "RoachLin/kotoba-whisper-v2.2-faster")
@@ -115,6 +211,40 @@ class UnifiedSTTWorker:
         # 処理キューの追加 (録音と処理の切り離し)
         self.transcription_queue = queue.Queue()
         
+        # リクエストID: 録音中の発話 / 処理中のタスク
+        self.utterance_id = None
+        self.active_task_id = None
+        # 処理中のタスクが前回のワーカーから引き継いだ録音か（結果はクリップボード/履歴へ届ける）
+        self.active_task_deferred = False
+        # 段階ごとの時刻の印: 録音中の発話 / 処理中のタスク
+        self.trace = None
+        self.active_trace = None
+        
+        # 録音中にオンラインへ逐次送信するセッション (stream_url 設定時のみ)
+        self.stream_session = None
+        
+        # オンライン失敗時の再送キュー (前回までに退避された未送信分もここで拾う)
+        # 非対話モードでは本番のスプールに触れないよう一時ディレクトリへ退避するだけにする
+        if interactive:
+            self.retry_spool = retry_spool.RetrySpool(self._transcribe_spooled, self._deliver_retried).start()
+        else:
+            import tempfile
+            self.retry_spool = retry_spool.RetrySpool(
+                self._transcribe_spooled, self._deliver_retried, spool_dir=tempfile.mkdtemp(prefix="stt-replay-")
+            )
+        
+        # 確定した録音をワーカーの異常終了から守るスプール
+        self.recording_spool = None
+        if interactive:
+            try:
+                self.recording_spool = recording_spool.RecordingSpool().open()
+            except Exception as e:
+                logger.warning(f"Recording spool unavailable, recordings will not survive a crash: {e}")
+        
+        # モデル解放のタイマー（ポーリングせず、期限にだけ起床する）
+        self.unload_timer = None
+        self.unload_timer_lock = threading.Lock()
+        
         self.last_activity = time.time()
         
         # 設定: モデル保持時間 (秒)
@@ -131,40 +261,148 @@ class UnifiedSTTWorker:
             # それ以外（On-demand / Hybrid）は必要時ロード
             logger.info("On-demand/Hybrid mode: Model will be loaded upon recording.")
             # READYシグナルを出して待機
-            print("[STATUS] READY")
-            sys.stdout.flush()
+            self.emit_status("READY")
 
         self.cmd_queue = queue.Queue()
+        if not interactive:
+            return
         
         def _stdin_reader():
-            for line in iter(sys.stdin.readline, ''):
-                if not line:
-                    break
-                self.cmd_queue.put(line.strip().upper())
+            try:
+                for message in ipc_reader:
+                    if message.get("kind") == ipc_protocol.KIND_CMD:
+                        self.cmd_queue.put(message)
+            except Exception as e:
+                logger.error(f"IPC read error: {e}")
             # sys.stdinが閉じられた（親プロセスが死んだ等）場合QUITを送って自らも終了する
-            self.cmd_queue.put("QUIT")
+            self.cmd_queue.put(ipc_protocol.make_message(ipc_protocol.KIND_CMD, "QUIT"))
         threading.Thread(target=_stdin_reader, daemon=True).start()
-
-        # タイムアウト監視スレッドの開始
-        threading.Thread(target=self._monitor_timeout, daemon=True).start()
         
         # バックグラウンド処理スレッドの開始
         threading.Thread(target=self._transcription_worker, daemon=True).start()
+        
+        # 前回のワーカーが届けられなかった録音を拾い直す
+        self._recover_spooled_recordings()
 
-    def _monitor_timeout(self):
-        """モデル保持時間が指定されている場合、アイドル時間を監視してアンロード"""
-        while True:
-            time.sleep(1)
-            if self.model and self.model_timeout > 0:
-                # 録音中や、処理待ちがある間はアンロードしない
-                if not self.recording and not self.model_loading and self.transcription_queue.empty():
-                    elapsed = time.time() - self.last_activity
-                    if elapsed > self.model_timeout:
-                        logger.info(f"Timeout reached ({elapsed:.1f}s > {self.model_timeout}s). Unloading model...")
-                        self.unload_model()
+    def _init_metrics(self, registry):
+        self.metrics = registry
+        self.m_utterances = registry.counter("stt_utterances", "Transcribed utterances", ("source",))
+        self.m_audio_seconds = registry.counter("stt_audio_seconds", "Seconds of audio transcribed", ("backend",))
+        self.m_rtf = registry.histogram(
+            "stt_real_time_factor", "Transcription time divided by audio duration", ("backend",), buckets=metrics.RATIO_BUCKETS
+        )
+        self.m_model_loads = registry.counter("stt_model_loads", "Local model load attempts", ("result",))
+        self.m_model_load_seconds = registry.histogram("stt_model_load_seconds", "Local model load duration")
+        self.m_model_unloads = registry.counter("stt_model_unloads", "Local model unloads")
+        self.m_model_unload_seconds = registry.histogram("stt_model_unload_seconds", "Local model unload duration")
+        self.m_online_seconds = registry.histogram("stt_online_request_seconds", "Online provider request duration", ("provider",))
+        self.m_online_errors = registry.counter("stt_online_errors", "Online provider failures", ("provider",))
+        self.m_capture_overflows = registry.counter("stt_capture_overflows", "Input overflows reported by the audio callback")
+        self.m_capture_failovers = registry.counter(
+            "stt_capture_failovers", "Input device switches during a recording", ("result",)
+        )
+        self.m_capture_switch_seconds = registry.histogram(
+            "stt_capture_switch_seconds", "Time from a capture failure to the first audio from the fallback device"
+        )
+        # 以下は収集時にだけ値を読む
+        registry.gauge("stt_worker_rss_bytes", "Worker resident set size").set_function(
+            lambda: get_current_memory_usage_mb() * 1024 * 1024
+        )
+        registry.gauge("stt_transcription_queue_depth", "Tasks waiting in the transcription queue").set_function(
+            lambda: self.transcription_queue.qsize()
+        )
+        registry.gauge("stt_retry_spool_pending", "Failed online transcriptions waiting for retry").set_function(
+            lambda: self.retry_spool.pending_count()
+        )
+        registry.gauge("stt_model_loaded", "1 while the local model is resident").set_function(
+            lambda: 1 if self.model is not None else 0
+        )
+
+    def _dump_memory(self, options):
+        """メモリ時系列をファイルへ書き出す（inline 指定時は内容もそのまま返す）"""
+        if not self.memory.enabled:
+            return {"error": "memory timeline is disabled (memory_timeline_interval_ms = 0)"}
+        self.memory.annotate("dump")
+        if options.get("inline"):
+            return {"timeline": self.memory.dump()}
+        try:
+            path = self.memory.write()
+        except OSError as e:
+            return {"error": f"failed to write memory timeline: {e}"}
+        logger.info(f"Memory timeline written to {path}")
+        return {"path": path, "samples": len(self.memory.samples), "events": len(self.memory.events)}
+
+    def _arm_profiler(self, options):
+        """次の count 発話のプロファイルを予約する（count 省略時は状態だけ返す）"""
+        if options.get("count") is None:
+            return self.profiler.status()
+        try:
+            return self.profiler.arm(
+                options["count"],
+                mode=options.get("mode", "cprofile"),
+                interval_ms=options.get("interval_ms", profiling.DEFAULT_INTERVAL_MS),
+            )
+        except (TypeError, ValueError) as e:
+            return {"error": str(e)}
+
+    def _observe_transcription(self, source, backend, audio_np, started):
+        """文字起こし1件分の件数・音声長・RTF を記録する"""
+        elapsed = time.time() - started
+        audio_seconds = len(audio_np) / INFERENCE_SAMPLE_RATE
+        self.m_utterances.labels(source).inc()
+        self.m_audio_seconds.labels(backend).inc(audio_seconds)
+        if audio_seconds > 0:
+            self.m_rtf.labels(backend).observe(elapsed / audio_seconds)
+
+    def _recover_spooled_recordings(self):
+        if self.recording_spool is None:
+            return
+        for entry_id, audio_np, meta in self.recording_spool.recover():
+            # 入力先はもう変わっているので、逐次入力や並走はせず一度にまとめて届ける
+            config = dict(meta["config"], progressive_output=False, hybrid_race_enabled=False)
+            use_local = meta.get("use_local", True)
+            if use_local and self.model is None:
+                self.load_model(initial=False)
+            self.transcription_queue.put({
+                "audio": audio_np,
+                "use_local": use_local,
+                "config": config,
+                "stream": None,
+                "id": entry_id,
+                "spool_id": entry_id,
+                "deferred": True,
+            })
+
+    def _schedule_unload(self, delay=None):
+        """モデル保持時間が指定されている場合、アイドル期限にアンロードするタイマーを張り直す"""
+        with self.unload_timer_lock:
+            if self.unload_timer is not None:
+                self.unload_timer.cancel()
+                self.unload_timer = None
+            if self.model_timeout <= 0:
+                return
+            self.unload_timer = threading.Timer(self.model_timeout if delay is None else delay, self._unload_if_idle)
+            self.unload_timer.daemon = True
+            self.unload_timer.start()
+
+    def _unload_if_idle(self):
+        if not self.model or self.model_timeout <= 0:
+            return
+        # 録音中や、処理待ちがある間はアンロードせず、期限を延ばす
+        if self.recording or self.model_loading or not self.transcription_queue.empty():
+            self._schedule_unload()
+            return
+        elapsed = time.time() - self.last_activity
+        if elapsed < self.model_timeout:
+            self._schedule_unload(self.model_timeout - elapsed)
+            return
+        logger.info(f"Timeout reached ({elapsed:.1f}s > {self.model_timeout}s). Unloading model...")
+        self.unload_model()
 
     def unload_model(self):
         if self.model:
+            unload_started = time.time()
+            self.memory.begin("model_unload")
             log_memory_usage("Before Unload")
             logger.info("Unloading model contents...")
             
@@ -185,15 +423,21 @@ class UnifiedSTTWorker:
                 gc.collect()
             
             log_memory_usage("After Unload")
-            print("[STATUS] UNLOADED")
-            sys.stdout.flush()
+            self.memory.end("model_unload")
+            self.m_model_unloads.inc()
+            self.m_model_unload_seconds.observe(time.time() - unload_started)
+            self.emit_status("UNLOADED")
             logger.info("Model unloaded. Worker stays alive for next recording.")
 
     def load_model(self, initial=False):
         if self.model is not None or self.model_loading:
             return
+        # 前回のロード失敗でセットされたままだと、待機側がロード完了前に進んでしまう
+        self.model_ready_event.clear()
 
         def _load():
+            load_started = time.time()
+            self.memory.begin("model_load")
             try:
                 self.model_loading = True
                 self.model_load_error = None
@@ -209,39 +453,66 @@ class UnifiedSTTWorker:
                 )
                 logger.info("Model loaded successfully.")
                 log_memory_usage("After Load")
+                self.m_model_loads.labels("ok").inc()
+                self.m_model_load_seconds.observe(time.time() - load_started)
                 self.model_ready_event.set()
+                self._schedule_unload()
+                # デーモンがモデル常駐中かを把握できるように（GUI の性能測定はその間は走らせない）
+                self.emit_status("MODEL_LOADED")
                 
                 if initial:
-                    print("[STATUS] READY")
-                    sys.stdout.flush()
+                    self.emit_status("READY")
             except Exception as e:
                 logger.error(f"Failed to load model: {e}")
+                self.m_model_loads.labels("error").inc()
+                self.memory.annotate("model_load_failed")
                 self.model_load_error = str(e)
                 self.model = None
                 # イベントをセットして待機中のprocess_taskを解放
                 self.model_ready_event.set()
                 # デーモンのフリーズ防止
-                print("[STATUS] READY")
-                sys.stdout.flush()
+                self.emit_status("READY")
             finally:
                 self.model_loading = False
+                self.memory.end("model_load")
 
         threading.Thread(target=_load, daemon=True).start()
 
     def _audio_callback(self, indata, frames, time_info, status):
         if status:
             logger.warning(f"Audio status: {status}")
+            if status.input_overflow:
+                self.m_capture_overflows.inc()
         self.audio_queue.put(indata.copy())
 
-    def start_recording(self):
+    def start_recording(self, utterance_id=None):
         if self.recording:
             return
+        self.utterance_id = utterance_id
+        self.trace = latency_trace.Trace(utterance_id)
+        self.trace.mark("start_received")
         
-        # 毎回最新の設定を読み込む
-        self.config = config_manager.load_config()
+        # 最新の設定スナップショットを受け取る（config.json が変わった時だけ読み直される）
+        self.config = config_manager.get_config()
+
+        # 録音のチャンネル数・サンプルレートはレジストリの調べ済みの値から決める。
+        # 挿抜の確認は stat だけで、前の録音ストリームが閉じていれば PortAudio を初期化し直せる
+        device_idx = self.config.get("device_index")
+        if device_idx == "default": device_idx = None
+        previous_closed = self.recording_thread is None or not self.recording_thread.is_alive()
+        try:
+            self.devices.check_hotplug(reinit=previous_closed)
+            self.capture = self.devices.capture_settings(
+                device_idx, self.config.get("device_name"), self.config.get("sample_rate", DEFAULT_SAMPLE_RATE)
+            )
+        except Exception as e:
+            logger.warning(f"Device registry unavailable, recording mono at the configured rate: {e}")
+            self.capture = {"device": device_idx, "channels": CHANNELS,
+                            "sample_rate": self.config.get("sample_rate", DEFAULT_SAMPLE_RATE), "name": None}
         
         self.recording = True
         self.stop_recording_event.clear()
+        self.memory.begin("recording", utterance_id)
 
         # ローカルモードかつモデルがない場合はロード開始（バックグラウンド）
         use_local = self.config.get("use_local_model", True)
@@ -252,80 +523,233 @@ class UnifiedSTTWorker:
             logger.info("Switched to online mode, unloading local model...")
             self.unload_model()
         
+        # 前回の録音が異常終了して引き渡されなかったセッションは破棄
+        if self.stream_session is not None:
+            self.stream_session.cancel()
+            self.stream_session = None
+        
+        # ストリーミング対応プロバイダなら録音開始と同時にセッションを開く
+        if not use_local:
+            try:
+                # 倍速設定はサンプルレートを偽装して反映する（一括送信時の間引きと等価）
+                stream_rate = self.capture["sample_rate"] * max(1.0, self.config.get("speed_factor", 1.0))
+                self.stream_session = streaming_stt.open_session(
+                    self.config, stream_rate, self._build_initial_prompt(self.config)
+                )
+                if self.stream_session:
+                    logger.info("Streaming session opened.")
+                    self.trace.mark("stream_opened")
+            except Exception as e:
+                logger.warning(f"Could not open streaming session, falling back to batch upload: {e}")
+                self.stream_session = None
+        
         # STATUS: RECORDING
-        print("[STATUS] REC")
-        sys.stdout.flush()
+        self.emit_status("REC", self.utterance_id)
         
         with self.audio_queue.mutex:
             self.audio_queue.queue.clear()
             
         def _record_loop():
-            # 無音監視用
-            silent_chunks = 0
+            utterance_id = self.utterance_id
+            trace = self.trace
+            stream_session = self.stream_session
             # 1チャンクは通常約100ms以内。20回連続（約2秒）完全無音ならハングと判定
             MAX_SILENT_CHUNKS = 20
-            
-            device_idx = self.config.get("device_index")
-            if device_idx == "default": device_idx = None
-            sample_rate = self.config.get("sample_rate", DEFAULT_SAMPLE_RATE)
-            
-            rec_channels = CHANNELS
-            try:
-                if device_idx is not None:
-                    # デバイス情報を取得し、そのデバイスがサポートする最大入力チャンネル数をそのまま使う
-                    dev_info = sd.query_devices(device_idx)
-                    max_ch = dev_info.get("max_input_channels", 1)
-                    if max_ch > 0:
-                        rec_channels = max_ch
-                        logger.info(f"Device {device_idx} native channels: {max_ch}")
-                else:
-                    # default devices
-                    dev_info = sd.query_devices(kind='input')
-                    max_ch = dev_info.get("max_input_channels", 1)
-                    if max_ch > 0:
-                        rec_channels = max_ch
-                        logger.info(f"Default device native channels: {max_ch}")
-            except Exception as e:
-                logger.warning(f"Could not query device info, falling back to {rec_channels}ch: {e}")
-            
-            def _callback(indata, frames, time_info, status):
-                nonlocal silent_chunks
-                
-                # 完全無音（全要素が0.0）かどうかの判定
-                if np.max(np.abs(indata)) < 1e-6:
-                    silent_chunks += 1
-                else:
-                    silent_chunks = 0
-                    
-                if rec_channels > 1:
-                    mono = indata.mean(axis=1, keepdims=True)
+
+            # バッファは最初のデバイスのレートで揃える（切り替え先のレートが違えば変換して入れる）
+            base_rate = self.capture["sample_rate"]
+            # コールバック (PortAudio のスレッド) と共有する状態
+            state = {"silent_chunks": 0, "failure": None, "last_audio_at": None, "samples": 0, "gap": None}
+
+            def _make_callback(capture):
+                rec_channels = capture["channels"]
+                rate = capture["sample_rate"]
+
+                def _callback(indata, frames, time_info, status):
+                    now = time.monotonic()
+                    trace.mark_once("first_audio")
+
+                    # 完全無音（全要素が0.0）かどうかの判定
+                    if np.max(np.abs(indata)) < 1e-6:
+                        state["silent_chunks"] += 1
+                        if state["silent_chunks"] >= MAX_SILENT_CHUNKS and state["failure"] is None:
+                            state["failure"] = "silent"
+                    else:
+                        state["silent_chunks"] = 0
+
+                    if rec_channels > 1:
+                        mono = indata.mean(axis=1, keepdims=True)
+                    else:
+                        mono = indata
+                    if rate != base_rate:
+                        mono = resample_chunk(mono, rate, base_rate)
+                    if state["gap"] is not None:
+                        # 切り替え後の最初の音声: 欠けた区間を印として短い無音で埋める
+                        self._close_capture_gap(state, now, base_rate, stream_session)
+                    state["last_audio_at"] = now
+                    state["samples"] += len(mono)
                     self._audio_callback(mono, frames, time_info, status)
-                else:
-                    self._audio_callback(indata, frames, time_info, status)
-            
+                    if stream_session is not None:
+                        stream_session.feed(mono[:, 0])
+                return _callback
+
+            capture = self.capture
+            failovers = 0
             try:
-                with sd.InputStream(samplerate=sample_rate, device=device_idx, channels=rec_channels, callback=_callback):
-                    logger.info(f"Recording STARTED (device={device_idx}, rate={sample_rate}Hz, channels={rec_channels})")
-                    while not self.stop_recording_event.is_set():
-                        time.sleep(0.1)
-                        if silent_chunks >= MAX_SILENT_CHUNKS:
+                while True:
+                    state["failure"] = None
+                    state["silent_chunks"] = 0
+                    reason = self._run_capture(capture, _make_callback(capture), state, trace, utterance_id)
+                    if reason is None:
+                        break
+                    detected_at = time.monotonic()
+                    fallback = None
+                    if self.config.get("capture_failover", True) and failovers < MAX_CAPTURE_FAILOVERS:
+                        fallback = self._fallback_capture(capture, base_rate, reason)
+                    if fallback is None:
+                        self.m_capture_failovers.labels("failed").inc()
+                        self.recording = False
+                        if reason == "silent":
                             logger.error("Dead device detected: completely silent for ~2 seconds. Aborting.")
-                            self.recording = False
-                            print("[STATUS] SILENT_ERROR")
-                            sys.stdout.flush()
-                            break
-            except Exception as e:
-                logger.error(f"Recording error: {e}", exc_info=True)
-                self.recording = False
-                print("[STATUS] DEVICE_ERROR")
-                sys.stdout.flush()
+                            self.emit_status("SILENT_ERROR", utterance_id)
+                        else:
+                            logger.error(f"Recording error: {reason}")
+                            # 調べた時と状態が変わっている可能性があるので、次の録音で調べ直す
+                            self.devices.invalidate()
+                            self.emit_status("DEVICE_ERROR", utterance_id)
+                        break
+                    failovers += 1
+                    state["gap"] = {
+                        "from": capture["name"], "to": fallback["name"], "reason": reason,
+                        "detected_at": detected_at, "last_audio_at": state["last_audio_at"],
+                        "offset": state["samples"],
+                    }
+                    logger.warning(f"Capture failed on {capture['name']} ({reason}); switching to {fallback['name']}")
+                    capture = fallback
+            finally:
+                self.memory.end("recording", utterance_id)
         
         self.recording_thread = threading.Thread(target=_record_loop, daemon=True)
         self.recording_thread.start()
 
+    def _run_capture(self, capture, callback, state, trace, utterance_id):
+        """
+        1つのデバイスで録音する。STOP で止まれば None、デバイスが使えなくなれば理由を返す。
+        切断はストリームの停止 (finished_callback)・コールバックの途絶・完全無音の継続で検知する
+        """
+        closing = threading.Event()
+
+        def _finished():
+            if not closing.is_set() and state["failure"] is None:
+                state["failure"] = "stream stopped"
+
+        try:
+            stream = sd.InputStream(
+                samplerate=capture["sample_rate"], device=capture["device"], channels=capture["channels"],
+                callback=callback, finished_callback=_finished,
+            )
+            stream.start()
+        except Exception as e:
+            return f"open failed: {e}"
+        logger.info(f"Recording STARTED (device={capture['device']}, rate={capture['sample_rate']}Hz, "
+                    f"channels={capture['channels']})")
+        trace.mark_once("capture_started")
+        opened_at = time.monotonic()
+        try:
+            # STOP まで眠る。途中で切断の印がないかを CAPTURE_WATCH_INTERVAL ごとに見る
+            while not self.stop_recording_event.wait(CAPTURE_WATCH_INTERVAL):
+                self._report_capture_switch(state, utterance_id)
+                if state["failure"] is not None:
+                    return state["failure"]
+                last = state["last_audio_at"]
+                if time.monotonic() - max(last or 0.0, opened_at) > CAPTURE_STALL_SECONDS:
+                    return "stalled"
+            return None
+        finally:
+            closing.set()
+            try:
+                stream.abort(ignore_errors=True)
+                stream.close(ignore_errors=True)
+            except Exception as e:
+                logger.warning(f"Could not close input stream: {e}")
+            self._report_capture_switch(state, utterance_id)
+
+    def _fallback_capture(self, failed, base_rate, reason):
+        """切り替え先 (capture_fallback_device、未設定なら OS の既定入力) の録音設定。使えなければ None"""
+        try:
+            # 録音ストリームは閉じているので、PortAudio を初期化し直して今のデバイス一覧を取る
+            self.devices.refresh(reinit=True)
+            name = self.config.get("capture_fallback_device")
+            fallback = self.devices.capture_settings(None, name, base_rate)
+        except Exception as e:
+            logger.error(f"No fallback input device: {e}")
+            return None
+        still_present = any(d["name"] == failed["name"] for d in self.devices.devices())
+        if fallback["name"] is None or (fallback["name"] == failed["name"] and still_present and reason != "stalled"):
+            # 同じデバイスを開き直しても直らない（抜かれていない・無音のまま）
+            return None
+        return fallback
+
+    def _close_capture_gap(self, state, now, base_rate, stream_session):
+        """
+        コールバックから呼ぶ。切り替えで欠けた区間を短い無音で埋めて印にし、報告を state に置く
+        （通知とログは録音スレッドが _report_capture_switch で出す）
+        """
+        gap = state["gap"]
+        state["gap"] = None
+        since = gap["last_audio_at"] or gap["detected_at"]
+        lost = int(round((now - since) * base_rate))
+        fill = np.zeros((min(lost, int(MAX_GAP_FILL_SECONDS * base_rate)), 1), dtype=np.float32)
+        if len(fill):
+            self.audio_queue.put(fill)
+            if stream_session is not None:
+                stream_session.feed(fill[:, 0])
+        state["samples"] += len(fill)
+        state["report"] = {
+            "from": gap["from"], "to": gap["to"], "reason": gap["reason"],
+            "offset_samples": gap["offset"], "lost_samples": lost, "filled_samples": len(fill),
+            "switch_ms": round((now - gap["detected_at"]) * 1000, 1), "sample_rate": base_rate,
+        }
+
+    def _report_capture_switch(self, state, utterance_id):
+        report = state.pop("report", None)
+        if report is None:
+            return
+        self.m_capture_failovers.labels("ok").inc()
+        self.m_capture_switch_seconds.observe(report["switch_ms"] / 1000)
+        logger.warning(
+            f"Capture switched to {report['to']} in {report['switch_ms']} ms; {report['lost_samples']} samples lost",
+            extra={"utterance_id": utterance_id},
+        )
+        self.emit_status("DEVICE_SWITCHED", utterance_id, **report)
+
+    def cancel_recording(self):
+        """録音を中止し、音声を文字起こしせずに破棄する"""
+        if not self.recording:
+            return
+        utterance_id = self.utterance_id
+
+        self.stop_recording_event.set()
+        if self.recording_thread:
+            self.recording_thread.join(timeout=2.0)
+        self.recording = False
+
+        if self.stream_session is not None:
+            self.stream_session.cancel()
+            self.stream_session = None
+        with self.audio_queue.mutex:
+            self.audio_queue.queue.clear()
+
+        logger.info("Recording CANCELLED")
+        self.emit_status("READY", utterance_id)
+
     def stop_and_transcribe(self):
         if not self.recording:
             return
+        utterance_id = self.utterance_id
+        trace = self.trace or latency_trace.Trace(utterance_id)
+        self.trace = None
+        trace.mark("stop_received")
 
         # 停止シグナル
         self.stop_recording_event.set()
@@ -333,12 +757,17 @@ class UnifiedSTTWorker:
             self.recording_thread.join(timeout=2.0)
         self.recording = False
         logger.info("Recording STOPPED")
+        trace.mark("capture_stopped")
 
-        # 設定読み込み
-        self.config = config_manager.load_config()
+        # 設定スナップショット（タスクへはこの参照をそのまま渡す）
+        self.config = config_manager.get_config()
         use_local = self.config.get("use_local_model", True)
         speed_factor = self.config.get("speed_factor", 1.0)
 
+        # ストリーミングセッションはタスクへ引き渡す
+        stream_session = self.stream_session
+        self.stream_session = None
+
         # データを回収
         audio_data = []
         while not self.audio_queue.empty():
@@ -346,37 +775,51 @@ class UnifiedSTTWorker:
             
         if not audio_data:
             logger.warning("No audio data recorded.")
-            print("[STATUS] READY")
-            sys.stdout.flush()
+            if stream_session is not None:
+                stream_session.cancel()
+            self.emit_status("READY", utterance_id)
             return
 
         # 前処理 (データをキューへ)
         audio_np = np.concatenate(audio_data, axis=0).flatten().astype(np.float32)
         
         # 録音サンプルレートが推論用(16kHz)と異なる場合はリサンプリング
-        rec_sample_rate = self.config.get("sample_rate", DEFAULT_SAMPLE_RATE)
-        if rec_sample_rate != INFERENCE_SAMPLE_RATE:
-            import scipy.signal
-            num_samples = int(len(audio_np) * INFERENCE_SAMPLE_RATE / rec_sample_rate)
-            audio_np = scipy.signal.resample(audio_np, num_samples).astype(np.float32)
-            logger.info(f"Resampled audio: {rec_sample_rate}Hz -> {INFERENCE_SAMPLE_RATE}Hz")
-        
-        if speed_factor > 1.0:
-            indices = np.arange(0, len(audio_np), speed_factor)
-            audio_np = audio_np[indices.astype(int)]
+        rec_sample_rate = self.capture["sample_rate"] if self.capture else self.config.get("sample_rate", DEFAULT_SAMPLE_RATE)
+        self.memory.begin("preprocess", utterance_id)
+        try:
+            audio_np = preprocess_audio(audio_np, rec_sample_rate, speed_factor)
+        finally:
+            self.memory.end("preprocess", utterance_id)
+        trace.mark("preprocessed")
 
         # キューにタスクを投入
         task = {
             "audio": audio_np,
             "use_local": use_local,
-            "config": self.config
+            "config": self.config,
+            "stream": stream_session,
+            "id": utterance_id,
+            "trace": trace
         }
+        # キューへ積む前にスプールへ書き出す（処理中にワーカーが落ちても次のワーカーが拾う）
+        if self.recording_spool is not None:
+            spool_id = utterance_id or ipc_protocol.new_request_id()
+            try:
+                self.recording_spool.append(spool_id, audio_np, {
+                    "created": time.time(),
+                    "use_local": use_local,
+                    "config": config_manager.thaw(self.config),
+                })
+                task["spool_id"] = spool_id
+                trace.mark("spooled")
+            except Exception as e:
+                logger.warning(f"Failed to spool recording: {e}")
+        trace.mark("enqueued")
         self.transcription_queue.put(task)
-        logger.info("Enqueued transcription task.")
+        logger.info("Enqueued transcription task.", extra={"utterance_id": utterance_id})
 
         # 即座にREADYを返す (次の録音を可能にする)
-        print("[STATUS] READY")
-        sys.stdout.flush()
+        self.emit_status("READY", utterance_id)
 
     def _transcription_worker(self):
         """バックグラウンドでキューを監視して文字起こしを行う"""
@@ -389,7 +832,30 @@ class UnifiedSTTWorker:
                 use_local = task["use_local"]
                 config = task["config"]
                 
-                self.process_task(audio_np, use_local, config)
+                self.active_task_id = task.get("id")
+                self.active_task_deferred = task.get("deferred", False)
+                self.active_trace = task.get("trace")
+                self._mark("dequeued")
+                self.memory.begin("transcribe", self.active_task_id)
+                profile = self.profiler.begin(self.active_task_id)
+                try:
+                    try:
+                        handled = self.process_task(audio_np, use_local, config, stream=task.get("stream"))
+                    except Exception as e:
+                        logger.error(f"Transcription failed: {e}", extra={"utterance_id": task.get("id")})
+                        handled = False
+                    # 届け終えた（または再送キューへ引き渡した）時だけスプールから外す
+                    if task.get("spool_id") and self.recording_spool is not None:
+                        if handled:
+                            self.recording_spool.ack(task["spool_id"])
+                        else:
+                            self._retry_spooled_task(task)
+                finally:
+                    self.profiler.end(profile, self.active_trace)
+                    self.memory.end("transcribe", task.get("id"))
+                    self.active_task_id = None
+                    self.active_task_deferred = False
+                    self.active_trace = None
                 self.transcription_queue.task_done()
                 
                 # アクティビティ更新 (モデルアンロードの起点を処理終了時にする)
@@ -399,160 +865,483 @@ class UnifiedSTTWorker:
                 self.model_timeout = config.get("local_model_timeout", -1)
                 if use_local and self.model_timeout == 0 and not self.recording and self.transcription_queue.empty():
                     self.unload_model()
+                else:
+                    self._schedule_unload()
                 
             except Exception as e:
                 logger.error(f"Worker thread error: {e}")
                 time.sleep(1)
 
-    def process_task(self, audio_np, use_local, config):
-        """実際の文字起こし処理"""
+    def shutdown(self):
+        """非対話モードの後始末: 文字起こしスレッドを止め、モデルを解放する"""
+        self.transcription_queue.put(None)
+        self.unload_model()
+
+    def _retry_spooled_task(self, task):
+        """
+        失敗した録音を間を空けて積み直す（MAX_ATTEMPTS まで）。プロセスが落ちた場合は次のワーカーが拾い直す。
+        入力先はもう変わっているので、拾い直した録音と同じくフォーカス中のウィンドウには入力しない
+        """
+        attempts = self.recording_spool.fail(task["spool_id"])
+        if attempts is None:
+            return
+        retry = {
+            "audio": task["audio"],
+            "use_local": task["use_local"],
+            "config": dict(config_manager.thaw(task["config"]), progressive_output=False, hybrid_race_enabled=False),
+            "stream": None,
+            "id": task.get("id"),
+            "spool_id": task["spool_id"],
+            "deferred": True,
+        }
+        delay = recording_spool.RETRY_DELAY * attempts
+        logger.warning(f"Retrying spooled recording {task['spool_id']} in {delay:.0f}s (attempt {attempts + 1})")
+
+        def _requeue():
+            # モデルのロード失敗が原因なら、もう一度ロードさせる
+            if retry["use_local"] and self.model is None:
+                self.load_model(initial=False)
+            self.transcription_queue.put(retry)
+
+        timer = threading.Timer(delay, _requeue)
+        timer.daemon = True
+        timer.start()
+
+    def process_task(self, audio_np, use_local, config, stream=None):
+        """実際の文字起こし処理。テキストを届けた（または再送キューへ引き渡した）ら True"""
         lang = config.get("language", "ja")
-        add_punctuation = config.get("add_punctuation", True)
-        
-        # 句読点を誘発するためのプロンプト
-        initial_prompt = ""
-        if add_punctuation:
-            prompts = {
-                "ja": "こんにちは、元気ですか。",
-                "en": "Hello, how are you.",
-                "zh": "你好，你好吗？"
-            }
-            initial_prompt = prompts.get(lang, "")
+        initial_prompt = self._build_initial_prompt(config)
 
         if use_local:
+            # ローカルモデルがまだ準備できていない場合、条件を満たせばオンラインと並走させる
+            if not self.model_ready_event.is_set() and self._should_race_online(audio_np, config):
+                return self._race_local_online(audio_np, config, lang, initial_prompt)
+
             # ローカルモデルで処理
             if not self.model_ready_event.is_set():
                 logger.info("Waiting for model to load...")
                 if not self.model_ready_event.wait(timeout=30):
                     logger.error("Model load timed out.")
-                    print("[STATUS] MODEL_ERROR")
-                    sys.stdout.flush()
-                    return
+                    self.emit_status("MODEL_ERROR", self.active_task_id)
+                    return False
 
             # モデルロードエラーチェック
             if hasattr(self, 'model_load_error') and self.model_load_error:
                 logger.error(f"Model load failed: {self.model_load_error}")
-                print("[STATUS] MODEL_ERROR")
-                sys.stdout.flush()
-                return
+                self.emit_status("MODEL_ERROR", self.active_task_id)
+                return False
 
             if self.model:
+                self._mark("model_ready")
                 start_time = time.time()
-                # 句読点制御のために initial_prompt と condition_on_previous_text を使用
-                segments, _ = self.model.transcribe(
-                    audio_np, 
-                    beam_size=5, 
-                    language=lang, 
-                    vad_filter=True,
-                    initial_prompt=initial_prompt if initial_prompt else None,
-                    condition_on_previous_text=True if initial_prompt else False
-                )
-                text_list = []
-                for s in segments:
-                    text_list.append(s.text)
-                text = "".join(text_list).strip()
-                
-                del segments
-                del text_list
-                
-                logger.info(f"Transcribed (Local, {time.time() - start_time:.2f}s): {text}")
-                if text:
-                    platform_utils.type_text(text)
-            else:
-                logger.error("Model is None.")
+                if config.get("progressive_output", False):
+                    # セグメントが出るたびに入力する（最初のセグメント分の待ち時間で済む）
+                    text = self._transcribe_local(
+                        audio_np, lang, initial_prompt,
+                        on_segment=lambda piece: self._output_text(piece, config)
+                    )
+                    logger.info(f"Transcribed (Local/progressive, {time.time() - start_time:.2f}s): {text}")
+                    self._mark("decoded")
+                    self._observe_transcription("Local/progressive", "local", audio_np, start_time)
+                    self.emit_result(text, "Local/progressive")
+                else:
+                    text = self._transcribe_local(audio_np, lang, initial_prompt)
+                    logger.info(f"Transcribed (Local, {time.time() - start_time:.2f}s): {text}")
+                    self._mark("decoded")
+                    self._observe_transcription("Local", "local", audio_np, start_time)
+                    if text:
+                        self._output_text(text, config)
+                    self.emit_result(text, "Local")
+                return True
+            logger.error("Model is None.")
+            return False
                 
         else:
             # オンラインAPI（LiteLLM経由マルチプロバイダ）で処理
             try:
-                import io
-                import wave
-                from litellm import transcription as litellm_transcription
-                
-                wav_buffer = io.BytesIO()
-                with wave.open(wav_buffer, 'wb') as wav_file:
-                    wav_file.setnchannels(CHANNELS)
-                    wav_file.setsampwidth(2)
-                    wav_file.setframerate(INFERENCE_SAMPLE_RATE)
-                    audio_int16 = (audio_np * 32767).astype(np.int16)
-                    wav_file.writeframes(audio_int16.tobytes())
-                
-                wav_buffer.seek(0)
-                wav_buffer.name = "audio.wav"
-                
-                # プロバイダ設定の読み取り
                 provider_name = config.get("online_provider", "groq")
-                providers = config.get("online_providers", {})
-                provider_cfg = providers.get(provider_name, {})
-                
-                # プロバイダ設定からキー・モデル・エンドポイントを取得
-                api_key = provider_cfg.get("api_key", "")
-                model_id = provider_cfg.get("model", "")
-                api_base = provider_cfg.get("api_base")  # カスタムエンドポイント（任意）
-                
-                # 後方互換: 旧config形式へのフォールバック
-                if not api_key:
-                    api_key = config.get("api_keys", {}).get(provider_name, "")
-                if not model_id:
-                    old_model = config.get("api_models", {}).get(provider_name, "whisper-large-v3-turbo")
-                    model_id = f"{provider_name}/{old_model}"
-                
-                if not api_key:
-                    logger.error(f"API key not found for provider: {provider_name}")
-                    return
-                
-                # LiteLLM呼び出し
-                kwargs = {
-                    "model": model_id,
-                    "file": wav_buffer,
-                    "api_key": api_key,
-                }
-                if lang:
-                    kwargs["language"] = lang
-                if initial_prompt:
-                    kwargs["prompt"] = initial_prompt
-                if api_base:
-                    kwargs["api_base"] = api_base
-                
                 start_time = time.time()
-                response = litellm_transcription(**kwargs)
-                text = response.text.strip()
+                text = None
+                if stream is not None:
+                    # 録音中に送信済み。残りを流し切って最終テキストを待つだけ
+                    try:
+                        text = stream.finish()
+                        provider_name += "/stream"
+                    except streaming_stt.StreamingError as e:
+                        logger.warning(f"Streaming failed, retrying as batch upload: {e}")
+                        self.m_online_errors.labels(provider_name + "/stream").inc()
+                if text is None:
+                    text = self._transcribe_online(audio_np, config, lang, initial_prompt)
+                if text is None:
+                    return False
                 logger.info(f"Transcribed (Online/{provider_name}, {time.time() - start_time:.2f}s): {text}")
+                self._mark("decoded")
+                self._observe_transcription(f"Online/{provider_name}", "online", audio_np, start_time)
                 
                 if text:
-                    platform_utils.type_text(text)
+                    self._output_text(text, config)
+                self.emit_result(text, f"Online/{provider_name}")
+                
+                # 通信が回復したので、退避中のタスクがあれば即座に再送させる
+                if self.retry_spool.pending_count():
+                    self.retry_spool.kick()
+                return True
                     
             except Exception as e:
                 logger.error(f"Online API error: {e}")
+                # 録音を捨てずにディスクへ退避し、バックグラウンドで再送する
+                try:
+                    self.retry_spool.add(audio_np, config)
+                    return True
+                except Exception as spool_error:
+                    logger.error(f"Failed to spool audio for retry: {spool_error}")
+                    return False
+
+    def emit_status(self, status, req_id=None, **payload):
+        """デーモンへ状態遷移を通知する"""
+        try:
+            self.ipc.send_new(ipc_protocol.KIND_STATUS, status, req_id=req_id, payload=payload)
+        except Exception as e:
+            logger.error(f"Failed to send status {status}: {e}")
+
+    def emit_result(self, text, source):
+        """処理中タスクの文字起こし結果を、発話のリクエストIDと共に通知する"""
+        payload = {"text": text or "", "source": source}
+        if self.active_trace is not None:
+            self.active_trace.mark("result_sent")
+            payload["marks"] = self.active_trace.as_payload()
+        try:
+            self.ipc.send_new(ipc_protocol.KIND_RESULT, "TEXT", req_id=self.active_task_id, payload=payload)
+        except Exception as e:
+            logger.error(f"Failed to send result: {e}")
+
+    def _output_text(self, text, config):
+        """アクティブなウィンドウへ入力する（clipboard_restore 指定時は元のクリップボードを戻す）"""
+        if self.active_task_deferred:
+            # 前回のワーカーから引き継いだ録音は、フォーカス中のウィンドウには入力しない
+            retry_spool.deliver_deferred(text, config, "recovered")
+            self.emit_status("RECOVERED_DELIVERED", self.active_task_id)
+            return
+        self._mark("first_output", once=True)
+        if self.output_sink is not None:
+            self.output_sink(text)
+        else:
+            platform_utils.type_text(text, restore_clipboard=config.get("clipboard_restore", True))
+        self._mark("output_done")
+
+    def _mark(self, stage, once=False):
+        """処理中タスクの段階の印を付ける"""
+        trace = self.active_trace
+        if trace is not None:
+            if once:
+                trace.mark_once(stage)
+            else:
+                trace.mark(stage)
+
+    def _build_initial_prompt(self, config):
+        """句読点を誘発するためのプロンプトを返す"""
+        if not config.get("add_punctuation", True):
+            return ""
+        prompts = {
+            "ja": "こんにちは、元気ですか。",
+            "en": "Hello, how are you.",
+            "zh": "你好，你好吗？"
+        }
+        return prompts.get(config.get("language", "ja"), "")
+
+    def _transcribe_local(self, audio_np, lang, initial_prompt, cancel_event=None, on_segment=None):
+        """
+        ローカルモデルで文字起こしする。
+        cancel_event がセットされた場合はセグメントの区切りで中断し None を返す。
+        on_segment を渡すと、デコードされたセグメントごとに連結済みの文字列片で呼び出す。
+        """
+        # 句読点制御のために initial_prompt と condition_on_previous_text を使用
+        segments, _ = self.model.transcribe(
+            audio_np, 
+            beam_size=5, 
+            language=lang, 
+            vad_filter=True,
+            initial_prompt=initial_prompt if initial_prompt else None,
+            condition_on_previous_text=True if initial_prompt else False
+        )
+        text_list = []
+        emitted = ""
+        for s in segments:
+            # segments はジェネレータなので、デコードはここで逐次進む
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            self._mark("first_segment", once=True)
+            if on_segment is not None:
+                piece = join_segment(emitted, s.text, lang)
+                if piece:
+                    on_segment(piece)
+                    emitted += piece
+            text_list.append(s.text)
+        text = emitted if on_segment is not None else "".join(text_list).strip()
+        
+        del segments
+        del text_list
+        return text
+
+    def _transcribe_online(self, audio_np, config, lang, initial_prompt):
+        """
+        オンラインAPI（LiteLLM経由）で文字起こしする。
+        APIキー未設定の場合は None を返し、通信エラー等は例外として呼び出し元へ送出する。
+        """
+        import io
+        import wave
+        from litellm import transcription as litellm_transcription
+        
+        wav_buffer = io.BytesIO()
+        with wave.open(wav_buffer, 'wb') as wav_file:
+            wav_file.setnchannels(CHANNELS)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(INFERENCE_SAMPLE_RATE)
+            audio_int16 = (audio_np * 32767).astype(np.int16)
+            wav_file.writeframes(audio_int16.tobytes())
+        
+        wav_buffer.seek(0)
+        wav_buffer.name = "audio.wav"
+        
+        # プロバイダ設定の読み取り
+        provider_name = config.get("online_provider", "groq")
+        providers = config.get("online_providers", {})
+        provider_cfg = providers.get(provider_name, {})
+        
+        # プロバイダ設定からキー・モデル・エンドポイントを取得
+        api_key = provider_cfg.get("api_key", "")
+        model_id = provider_cfg.get("model", "")
+        api_base = provider_cfg.get("api_base")  # カスタムエンドポイント（任意）
+        
+        # 後方互換: 旧config形式へのフォールバック
+        if not api_key:
+            api_key = config.get("api_keys", {}).get(provider_name, "")
+        if not model_id:
+            old_model = config.get("api_models", {}).get(provider_name, "whisper-large-v3-turbo")
+            model_id = f"{provider_name}/{old_model}"
+        
+        if not api_key:
+            logger.error(f"API key not found for provider: {provider_name}")
+            return None
+        
+        # LiteLLM呼び出し
+        kwargs = {
+            "model": model_id,
+            "file": wav_buffer,
+            "api_key": api_key,
+        }
+        if lang:
+            kwargs["language"] = lang
+        if initial_prompt:
+            kwargs["prompt"] = initial_prompt
+        if api_base:
+            kwargs["api_base"] = api_base
+        
+        request_started = time.time()
+        try:
+            response = litellm_transcription(**kwargs)
+        except Exception:
+            self.m_online_errors.labels(provider_name).inc()
+            raise
+        self.m_online_seconds.labels(provider_name).observe(time.time() - request_started)
+        return response.text.strip()
+
+    def _transcribe_spooled(self, audio_np, config):
+        """再送キューから呼ばれる。失敗は例外で返す。"""
+        text = self._transcribe_online(audio_np, config, config.get("language", "ja"), self._build_initial_prompt(config))
+        if text is None:
+            raise RuntimeError("API key not configured")
+        return text
+
+    def _deliver_retried(self, text, config):
+        """再送で得られた結果は、フォーカス中のウィンドウではなくクリップボード/履歴へ届ける"""
+        retry_spool.deliver_deferred(text, config, "retry")
+        self.emit_status("RETRY_DELIVERED")
+
+    def _should_race_online(self, audio_np, config):
+        """
+        ローカルモデルのロード待ちの間にオンラインAPIと並走させてよいか判定する。
+        プライバシー重視のユーザー向けに、既定では無効。条件で対象を絞り込める。
+        """
+        if not config.get("hybrid_race_enabled", False):
+            return False
+
+        # 発話長の上限 (0 = 無制限)
+        max_seconds = config.get("hybrid_race_max_seconds", 0)
+        duration = len(audio_np) / INFERENCE_SAMPLE_RATE
+        if max_seconds and duration > max_seconds:
+            logger.info(f"Race skipped: audio {duration:.1f}s exceeds limit {max_seconds}s")
+            return False
+
+        # 対象言語の制限 (空 = 全言語)
+        languages = config.get("hybrid_race_languages", [])
+        if languages and config.get("language", "ja") not in languages:
+            logger.info("Race skipped: language not allowed for online racing")
+            return False
+
+        # オンラインプロバイダが設定済みであること
+        provider_name = config.get("online_provider", "groq")
+        provider_cfg = config.get("online_providers", {}).get(provider_name, {})
+        if not (provider_cfg.get("api_key") or config.get("api_keys", {}).get(provider_name)):
+            return False
+
+        return True
+
+    def _race_local_online(self, audio_np, config, lang, initial_prompt):
+        """
+        ローカルモデルのロード中にオンラインAPIへ同時送信し、先に返った結果を入力する。
+        負けた側は破棄する（ローカルはセグメント単位で中断、オンラインは結果を捨てる）。
+        """
+        provider_name = config.get("online_provider", "groq")
+        claim_lock = threading.Lock()
+        claimed = threading.Event()
+        online_won = threading.Event()
+        winner = {}
+        online_done = threading.Event()
+        # オンライン完了 / モデル準備完了 のどちらかで起床する
+        wake = threading.Event()
+
+        def _claim(source, text):
+            with claim_lock:
+                if claimed.is_set():
+                    return False
+                winner["source"] = source
+                winner["text"] = text
+                claimed.set()
+                if source != "Local":
+                    online_won.set()
+                return True
+
+        def _online():
+            try:
+                text = self._transcribe_online(audio_np, config, lang, initial_prompt)
+                if text is not None and not _claim(f"Online/{provider_name}", text):
+                    logger.info("Race: online result discarded (local won).")
+            except Exception as e:
+                logger.warning(f"Race: online provider failed: {e}")
+            finally:
+                online_done.set()
+                wake.set()
+
+        def _wait_model():
+            self.model_ready_event.wait(timeout=30)
+            wake.set()
+
+        start_time = time.time()
+        logger.info(f"Race: local model is cold, sending to {provider_name} in parallel...")
+        threading.Thread(target=_online, daemon=True).start()
+        threading.Thread(target=_wait_model, daemon=True).start()
+
+        wake.wait(timeout=30)
+        if not claimed.is_set() and not self.model_ready_event.is_set():
+            # オンラインが失敗した → 通常どおりモデルを待つ
+            remaining = max(0.0, 30 - (time.time() - start_time))
+            self.model_ready_event.wait(timeout=remaining)
+
+        typed_progressively = False
+        if not claimed.is_set() and self.model_ready_event.is_set() and self.model and not self.model_load_error:
+            on_segment = None
+            if config.get("progressive_output", False):
+                def on_segment(piece):
+                    nonlocal typed_progressively
+                    # 最初のセグメントを入力する時点で勝ちを確定させる
+                    if not typed_progressively:
+                        if not _claim("Local", None):
+                            return
+                        typed_progressively = True
+                    self._output_text(piece, config)
+
+            text = self._transcribe_local(audio_np, lang, initial_prompt, cancel_event=online_won, on_segment=on_segment)
+            if text is None:
+                logger.info("Race: local decode cancelled (online won).")
+            elif typed_progressively:
+                winner["text"] = text
+            elif not _claim("Local", text):
+                logger.info("Race: local result discarded (online won).")
+        elif not claimed.is_set():
+            # ローカルが使えない場合はオンラインの結果に賭ける
+            online_done.wait(timeout=30)
+
+        if not claimed.is_set():
+            logger.error("Race: neither local nor online produced a result.")
+            self.emit_status("MODEL_ERROR", self.active_task_id)
+            return False
+
+        text = winner["text"]
+        logger.info(f"Transcribed (Race winner: {winner['source']}, {time.time() - start_time:.2f}s): {text}")
+        self._mark("decoded")
+        self._observe_transcription(winner["source"], "local" if winner["source"] == "Local" else "online", audio_np, start_time)
+        if text and not typed_progressively:
+            self._output_text(text, config)
+        self.emit_result(text, winner["source"])
+        return True
+
+    def _should_exit_when_idle(self):
+        """
+        アイドル期限に達した時に終了するか。
+        worker_standby 有効時は import 済みのまま待機し、モデル未ロードで RSS が
+        worker_standby_max_rss_mb を超えている時だけ終了してデーモンに作り直してもらう。
+        """
+        config = config_manager.get_config()
+        if not config.get("worker_standby", True):
+            return True
+        if self.model is not None:
+            # モデル常駐は設定どおりの状態なので上限の対象外
+            return False
+        limit = config.get("worker_standby_max_rss_mb", 512)
+        rss = get_current_memory_usage_mb()
+        if limit and rss > limit:
+            logger.info(f"Idle RSS {rss:.0f} MB exceeds standby cap {limit} MB; exiting so a fresh worker replaces this one.")
+            return True
+        return False
 
     def run(self):
         logger.info("Interactive Loop Started")
         
         while True:
-            # 録音中や、処理待ちのタスクがある間は終了しない
-            if not self.recording and self.transcription_queue.empty() and (time.time() - self.last_activity > self.timeout):
-                logger.info(f"Timeout ({self.timeout}s). Exiting.")
-                break
+            # 録音中や、処理待ち・再送待ちのタスクがある間は終了しない
+            busy = self.recording or not self.transcription_queue.empty() or self.retry_spool.pending_count()
+            idle_for = time.time() - self.last_activity
 
+            # 次のコマンドか、アイドル期限まで眠る（作業中なら期限を1周期先送りして再判定）
+            wait = self.timeout if busy else max(0.0, self.timeout - idle_for) + 0.01
+            if not busy and idle_for > self.timeout:
+                if self._should_exit_when_idle():
+                    logger.info(f"Timeout ({self.timeout}s). Exiting.")
+                    break
+                # 待機ワーカーとして残る（次のコマンドまで起きない）
+                wait = None
             try:
-                cmd = self.cmd_queue.get(timeout=0.1)
+                message = self.cmd_queue.get(timeout=wait)
             except queue.Empty:
                 continue
 
-            self.last_activity = time.time()
+            cmd = message.get("name", "").upper()
+            req_id = message.get("id")
+            # 監視系のコマンド (PING / METRICS / MEMDUMP / PROFILE) はアイドル判定に含めない
+            if cmd not in ("PING", "METRICS", "MEMDUMP", "PROFILE"):
+                self.last_activity = time.time()
             
+            reply = None
             if cmd == "START":
-                self.start_recording()
-                print("ACK:START")
-                sys.stdout.flush()
+                self.start_recording(req_id)
             elif cmd == "STOP":
                 self.stop_and_transcribe()
-                print("ACK:STOP")
-                sys.stdout.flush()
+            elif cmd == "CANCEL":
+                self.cancel_recording()
+            elif cmd == "METRICS":
+                reply = {"text": self.metrics.render(eof=False)}
+            elif cmd == "MEMDUMP":
+                reply = self._dump_memory(message.get("payload") or {})
+            elif cmd == "PROFILE":
+                reply = self._arm_profiler(message.get("payload") or {})
             elif cmd == "QUIT":
                 break
-            elif cmd == "PING":
-                print("PONG")
-                sys.stdout.flush()
+            elif cmd != "PING":
+                logger.warning(f"Unknown command: {cmd}")
+                continue
+            # 受理の応答 (PING には PONG として同じ形で返す)
+            self.ipc.send_new(ipc_protocol.KIND_ACK, cmd if cmd != "PING" else "PONG", req_id=req_id, payload=reply)
 
 if __name__ == "__main__":
     signal.signal(signal.SIGINT, lambda s, f: sys.exit(0))
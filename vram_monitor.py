@@ -1,20 +1,60 @@
 #!/usr/bin/env python3
 """
 VRAM Monitor - リアルタイムGPU VRAM使用状況監視ツール
-更新頻度を調整可能で、軽量動作を実現
+NVML (gpu_info) でプロセス内から問い合わせるため、更新頻度を上げても
+nvidia-smi の起動コストはかからない。STTワーカー自身のメモリ (RSS / GPU) も表示し、
+GPU が無い環境では CPU使用率とRAMの表示に切り替える。
 """
 
 import flet as ft
-import subprocess
+import os
 import threading
 import time
 import sys
 
+import gpu_info
+import memory_timeline
+
+WORKER_SCRIPT = "stt_worker_unified.py"
+
+
+def read_cpu_times():
+    """/proc/stat の (アイドル, 合計) jiffies。取得できなければ None"""
+    try:
+        with open("/proc/stat", "rb") as f:
+            fields = [int(v) for v in f.readline().split()[1:]]
+        return fields[3] + fields[4], sum(fields)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def read_ram_mb():
+    """(使用中MB, 合計MB)。/proc/meminfo が無ければ None"""
+    values = {}
+    try:
+        with open("/proc/meminfo", "rb") as f:
+            for line in f:
+                key, _, rest = line.partition(b":")
+                if key in (b"MemTotal", b"MemAvailable"):
+                    values[key] = int(rest.split()[0]) / 1024
+                    if len(values) == 2:
+                        break
+    except OSError:
+        return None
+    if len(values) < 2:
+        return None
+    return values[b"MemTotal"] - values[b"MemAvailable"], values[b"MemTotal"]
+
+
 class VRAMMonitor:
     def __init__(self, page: ft.Page):
         self.page = page
         self.running = True
         self.update_interval = 1.0  # 初期値: 1秒
+        self.has_gpu = gpu_info.available()
+        self.worker_pid = None
+        self.last_pid_lookup = 0.0
+        self.prev_cpu = read_cpu_times()
         
         # UI要素
         self.vram_text = ft.Text(value="VRAM: 取得中...", size=20, weight="bold")
@@ -22,6 +62,8 @@ class VRAMMonitor:
         self.temp_text = ft.Text(value="温度: --°C", size=14)
         self.utilization_text = ft.Text(value="使用率: --%", size=14)
         self.progress_bar = ft.ProgressBar(width=400, value=0)
+        self.worker_text = ft.Text(value="STTワーカー: 検出中...", size=14)
+        self.cost_text = ft.Text(value="取得コスト: --", size=10, italic=True, color="gray")
         
         self.interval_slider = ft.Slider(
             min=0.1,
@@ -40,65 +82,120 @@ class VRAMMonitor:
         self.status_text.value = f"更新頻度を {self.update_interval:.1f}秒 に変更"
         self.page.update()
         
-    def get_nvidia_smi_info(self):
-        """nvidia-smiでGPU情報を取得"""
+    def find_worker_pid(self):
+        """STTワーカーのPID。デーモンの制御APIに聞き、使えなければ /proc を探す"""
         try:
-            result = subprocess.run(
-                ['nvidia-smi', '--query-gpu=name,memory.used,memory.total,temperature.gpu,utilization.gpu',
-                 '--format=csv,noheader,nounits'],
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            
-            if result.returncode == 0:
-                line = result.stdout.strip()
-                parts = [p.strip() for p in line.split(',')]
-                
-                if len(parts) >= 5:
-                    return {
-                        'name': parts[0],
-                        'used': float(parts[1]),
-                        'total': float(parts[2]),
-                        'temp': parts[3],
-                        'util': parts[4]
-                    }
-        except Exception as e:
-            print(f"nvidia-smi取得エラー: {e}")
-        
+            import control_api
+            return control_api.request("status", timeout=0.5).get("worker_pid")
+        except Exception:
+            pass
+        try:
+            for entry in os.listdir("/proc"):
+                if not entry.isdigit():
+                    continue
+                try:
+                    with open(f"/proc/{entry}/cmdline", "rb") as f:
+                        if WORKER_SCRIPT.encode() in f.read():
+                            return int(entry)
+                except OSError:
+                    continue
+        except OSError:
+            pass
         return None
     
+    def get_worker_info(self):
+        """ワーカーの RSS / ピーク / GPUメモリ (MB)。ワーカーが居なければ None"""
+        pid = self.worker_pid
+        if pid is not None and not os.path.exists(f"/proc/{pid}"):
+            pid = None
+        # 見つからない間の探索は数秒に1回に抑える
+        if pid is None and time.monotonic() - self.last_pid_lookup > 3.0:
+            self.last_pid_lookup = time.monotonic()
+            pid = self.find_worker_pid()
+        self.worker_pid = pid
+        if pid is None:
+            return None
+        rss, peak = memory_timeline.read_process_memory(pid)
+        if rss is None:
+            return None
+        return {
+            "pid": pid,
+            "rss": rss,
+            "peak": peak,
+            "gpu": gpu_info.process_memory_mb(pid) if self.has_gpu else None,
+        }
+
+    def get_cpu_info(self):
+        """GPUが無い環境向けの CPU使用率 (%) と RAM"""
+        current = read_cpu_times()
+        util = None
+        if current and self.prev_cpu:
+            idle = current[0] - self.prev_cpu[0]
+            total = current[1] - self.prev_cpu[1]
+            if total > 0:
+                util = 100 * (1 - idle / total)
+        self.prev_cpu = current
+        return {"util": util, "ram": read_ram_mb()}
+
+    def sample(self):
+        """1回分の取得。取得にかかった時間 (ms) も返す"""
+        started = time.perf_counter()
+        result = {
+            "gpu": gpu_info.device_info(0) if self.has_gpu else None,
+            "cpu": None if self.has_gpu else self.get_cpu_info(),
+            "worker": self.get_worker_info(),
+        }
+        result["cost_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    def _apply(self, info):
+        gpu = info["gpu"]
+        if gpu is not None:
+            percent = gpu["used_mb"] / gpu["total_mb"] if gpu["total_mb"] else 0
+            self.gpu_name_text.value = f"GPU: {gpu['name']}"
+            self.vram_text.value = f"VRAM: {gpu['used_mb'] / 1024:.2f} GB / {gpu['total_mb'] / 1024:.2f} GB"
+            self.temp_text.value = f"温度: {gpu['temp'] if gpu['temp'] is not None else '--'}°C"
+            self.utilization_text.value = f"GPU使用率: {gpu['util'] if gpu['util'] is not None else '--'}%"
+            self.progress_bar.value = percent
+        else:
+            # GPU なし: CPU と RAM を表示する
+            cpu = info["cpu"] or {}
+            ram = cpu.get("ram")
+            self.gpu_name_text.value = "GPU: 検出されません (CPU/RAM を表示)"
+            if ram:
+                self.vram_text.value = f"RAM: {ram[0] / 1024:.2f} GB / {ram[1] / 1024:.2f} GB"
+                self.progress_bar.value = ram[0] / ram[1] if ram[1] else 0
+            else:
+                self.vram_text.value = "RAM: 取得できません"
+                self.progress_bar.value = 0
+            self.temp_text.value = "温度: --°C"
+            util = cpu.get("util")
+            self.utilization_text.value = f"CPU使用率: {util:.0f}%" if util is not None else "CPU使用率: --%"
+
+        worker = info["worker"]
+        if worker is None:
+            self.worker_text.value = "STTワーカー: 停止中"
+        else:
+            text = f"STTワーカー (PID {worker['pid']}): RSS {worker['rss']:.0f} MB / ピーク {worker['peak']:.0f} MB"
+            if worker["gpu"] is not None:
+                text += f" / VRAM {worker['gpu']:.0f} MB"
+            self.worker_text.value = text
+        self.cost_text.value = f"取得コスト: {info['cost_ms']:.2f} ms/回"
+        self.status_text.value = f"更新中... ({self.update_interval:.1f}秒間隔)"
+        self.status_text.color = "green"
+
     def update_loop(self):
-        """バックグラウンドで定期的にGPU情報を更新"""
+        """バックグラウンドで定期的に情報を更新"""
         while self.running:
             try:
-                info = self.get_nvidia_smi_info()
+                info = self.sample()
                 
-                if info:
-                    used_gb = info['used'] / 1024
-                    total_gb = info['total'] / 1024
-                    percent = (info['used'] / info['total']) * 100 if info['total'] > 0 else 0
-                    
-                    # UI更新（メインスレッドで実行）
-                    def update_ui():
-                        self.gpu_name_text.value = f"GPU: {info['name']}"
-                        self.vram_text.value = f"VRAM: {used_gb:.2f} GB / {total_gb:.2f} GB"
-                        self.temp_text.value = f"温度: {info['temp']}°C"
-                        self.utilization_text.value = f"GPU使用率: {info['util']}%"
-                        self.progress_bar.value = percent / 100
-                        self.status_text.value = f"更新中... ({self.update_interval:.1f}秒間隔)"
-                        self.status_text.color = "green"
-                        self.page.update()
-                    
-                    self.page.run_task(update_ui)
-                else:
-                    def show_error():
-                        self.vram_text.value = "VRAM: NVIDIA GPUが見つかりません"
-                        self.status_text.value = "nvidia-smiが利用できません"
-                        self.status_text.color = "red"
-                        self.page.update()
+                # UI更新（メインスレッドで実行）
+                async def update_ui():
+                    self._apply(info)
+                    self.page.update()
                     
-                    self.page.run_task(show_error)
+                self.page.run_task(update_ui)
                 
             except Exception as e:
                 print(f"更新エラー: {e}")
@@ -114,11 +211,12 @@ class VRAMMonitor:
     def stop_monitoring(self):
         """監視を停止"""
         self.running = False
+        gpu_info.shutdown()
 
 def main(page: ft.Page):
     page.title = "VRAM Monitor"
     page.window_width = 500
-    page.window_height = 450
+    page.window_height = 500
     page.theme_mode = ft.ThemeMode.DARK
     
     monitor = VRAMMonitor(page)
@@ -160,10 +258,11 @@ def main(page: ft.Page):
                 monitor.progress_bar,
                 monitor.temp_text,
                 monitor.utilization_text,
+                monitor.worker_text,
                 ft.Divider(),
                 ft.Text("更新頻度調整", size=16, weight="bold"),
                 monitor.interval_slider,
-                ft.Text("更新頻度を上げるとGPU負荷が増加します", size=10, italic=True, color="gray"),
+                monitor.cost_text,
                 ft.Divider(),
                 monitor.status_text,
                 ft.Row([btn_exit, btn_force_kill], alignment="center"),